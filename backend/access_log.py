@@ -0,0 +1,135 @@
+"""
+HTTP access logging as a pure ASGI middleware
+
+The middleware only wraps ``send`` to catch the response status. A request
+costs one closure and a few counter updates, instead of
+BaseHTTPMiddleware's extra task and response stream. The access log goes
+through a queue: the request handler just enqueues the record, and a
+listener thread formats and writes it off the event loop.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import activity_log
+import metrics
+
+access_logger = logging.getLogger("access")
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Enqueues records unformatted so formatting happens on the listener"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The base class formats here, on the caller's thread. Access log
+        # args are plain str/int/float, so handing the record over as-is
+        # is safe.
+        return record
+
+
+def start_queue_logging(logger: logging.Logger = access_logger) -> QueueListener | None:
+    """
+    Route ``logger`` through a queue drained by a background thread
+
+    The listener writes to the handlers the records would otherwise have
+    reached (the logger's own, else the root's), and is stopped at exit so
+    queued lines are flushed.
+
+    Returns:
+        The running listener, or None if there are no handlers to feed
+    """
+    handlers = logger.handlers or logging.getLogger().handlers
+    if not handlers:
+        return None
+    listener = QueueListener(queue.SimpleQueue(), *handlers, respect_handler_level=True)
+    logger.handlers = [_DeferredQueueHandler(listener.queue)]
+    logger.propagate = False
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def real_ip(scope: Scope) -> str:
+    """Extract the original client IP from X-Forwarded-For (reverse proxy), or
+    fall back to X-Real-IP, then the direct socket address for local dev."""
+    forwarded = real = None
+    for name, value in scope.get("headers", ()):
+        if name == b"x-forwarded-for":
+            forwarded = value
+        elif name == b"x-real-ip":
+            real = value
+    if forwarded:
+        return forwarded.decode("latin-1").split(",")[0].strip()
+    if real:
+        return real.decode("latin-1").strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class AccessLogMiddleware:
+    """
+    Times HTTP requests and records them in metrics, the access log and the
+    activity log
+
+    Args:
+        app: The wrapped ASGI app
+        quiet_prefixes: Path prefixes that are not counted or logged at all
+        activity_skip_paths: Paths kept out of the activity log (polled
+            endpoints that would drown it out)
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        quiet_prefixes: tuple[str, ...] = (),
+        activity_skip_paths: frozenset[str] | set[str] = frozenset(),
+    ):
+        self.app = app
+        self.quiet_prefixes = quiet_prefixes
+        self.activity_skip_paths = activity_skip_paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.quiet_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        metrics.http_requests_total += 1
+        status = 500  # If the app raises before responding
+        start = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self._record(scope, status, (time.perf_counter() - start) * 1000)
+
+    def _record(self, scope: Scope, status: int, elapsed_ms: float) -> None:
+        method = scope["method"]
+        path = scope["path"]
+        metrics.rest_api_latency.record(elapsed_ms)
+        # Label by route template (/ticks/{symbol}), not the raw path, so
+        # the label set stays bounded
+        route = scope.get("route")
+        key = (method, route.path if route else "unmatched", status)
+        metrics.http_requests[key] = metrics.http_requests.get(key, 0) + 1
+        access_logger.info(
+            '%s - "%s %s" %s %.0fms', real_ip(scope), method, path, status, elapsed_ms
+        )
+        if path not in self.activity_skip_paths:
+            activity_log.record_event(
+                "http",
+                f"{method} {path} {status} {elapsed_ms:.0f}ms",
+                level="warn" if status >= 400 else "info",
+            )
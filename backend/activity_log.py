@@ -1,16 +1,35 @@
-"""In-memory recent activity log for the dashboard."""
+"""In-memory recent activity log for the dashboard.
+
+Events are stored as raw ``(id, unix_time, type, summary, level)`` tuples;
+the timestamp string and dict are only built for events that are read.
+Ids increase monotonically, so readers can ask for just the events after
+the last one they saw.
+"""
 
 from __future__ import annotations
 
+import itertools
+import time
 from collections import deque
 from datetime import datetime, timezone
+from typing import Iterator
 
 _MAX_EVENTS = 50
-_events: deque[dict] = deque(maxlen=_MAX_EVENTS)
+_events: deque[tuple[int, float, str, str, str]] = deque(maxlen=_MAX_EVENTS)
+_ids = itertools.count(1)
+_last_id = 0
 
 
-def _now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+def _format(event: tuple[int, float, str, str, str]) -> dict:
+    event_id, ts, event_type, summary, level = event
+    iso = datetime.fromtimestamp(ts, timezone.utc).isoformat().replace("+00:00", "Z")
+    return {
+        "id": event_id,
+        "ts": iso,
+        "type": event_type,
+        "summary": summary,
+        "level": level,
+    }
 
 
 def record_event(
@@ -19,16 +38,33 @@ def record_event(
     *,
     level: str = "info",
 ) -> None:
-    _events.appendleft(
-        {
-            "ts": _now_iso(),
-            "type": event_type,
-            "summary": summary,
-            "level": level,
-        }
-    )
+    global _last_id
+    _last_id = next(_ids)
+    _events.appendleft((_last_id, time.time(), event_type, summary, level))
+
 
+def get_events(
+    limit: int = 50, since: int = 0, event_type: str | None = None
+) -> list[dict]:
+    """
+    Recent events, newest first
 
-def get_events(limit: int = 50) -> list[dict]:
+    Args:
+        limit: Maximum number of events returned
+        since: Only events with a greater id (0 for all)
+        event_type: Only events of this type
+    """
     cap = max(1, min(limit, _MAX_EVENTS))
-    return list(_events)[:cap]
+    newer: Iterator = itertools.takewhile(lambda ev: ev[0] > since, _events)
+    if event_type:
+        newer = (ev for ev in newer if ev[2] == event_type)
+    return [_format(ev) for ev in itertools.islice(newer, cap)]
+
+
+def last_id() -> int:
+    return _last_id
+
+
+def events_since(event_id: int) -> list[dict]:
+    """Events newer than ``event_id``, newest first"""
+    return get_events(_MAX_EVENTS, since=event_id)
@@ -0,0 +1,221 @@
+"""Server-side price alerts, evaluated against every incoming trade."""
+
+from __future__ import annotations
+
+import os
+from bisect import bisect_left, bisect_right
+
+# Alert types evaluated on the backend (threshold crossings on trade price)
+ALERT_TYPES = ("price_above", "price_below")
+
+# Active alerts a single connection may register
+MAX_ALERTS_PER_CLIENT = max(1, int(os.getenv("MAX_ALERTS_PER_CLIENT", "1000")))
+
+
+class Alert:
+    """One client-registered, one-shot threshold alert."""
+
+    __slots__ = ("id", "client_id", "symbol", "alert_type", "threshold")
+
+    def __init__(
+        self,
+        alert_id: str,
+        client_id: str,
+        symbol: str,
+        alert_type: str,
+        threshold: float,
+    ) -> None:
+        self.id = alert_id
+        self.client_id = client_id
+        self.symbol = symbol
+        self.alert_type = alert_type
+        self.threshold = threshold
+
+    @classmethod
+    def from_dict(cls, client_id: str, data: dict) -> "Alert":
+        """
+        Build an alert from a client message
+
+        Raises:
+            ValueError: If a field is missing or invalid
+        """
+        if not isinstance(data, dict):
+            raise ValueError("Each alert must be an object")
+        alert_id = data.get("id")
+        symbol = data.get("symbol")
+        alert_type = data.get("alert_type")
+        threshold = data.get("threshold")
+        if not isinstance(alert_id, str) or not alert_id:
+            raise ValueError("Alert id is required")
+        if not isinstance(symbol, str) or not symbol.strip():
+            raise ValueError("Alert symbol is required")
+        if alert_type not in ALERT_TYPES:
+            raise ValueError("alert_type must be one of: " + ", ".join(ALERT_TYPES))
+        if (
+            isinstance(threshold, bool)
+            or not isinstance(threshold, (int, float))
+            or threshold <= 0
+        ):
+            raise ValueError("Threshold must be a positive number")
+        return cls(
+            alert_id, client_id, symbol.strip().upper(), alert_type, float(threshold)
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "symbol": self.symbol,
+            "alert_type": self.alert_type,
+            "threshold": self.threshold,
+        }
+
+
+class SymbolAlerts:
+    """
+    Alerts for one symbol as two threshold-sorted arrays.
+
+    ``price_above`` alerts fire once price >= threshold, i.e. a prefix of
+    the ascending ``above`` array; ``price_below`` alerts fire once price
+    <= threshold, a suffix of ``below``. Either way one bisect finds every
+    crossed alert, and fired alerts are cut off in a single slice.
+    """
+
+    __slots__ = ("above_thresholds", "above", "below_thresholds", "below")
+
+    def __init__(self) -> None:
+        self.above_thresholds: list[float] = []
+        self.above: list[Alert] = []
+        self.below_thresholds: list[float] = []
+        self.below: list[Alert] = []
+
+    def __len__(self) -> int:
+        return len(self.above) + len(self.below)
+
+    def _arrays(self, alert: Alert) -> tuple[list[float], list[Alert]]:
+        if alert.alert_type == "price_above":
+            return self.above_thresholds, self.above
+        return self.below_thresholds, self.below
+
+    def add(self, alert: Alert) -> None:
+        thresholds, alerts = self._arrays(alert)
+        idx = bisect_right(thresholds, alert.threshold)
+        thresholds.insert(idx, alert.threshold)
+        alerts.insert(idx, alert)
+
+    def remove(self, alert: Alert) -> None:
+        thresholds, alerts = self._arrays(alert)
+        idx = bisect_left(thresholds, alert.threshold)
+        while alerts[idx] is not alert:
+            idx += 1
+        del thresholds[idx]
+        del alerts[idx]
+
+    def crossed(self, price: float) -> list[Alert]:
+        """Remove and return every alert triggered by a trade at ``price``"""
+        fired: list[Alert] = []
+        k = bisect_right(self.above_thresholds, price)
+        if k:
+            fired.extend(self.above[:k])
+            del self.above_thresholds[:k]
+            del self.above[:k]
+        k = bisect_left(self.below_thresholds, price)
+        if k < len(self.below):
+            fired.extend(self.below[k:])
+            del self.below_thresholds[k:]
+            del self.below[k:]
+        return fired
+
+
+class AlertEngine:
+    """
+    Registered alerts for every client, indexed by symbol for evaluation
+    and by ``(client_id, alert id)`` for removal.
+    """
+
+    def __init__(self, max_per_client: int = MAX_ALERTS_PER_CLIENT) -> None:
+        self.max_per_client = max_per_client
+        self._books: dict[str, SymbolAlerts] = {}
+        self._client_alerts: dict[str, dict[str, Alert]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(alerts) for alerts in self._client_alerts.values())
+
+    def add(self, alerts: list[Alert]) -> list[Alert]:
+        """
+        Register alerts, replacing any with the same id from the same client
+
+        All-or-nothing: the limit is checked before anything is changed.
+
+        Returns:
+            The replaced alerts
+
+        Raises:
+            ValueError: If a client would exceed its alert limit
+        """
+        added: dict[str, set[str]] = {}
+        for alert in alerts:
+            added.setdefault(alert.client_id, set()).add(alert.id)
+        for client_id, ids in added.items():
+            owned = self._client_alerts.get(client_id, {})
+            if len(owned) + len(ids - owned.keys()) > self.max_per_client:
+                raise ValueError(
+                    f"At most {self.max_per_client} alerts per connection"
+                )
+
+        replaced = []
+        for alert in alerts:
+            old = self.remove(alert.client_id, alert.id)
+            if old is not None:
+                replaced.append(old)
+            self._client_alerts.setdefault(alert.client_id, {})[alert.id] = alert
+            book = self._books.get(alert.symbol)
+            if book is None:
+                book = self._books[alert.symbol] = SymbolAlerts()
+            book.add(alert)
+        return replaced
+
+    def remove(self, client_id: str, alert_id: str) -> Alert | None:
+        """Unregister an alert; returns it, or None if it wasn't registered"""
+        owned = self._client_alerts.get(client_id)
+        alert = owned.pop(alert_id, None) if owned else None
+        if alert is None:
+            return None
+        if not owned:
+            del self._client_alerts[client_id]
+        book = self._books[alert.symbol]
+        book.remove(alert)
+        if not book:
+            del self._books[alert.symbol]
+        return alert
+
+    def remove_client(self, client_id: str) -> list[Alert]:
+        """Unregister every alert a client holds"""
+        return [
+            self.remove(client_id, alert_id)
+            for alert_id in list(self._client_alerts.get(client_id, ()))
+        ]
+
+    def check(self, symbol: str, price: float) -> list[Alert]:
+        """
+        Evaluate a trade; triggered alerts are removed and returned
+
+        Costs one dict lookup for symbols without alerts and two bisects
+        otherwise, regardless of how many alerts are registered.
+        """
+        book = self._books.get(symbol)
+        if book is None:
+            return []
+        fired = book.crossed(price)
+        if not fired:
+            return fired
+        for alert in fired:
+            owned = self._client_alerts[alert.client_id]
+            del owned[alert.id]
+            if not owned:
+                del self._client_alerts[alert.client_id]
+        if not book:
+            del self._books[symbol]
+        return fired
+
+    def has_alerts(self, symbol: str) -> bool:
+        return symbol in self._books
@@ -0,0 +1,128 @@
+"""Streaming OHLCV bar aggregation from the Finnhub trade feed."""
+
+from __future__ import annotations
+
+import os
+from collections import deque
+
+import metrics
+
+# Supported bar intervals and their length in milliseconds
+INTERVALS: dict[str, int] = {"1s": 1_000, "1m": 60_000, "5m": 300_000}
+
+# Completed bars kept per symbol and interval
+BAR_HISTORY_SIZE = max(1, int(os.getenv("BAR_HISTORY_SIZE", "500")))
+
+
+class Bar:
+    """One OHLCV bar; ``start`` is the bucket start in ms since the epoch."""
+
+    __slots__ = ("start", "open", "high", "low", "close", "volume", "trades")
+
+    def __init__(self, start: int, price: float, volume: float) -> None:
+        self.start = start
+        self.open = self.high = self.low = self.close = price
+        self.volume = volume
+        self.trades = 1
+
+    def add(self, price: float, volume: float) -> None:
+        """Fold in a trade without moving the close"""
+        if price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.volume += volume
+        self.trades += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "start": self.start,
+            "open": self.open,
+            "high": self.high,
+            "low": self.low,
+            "close": self.close,
+            "volume": self.volume,
+            "trades": self.trades,
+        }
+
+
+class BarBuilder:
+    """
+    Rolls trades for one symbol into fixed-length bars in O(1) per trade.
+
+    A bar is completed when the first trade of a later bucket arrives.
+    A late trade for an already-closed bucket is added to that completed bar
+    (not the current one) while it is still in history, and dropped
+    otherwise. Either way it is counted in ``metrics``; a patched bar was
+    already published without it.
+    """
+
+    def __init__(self, interval_ms: int, history: int = BAR_HISTORY_SIZE) -> None:
+        self.interval_ms = interval_ms
+        self.current: Bar | None = None
+        self.completed: deque[Bar] = deque(maxlen=history)
+
+    def update(self, timestamp: int, price: float, volume: float) -> Bar | None:
+        """Add a trade; returns the bar it completed, if any."""
+        start = timestamp - timestamp % self.interval_ms
+        bar = self.current
+        if bar is None:
+            self.current = Bar(start, price, volume)
+            return None
+        if start > bar.start:
+            self.completed.append(bar)
+            self.current = Bar(start, price, volume)
+            return bar
+        if start < bar.start:
+            self._add_late(start, price, volume)
+            return None
+        bar.add(price, volume)
+        bar.close = price
+        return None
+
+    def _add_late(self, start: int, price: float, volume: float) -> None:
+        # Late trades are usually only a bucket or two behind
+        for bar in reversed(self.completed):
+            if bar.start == start:
+                bar.add(price, volume)
+                metrics.bars_late_trades_patched += 1
+                return
+            if bar.start < start:
+                break  # No trades fell in that bucket; don't invent a bar
+        metrics.bars_late_trades_dropped += 1
+
+
+class BarAggregator:
+    """A ``BarBuilder`` for every supported interval of every streamed symbol."""
+
+    def __init__(self, history: int = BAR_HISTORY_SIZE) -> None:
+        self.history = history
+        self._builders: dict[str, dict[str, BarBuilder]] = {}
+
+    def on_trade(
+        self, symbol: str, timestamp: int, price: float, volume: float
+    ) -> list[tuple[str, Bar]]:
+        """
+        Feed one trade to every interval for ``symbol``.
+
+        Returns:
+            ``(interval, bar)`` for each bar this trade completed
+        """
+        builders = self._builders.get(symbol)
+        if builders is None:
+            builders = self._builders[symbol] = {
+                name: BarBuilder(ms, self.history) for name, ms in INTERVALS.items()
+            }
+        completed = []
+        for name, builder in builders.items():
+            bar = builder.update(timestamp, price, volume)
+            if bar is not None:
+                completed.append((name, bar))
+        return completed
+
+    def get(self, symbol: str, interval: str) -> BarBuilder | None:
+        builders = self._builders.get(symbol)
+        return builders.get(interval) if builders else None
+
+    def discard(self, symbol: str) -> None:
+        self._builders.pop(symbol, None)
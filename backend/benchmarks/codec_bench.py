@@ -0,0 +1,106 @@
+"""
+JSON codec benchmark: per-frame decode and encode time for each installed backend.
+
+Run from the backend directory:
+
+    python -m benchmarks.codec_bench [--frames 20000] [--trades 5]
+"""
+
+import argparse
+import random
+import time
+
+import codec
+
+SYMBOLS = ["AAPL", "NVDA", "MSFT", "AMZN", "GOOGL", "META", "TSLA", "BINANCE:BTCUSDT"]
+
+
+def _finnhub_frames(count: int, trades: int) -> list[str]:
+    """Raw Finnhub trade frames as they arrive on the upstream socket"""
+    rng = random.Random(42)
+    base_ts = 1_720_000_000_000
+    frames = []
+    for i in range(count):
+        data = [
+            {
+                "c": None,
+                "p": round(rng.uniform(50, 1000), 2),
+                "s": rng.choice(SYMBOLS),
+                "t": base_ts + i * trades + j,
+                "v": rng.randint(1, 5000),
+            }
+            for j in range(trades)
+        ]
+        frames.append(codec.CODECS["json"].dumps({"data": data, "type": "trade"}))
+    return frames
+
+
+def _price_updates(frames: list[dict]) -> list[dict]:
+    return [
+        {
+            "type": "price_update",
+            "symbol": trade["s"],
+            "data": {"price": trade["p"], "volume": trade["v"], "timestamp": trade["t"]},
+        }
+        for frame in frames
+        for trade in frame["data"]
+    ]
+
+
+def _price_batches(frames: list[dict]) -> list[dict]:
+    return [
+        {
+            "type": "price_batch",
+            "updates": [
+                {
+                    "symbol": trade["s"],
+                    "data": {
+                        "price": trade["p"],
+                        "volume": trade["v"],
+                        "timestamp": trade["t"],
+                    },
+                }
+                for trade in frame["data"]
+            ],
+        }
+        for frame in frames
+    ]
+
+
+def _measure(func, items: list) -> float:
+    """Microseconds per item"""
+    started = time.perf_counter()
+    for item in items:
+        func(item)
+    return (time.perf_counter() - started) / len(items) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--frames", type=int, default=20_000)
+    parser.add_argument("--trades", type=int, default=5, help="trades per frame")
+    args = parser.parse_args()
+
+    raw = _finnhub_frames(args.frames, args.trades)
+    decoded = [codec.CODECS["json"].loads(frame) for frame in raw]
+    updates = _price_updates(decoded)
+    batches = _price_batches(decoded)
+
+    print(
+        f"{args.frames} Finnhub frames x {args.trades} trades "
+        f"(active backend: {codec.BACKEND})\n"
+    )
+    print(
+        f"{'backend':<8} {'decode us/frame':>15} {'encode us/update':>16} "
+        f"{'encode us/batch':>15}"
+    )
+    for name, backend in codec.CODECS.items():
+        print(
+            f"{name:<8} {_measure(backend.loads, raw):>15.2f} "
+            f"{_measure(backend.dumps, updates):>16.2f} "
+            f"{_measure(backend.dumps, batches):>15.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Fake Finnhub upstream: a local WebSocket server that speaks the Finnhub
+trade/ping protocol and generates synthetic load.
+
+Start it, then point the backend at it with FINNHUB_WS_URL. Run from the
+backend directory:
+
+    python -m benchmarks.fake_finnhub [--port 8765] [--rate 5000] [--zipf 1.1]
+    FINNHUB_WS_URL="ws://127.0.0.1:8765/?token=" FINNHUB_API_KEY=test \\
+        uvicorn main:app --port 8000
+
+Each connection gets ``--rate`` trades per second spread over the symbols it
+subscribed to, with Zipf-skewed popularity (rank = position in the symbol
+universe, so AAPL is hotter than SYM0400). ``--burst-*`` multiplies the rate
+periodically, like an open or a news spike. ``--firehose`` ignores
+subscriptions and streams the whole universe to stress ingest on its own.
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import time
+
+from websockets.asyncio.server import ServerConnection, serve
+from websockets.exceptions import ConnectionClosed
+
+import codec
+
+# The most popular symbols first; padded with SYM0001... up to --symbols
+BASE_SYMBOLS = [
+    "AAPL", "NVDA", "MSFT", "AMZN", "GOOGL", "META", "TSLA", "BINANCE:BTCUSDT",
+    "AMD", "NFLX", "AVGO", "JPM", "V", "WMT", "XOM", "BINANCE:ETHUSDT",
+]  # fmt: skip
+
+
+class LoadProfile:
+    """Target rate over time, and Zipf weights over the symbol universe"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.rate = args.rate
+        self.burst_every = args.burst_every
+        self.burst_seconds = args.burst_seconds
+        self.burst_factor = args.burst_factor
+        self.zipf = args.zipf
+        self.trades_per_frame = args.trades_per_frame
+        self.universe = BASE_SYMBOLS[: args.symbols] + [
+            f"SYM{i:04d}" for i in range(1, args.symbols - len(BASE_SYMBOLS) + 1)
+        ]
+        self.rank = {symbol: i for i, symbol in enumerate(self.universe)}
+        self.started = time.monotonic()
+
+    def current_rate(self) -> float:
+        if self.burst_every <= 0:
+            return self.rate
+        phase = (time.monotonic() - self.started) % self.burst_every
+        if phase < self.burst_seconds:
+            return self.rate * self.burst_factor
+        return self.rate
+
+    def cum_weights(self, symbols: list[str]) -> list[float]:
+        """Cumulative Zipf weights; unknown symbols rank after the universe"""
+        fallback = len(self.universe)
+        weights = (
+            1.0 / (self.rank.get(symbol, fallback) + 1) ** self.zipf
+            for symbol in symbols
+        )
+        return list(itertools.accumulate(weights))
+
+
+class FakeFinnhub:
+    def __init__(self, profile: LoadProfile, args: argparse.Namespace):
+        self.profile = profile
+        self.tick_s = args.tick_ms / 1000
+        self.ping_interval = args.ping_interval
+        self.firehose = args.firehose
+        self.rng = random.Random(args.seed)
+        self.prices = {s: self.rng.uniform(20, 1000) for s in profile.universe}
+        self.connections = 0
+        self.trades_sent = 0
+        self.frames_sent = 0
+
+    def _trade(self, symbol: str, now_ms: int) -> dict:
+        price = self.prices.get(symbol) or self.rng.uniform(20, 1000)
+        price = max(0.01, price * (1 + self.rng.gauss(0, 0.0005)))
+        self.prices[symbol] = price
+        return {
+            "c": None,
+            "p": round(price, 2),
+            "s": symbol,
+            "t": now_ms,
+            "v": self.rng.randint(1, 500),
+        }
+
+    async def handle(self, websocket: ServerConnection):
+        self.connections += 1
+        subscribed: list[str] = list(self.profile.universe) if self.firehose else []
+        weights = self.profile.cum_weights(subscribed)
+
+        async def read_requests():
+            nonlocal weights
+            async for raw in websocket:
+                try:
+                    request = codec.loads(raw)
+                    symbol = str(request.get("symbol", "")).upper()
+                except (ValueError, AttributeError):
+                    continue
+                if self.firehose or not symbol:
+                    continue
+                if request.get("type") == "subscribe" and symbol not in subscribed:
+                    subscribed.append(symbol)
+                elif request.get("type") == "unsubscribe" and symbol in subscribed:
+                    subscribed.remove(symbol)
+                weights = self.profile.cum_weights(subscribed)
+
+        reader = asyncio.create_task(read_requests())
+        owed = 0.0
+        last = last_ping = time.monotonic()
+        try:
+            while not reader.done():
+                await asyncio.sleep(self.tick_s)
+                now = time.monotonic()
+                owed += self.profile.current_rate() * (now - last)
+                last = now
+                if now - last_ping >= self.ping_interval:
+                    await websocket.send(codec.dumps({"type": "ping"}))
+                    last_ping = now
+                if not subscribed:
+                    owed = 0.0
+                    continue
+
+                count, owed = int(owed), owed - int(owed)
+                symbols = self.rng.choices(subscribed, cum_weights=weights, k=count)
+                now_ms = int(time.time() * 1000)
+                step = self.profile.trades_per_frame
+                for i in range(0, count, step):
+                    data = [self._trade(s, now_ms) for s in symbols[i : i + step]]
+                    await websocket.send(codec.dumps({"data": data, "type": "trade"}))
+                    self.frames_sent += 1
+                self.trades_sent += count
+        except ConnectionClosed:
+            pass
+        finally:
+            reader.cancel()
+            self.connections -= 1
+
+    async def report(self, every: float = 5.0):
+        last_trades, last = 0, time.monotonic()
+        while True:
+            await asyncio.sleep(every)
+            now = time.monotonic()
+            rate = (self.trades_sent - last_trades) / (now - last)
+            last_trades, last = self.trades_sent, now
+            print(
+                f"📈 {self.connections} connection(s), {rate:,.0f} trades/s "
+                f"({self.trades_sent:,} trades, {self.frames_sent:,} frames total)"
+            )
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    profile = LoadProfile(args)
+    server = FakeFinnhub(profile, args)
+    async with serve(server.handle, args.host, args.port, max_size=None):
+        print(
+            f"✅ Fake Finnhub on ws://{args.host}:{args.port}/?token= "
+            f"({len(profile.universe)} symbols, {args.rate:g} trades/s per "
+            f"connection, zipf {args.zipf:g})"
+        )
+        await server.report()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--symbols", type=int, default=500, help="universe size")
+    parser.add_argument(
+        "--rate", type=float, default=5000, help="trades/s per connection"
+    )
+    parser.add_argument("--zipf", type=float, default=1.1, help="0 = uniform")
+    parser.add_argument("--trades-per-frame", type=int, default=50)
+    parser.add_argument("--tick-ms", type=float, default=10, help="send interval")
+    parser.add_argument("--burst-every", type=float, default=0, help="seconds")
+    parser.add_argument("--burst-seconds", type=float, default=1)
+    parser.add_argument("--burst-factor", type=float, default=10)
+    parser.add_argument("--ping-interval", type=float, default=20, help="seconds")
+    parser.add_argument(
+        "--firehose", action="store_true", help="stream every symbol, ignore subscribe"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Replay benchmark: fan-out throughput driven by a recorded Finnhub feed.
+
+Record a session first (FEED_RECORD_PATH=feed.log.gz uvicorn main:app ...),
+or generate a synthetic one with --generate. Then run from the backend
+directory:
+
+    python -m benchmarks.replay_bench feed.log.gz [--clients 100] [--speed max]
+    python -m benchmarks.replay_bench feed.log.gz --generate [--frames 20000]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import codec
+import metrics
+from client_manager import ClientManager
+from feed_log import FeedRecorder, FeedReplay, parse_speed, read_frames
+from subscription_manager import SubscriptionManager
+
+SYMBOLS = ["AAPL", "NVDA", "MSFT", "AMZN", "GOOGL", "META", "TSLA", "BINANCE:BTCUSDT"]
+
+
+class _NullSocket:
+    """Stands in for a client WebSocket; counts what would be sent"""
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+
+    async def send_text(self, text: str):
+        self.messages += 1
+        self.bytes += len(text)
+
+    async def send_bytes(self, data: bytes):
+        self.messages += 1
+        self.bytes += len(data)
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+
+def _generate(path: str, frames: int, trades: int) -> None:
+    """Write a synthetic feed log: ``frames`` frames 1 ms apart"""
+    rng = random.Random(42)
+    recorder = FeedRecorder(path)
+    base_ts = 1_720_000_000_000
+    for i in range(frames):
+        data = [
+            {
+                "c": None,
+                "p": round(rng.uniform(50, 1000), 2),
+                "s": rng.choice(SYMBOLS),
+                "t": base_ts + i,
+                "v": rng.randint(1, 5000),
+            }
+            for _ in range(trades)
+        ]
+        recorder.record(
+            codec.dumps({"data": data, "type": "trade"}), (base_ts + i) * 1000
+        )
+    recorder.close()
+
+
+def _log_symbols(path: str) -> list[str]:
+    symbols = set()
+    for _, frame in read_frames(path):
+        message = codec.loads(frame)
+        symbols.update(trade.get("s", "").upper() for trade in message.get("data", ()))
+    symbols.discard("")
+    return sorted(symbols)
+
+
+async def _run(path: str, clients: int, speed: float) -> int:
+    """Replay ``path`` to ``clients`` null sockets; returns messages dropped"""
+    replay = FeedReplay(path, speed=speed)
+    client_manager = ClientManager()
+    subscription_manager = SubscriptionManager(replay, client_manager)
+
+    symbols = _log_symbols(path)
+    sockets = [_NullSocket() for _ in range(clients)]
+    for socket in sockets:
+        client_id = client_manager.add_client(socket)
+        await subscription_manager.subscribe(client_id, symbols)
+    await asyncio.sleep(0.1)  # Let the batched upstream subscribe go out
+
+    started = time.perf_counter()
+    await replay.connect()
+    await replay.finished.wait()
+    # Wait for the writers to drain their queues
+    while any(o.snapshot()["queue_depth"] for o in client_manager.outboxes.values()):
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+
+    sent = sum(s.messages for s in sockets)
+    print(
+        f"{len(symbols)} symbols, {clients} clients, "
+        f"speed {'max' if not speed else f'{speed:g}x'}\n"
+    )
+    print(f"frames replayed   {replay.frames_replayed:>12}")
+    print(f"trades replayed   {replay.trades_replayed:>12}")
+    print(f"elapsed s         {elapsed:>12.2f}")
+    print(f"trades/s          {replay.trades_replayed / elapsed:>12.0f}")
+    print(f"messages sent     {sent:>12}")
+    print(f"messages/s        {sent / elapsed:>12.0f}")
+    print(f"messages dropped  {metrics.ws_messages_dropped:>12}")
+    handler = metrics.finnhub_latency.snapshot()
+    print(f"handler avg ms    {handler['avg_ms']:>12}")
+    print(f"handler p99 ms    {handler['p99_ms']:>12}")
+    return metrics.ws_messages_dropped
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("log", help="feed log written by FEED_RECORD_PATH")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--speed", default="max", help="playback multiplier or max")
+    parser.add_argument(
+        "--generate", action="store_true", help="write a synthetic log and exit"
+    )
+    parser.add_argument("--frames", type=int, default=20_000)
+    parser.add_argument("--trades", type=int, default=5, help="trades per frame")
+    args = parser.parse_args()
+
+    if args.generate:
+        _generate(args.log, args.frames, args.trades)
+        print(f"Wrote {args.frames} frames to {args.log}")
+        return
+    dropped = asyncio.run(_run(args.log, args.clients, parse_speed(args.speed)))
+    if dropped:
+        # Null sockets never block, so drops mean the replay starved the
+        # writers and the numbers above measure queue overflow, not fan-out
+        raise SystemExit(f"❌ {dropped} messages dropped; results are not valid")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Wire format benchmark: bytes per tick and encode time, JSON vs binary.
+
+Run from the backend directory:
+
+    python -m benchmarks.wire_format_bench [--ticks 100000] [--batch 10]
+"""
+
+import argparse
+import json
+import random
+import time
+
+import wire_format
+
+SYMBOLS = ["AAPL", "NVDA", "MSFT", "AMZN", "GOOGL", "META", "TSLA", "BINANCE:BTCUSDT"]
+
+
+def _sample_updates(count: int) -> list[dict]:
+    rng = random.Random(42)
+    base_ts = 1_720_000_000_000
+    return [
+        {
+            "symbol": rng.choice(SYMBOLS),
+            "data": {
+                "price": round(rng.uniform(50, 1000), 2),
+                "volume": rng.randint(1, 5000),
+                "timestamp": base_ts + i,
+            },
+        }
+        for i in range(count)
+    ]
+
+
+def _json_update(update: dict) -> str:
+    return json.dumps(
+        {"type": "price_update", **update}, separators=(",", ":"), ensure_ascii=False
+    )
+
+
+def _json_batch(updates: list[dict]) -> str:
+    return json.dumps(
+        {"type": "price_batch", "updates": updates},
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+
+
+def _measure(label: str, encode, items: list, ticks_per_item: int) -> None:
+    started = time.perf_counter()
+    total_bytes = 0
+    for item in items:
+        payload = encode(item)
+        total_bytes += len(payload.encode() if isinstance(payload, str) else payload)
+    elapsed = time.perf_counter() - started
+    ticks = len(items) * ticks_per_item
+    print(
+        f"{label:<16} {total_bytes / ticks:>10.1f} {elapsed / ticks * 1e6:>14.3f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ticks", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=10)
+    args = parser.parse_args()
+
+    updates = _sample_updates(args.ticks)
+    batches = [
+        updates[i : i + args.batch] for i in range(0, len(updates), args.batch)
+    ]
+    # Intern up front so id assignment is not part of the timing
+    wire_format.symbol_table.ids_for(SYMBOLS)
+
+    print(f"{args.ticks} ticks, batch size {args.batch}\n")
+    print(f"{'format':<16} {'bytes/tick':>10} {'encode us/tick':>14}")
+    _measure("json update", _json_update, updates, 1)
+    _measure(
+        "binary update",
+        lambda u: wire_format.pack_update(u["symbol"], u["data"]),
+        updates,
+        1,
+    )
+    _measure("json batch", _json_batch, batches, args.batch)
+    _measure("binary batch", wire_format.pack_batch, batches, args.batch)
+
+
+if __name__ == "__main__":
+    main()
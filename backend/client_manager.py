@@ -4,10 +4,589 @@ Manages WebSocket connections from clients
 """
 
 from fastapi import WebSocket
-from typing import Dict
+from collections import deque
+from typing import Callable, Dict
+import asyncio
+import os
+import time
 import uuid
 
+import activity_log
+import codec
 import metrics
+import wire_format
+
+# Maximum number of messages buffered per client before the oldest is dropped
+SEND_QUEUE_SIZE = max(1, int(os.getenv("WS_SEND_QUEUE_SIZE", "256")))
+
+# A pending price_batch is flushed early once it holds this many updates
+MAX_BATCH_SIZE = 1024
+
+# In delta mode, every Nth update per symbol is a full keyframe for resync
+DELTA_KEYFRAME_EVERY = max(1, int(os.getenv("WS_DELTA_KEYFRAME_EVERY", "50")))
+
+# What to do when a client can't keep up:
+#   drop_oldest - drop the oldest queued message once the queue is full
+#   conflate    - replace a symbol's still-unsent update with the newer one,
+#                 then drop oldest if the queue is still full
+#   disconnect  - drop oldest, and close clients lagging WS_MAX_LAG_S behind
+BACKPRESSURE_POLICIES = ("drop_oldest", "conflate", "disconnect")
+BACKPRESSURE_POLICY = (
+    os.getenv("WS_BACKPRESSURE_POLICY", "drop_oldest").strip().lower()
+)
+if BACKPRESSURE_POLICY not in BACKPRESSURE_POLICIES:
+    raise ValueError(
+        "WS_BACKPRESSURE_POLICY must be one of: " + ", ".join(BACKPRESSURE_POLICIES)
+    )
+
+# Age of the oldest unsent message at which a client counts as lagging
+MAX_LAG_S = max(0.1, float(os.getenv("WS_MAX_LAG_S", "10")))
+
+# Unsent bytes buffered per client before the oldest messages are dropped
+MAX_PENDING_BYTES = max(1024, int(os.getenv("WS_MAX_PENDING_BYTES", str(1 << 20))))
+
+# WebSocket close code for evicted slow clients (RFC 6455 "Try Again Later")
+SLOW_CLIENT_CLOSE_CODE = 1013
+
+# Outbound payload: a dict is JSON-encoded by the writer, str/bytes are sent as-is
+Payload = dict | str | bytes
+
+
+def encode_message(message: dict) -> str:
+    """
+    Serialize a message once so it can be shared by many clients
+
+    Uses the compact form produced by ``codec`` (orjson when installed).
+
+    Args:
+        message: Message dictionary to encode
+
+    Returns:
+        JSON text ready for ``send_text``
+    """
+    metrics.ws_payload_encodes += 1
+    return codec.dumps(message)
+
+
+class PriceUpdate:
+    """
+    A single trade update shared by every subscriber of a symbol.
+
+    The JSON ``price_update`` text and the binary record are built lazily
+    and cached, so each is encoded at most once no matter how many clients
+    receive it; batching clients read ``data`` directly instead.
+    """
+
+    __slots__ = ("symbol", "data", "_text", "_binary")
+
+    def __init__(self, symbol: str, data: dict):
+        self.symbol = symbol
+        self.data = data
+        self._text: str | None = None
+        self._binary: bytes | None = None
+
+    def encoded(self, encoding: str) -> Payload:
+        return self.binary() if encoding == "binary" else self.text()
+
+    def text(self) -> str:
+        if self._text is None:
+            self._text = encode_message(
+                {"type": "price_update", "symbol": self.symbol, "data": self.data}
+            )
+        else:
+            metrics.ws_payload_encodes_saved += 1
+        return self._text
+
+    def binary(self) -> bytes:
+        if self._binary is None:
+            metrics.ws_payload_encodes += 1
+            self._binary = wire_format.pack_update(self.symbol, self.data)
+        else:
+            metrics.ws_payload_encodes_saved += 1
+        return self._binary
+
+
+class ClientOutbox:
+    """
+    Bounded outbound queue and writer task for a single client.
+
+    The dispatcher only enqueues; the writer task owns the socket and
+    awaits the actual sends, so a slow client never blocks anyone else.
+    The queue is bounded by message count and by unsent bytes. When it is
+    full the oldest message is dropped (newer prices supersede older ones);
+    see ``BACKPRESSURE_POLICY`` for conflation and slow-client eviction.
+
+    Symbols can also be throttled: only the latest update per symbol is
+    kept and it is released at most once per interval (latest value wins).
+
+    Clients that opt into batching receive one ``price_batch`` frame per
+    upstream frame (``batch_ms`` = 0) or per ``batch_ms`` window instead
+    of one ``price_update`` frame per trade.
+
+    Price data is sent as JSON text or, for clients that negotiated
+    ``binary``, as compact binary frames (see ``wire_format``).
+
+    JSON clients can also opt into delta mode: after a full keyframe,
+    updates for a symbol carry only the fields that changed since the
+    last one this client received (``price_delta``).
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        websocket: WebSocket,
+        on_error: Callable[[str], None],
+        maxsize: int = SEND_QUEUE_SIZE,
+    ):
+        self.client_id = client_id
+        self.websocket = websocket
+        self.maxsize = maxsize
+        # Entries are [enqueued_at, payload, size, symbol, chain]; symbol is
+        # set only for single full price updates, which conflation may
+        # replace. In delta mode chain maps each symbol in the frame to
+        # whether it is a delta (needs the previous frame) or a keyframe.
+        self._queue: deque[list] = deque()
+        self._ready = asyncio.Event()
+        self._queued_symbols: Dict[str, list] = {}
+        self.pending_bytes = 0
+        # Enqueue time of the oldest message not yet delivered, including
+        # one being sent and any dropped since the last completed send
+        self._behind_since: float | None = None
+        self.dropped = 0
+        self.conflated = 0
+        self.lagging = False
+        self.evicted = False
+        self.send_latency = metrics.LatencyTracker()
+        self.encoding = "json"
+        self._on_error = on_error
+
+        # Per-symbol throttle interval (seconds) and conflation state
+        self.throttle: Dict[str, float] = {}
+        self._pending: Dict[str, PriceUpdate] = {}
+        self._last_flush: Dict[str, float] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+
+        # Batching: None = one frame per update, else flush window in seconds
+        self.batch_window: float | None = None
+        self._batch: list[dict] = []
+        self._batch_chain: Dict[str, bool] = {}
+        self._batch_timer: asyncio.Handle | None = None
+
+        # Delta mode: last data sent per symbol and updates since its keyframe
+        self.delta = False
+        self._last_sent: Dict[str, dict] = {}
+        self._since_keyframe: Dict[str, int] = {}
+
+        self.task = asyncio.create_task(self._run())
+
+    def put(
+        self,
+        message: Payload,
+        symbol: str | None = None,
+        chain: Dict[str, bool] | None = None,
+    ) -> bool:
+        """
+        Enqueue a message without blocking
+
+        Args:
+            message: Payload; dicts are encoded here so their size is known
+            symbol: Set for a full single-symbol price update, which the
+                ``conflate`` policy may replace with a newer one
+            chain: Delta mode only: symbol -> True if the frame carries a
+                delta for it, False for a keyframe
+
+        Returns:
+            False if an older message had to be dropped to make room
+        """
+        if self.evicted:
+            return False
+        if isinstance(message, dict):
+            message = codec.dumps(message)
+        size = len(message)
+        now = time.monotonic()
+
+        if symbol is not None and BACKPRESSURE_POLICY == "conflate":
+            entry = self._queued_symbols.get(symbol)
+            if entry is not None:
+                # Keep the slot's original enqueue time: it still measures
+                # how long this symbol has gone without a send
+                self.pending_bytes += size - entry[2]
+                entry[1], entry[2] = message, size
+                self.conflated += 1
+                metrics.ws_updates_conflated += 1
+                return True
+
+        entry = [now, message, size, symbol, chain]
+        self._queue.append(entry)
+        self.pending_bytes += size
+        if self._behind_since is None:
+            self._behind_since = now
+        if symbol is not None and BACKPRESSURE_POLICY == "conflate":
+            self._queued_symbols[symbol] = entry
+
+        accepted = True
+        while len(self._queue) > 1 and (
+            len(self._queue) > self.maxsize or self.pending_bytes > MAX_PENDING_BYTES
+        ):
+            self._drop_oldest()
+            accepted = False
+
+        self._check_lag(now)
+        self._ready.set()
+        return accepted
+
+    def _pop(self) -> list:
+        entry = self._queue.popleft()
+        self.pending_bytes -= entry[2]
+        symbol = entry[3]
+        if symbol is not None and self._queued_symbols.get(symbol) is entry:
+            del self._queued_symbols[symbol]
+        return entry
+
+    def _drop_oldest(self):
+        """
+        Drop the oldest queued message under backpressure
+
+        In delta mode, queued deltas that depended on a dropped frame would
+        be applied to a base the client never got, so they are dropped too,
+        and the affected symbols restart with a keyframe.
+        """
+        broken = self._break_chain(self._pop())
+        if not broken:
+            return
+        kept: deque[list] = deque()
+        for entry in self._queue:
+            chain = entry[4]
+            if chain and any(chain.get(symbol) for symbol in broken):
+                self.pending_bytes -= entry[2]
+                broken |= self._break_chain(entry)
+            else:
+                if chain:
+                    # A later keyframe restores the chain for its symbol
+                    broken -= {s for s, is_delta in chain.items() if not is_delta}
+                kept.append(entry)
+        self._queue = kept
+
+    def _break_chain(self, entry: list) -> set[str]:
+        """Count a dropped entry; returns the symbols whose chain it breaks"""
+        self.dropped += 1
+        metrics.ws_messages_dropped += 1
+        chain = entry[4]
+        if not chain:
+            return set()
+        for symbol in chain:
+            self._last_sent.pop(symbol, None)
+            self._since_keyframe.pop(symbol, None)
+        return set(chain)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def lag(self, now: float | None = None) -> float:
+        """
+        Seconds the oldest undelivered message has been waiting
+
+        Only a completed send moves this forward. Dropping the oldest entry
+        does not, so a socket whose send never returns keeps falling behind
+        even though drops keep the queue itself fresh.
+        """
+        if self._behind_since is None:
+            return 0.0
+        return (now or time.monotonic()) - self._behind_since
+
+    def _check_lag(self, now: float):
+        lag = self.lag(now)
+        if lag < MAX_LAG_S:
+            return
+        if not self.lagging:
+            # Logged once per episode so a stuck client can't flood the log
+            self.lagging = True
+            metrics.ws_slow_clients += 1
+            activity_log.record_event(
+                "slow_client",
+                f"Client {self.client_id[:8]} is {lag:.1f}s behind "
+                f"({len(self._queue)} msgs, {self.pending_bytes} bytes queued)",
+                level="warn",
+            )
+        if BACKPRESSURE_POLICY == "disconnect":
+            self._evict(lag)
+
+    def _evict(self, lag: float):
+        """Close a client that stayed too far behind"""
+        self.evicted = True
+        metrics.ws_clients_evicted += 1
+        print(f"🐢 Disconnecting slow client {self.client_id} ({lag:.1f}s behind)")
+        activity_log.record_event(
+            "slow_client",
+            f"Disconnected client {self.client_id[:8]}: {lag:.1f}s behind",
+            level="error",
+        )
+        asyncio.create_task(self._close_socket())
+        self._on_error(self.client_id)
+
+    async def _close_socket(self):
+        try:
+            await self.websocket.close(
+                code=SLOW_CLIENT_CLOSE_CODE, reason="Client too slow"
+            )
+        except Exception:
+            pass  # Already gone
+
+    def put_snapshot(self, update: PriceUpdate) -> bool:
+        """
+        Enqueue a cached update for a (re)subscribe
+
+        Skipped for a delta client whose last frame for the symbol already
+        carried this data: it would go out as an empty ``price_delta``.
+
+        Returns:
+            True if the update was queued
+        """
+        if self.delta and self._last_sent.get(update.symbol) == update.data:
+            return False
+        self.put_update(update)
+        return True
+
+    def put_update(self, update: PriceUpdate):
+        """
+        Enqueue a price update, conflating it if the symbol is throttled
+
+        The first update after a quiet interval goes out immediately; later
+        ones overwrite a single pending slot that is flushed when the
+        interval elapses.
+        """
+        symbol = update.symbol
+        interval = self.throttle.get(symbol)
+        if not interval:
+            self._emit(update)
+            return
+
+        if symbol in self._timers:
+            if symbol in self._pending:
+                metrics.ws_updates_conflated += 1
+            self._pending[symbol] = update
+            return
+
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        due = self._last_flush.get(symbol, 0.0) + interval
+        if now >= due:
+            self._last_flush[symbol] = now
+            self._emit(update)
+        else:
+            self._pending[symbol] = update
+            self._timers[symbol] = loop.call_later(due - now, self._flush, symbol)
+
+    def set_throttle(self, symbol: str, interval_ms: int):
+        """
+        Set (or clear, with 0) the throttle interval for a symbol
+
+        Clearing flushes any pending conflated update right away.
+        """
+        if interval_ms > 0:
+            self.throttle[symbol] = interval_ms / 1000
+            return
+        self.throttle.pop(symbol, None)
+        self._last_flush.pop(symbol, None)
+        timer = self._timers.pop(symbol, None)
+        if timer:
+            timer.cancel()
+        update = self._pending.pop(symbol, None)
+        if update is not None:
+            self._emit(update)
+
+    def set_batching(self, enabled: bool, batch_ms: int = 0):
+        """
+        Switch between single ``price_update`` frames and ``price_batch`` frames
+
+        Args:
+            enabled: Whether to bundle updates into ``price_batch`` frames
+            batch_ms: Collection window; 0 bundles per upstream frame
+        """
+        if enabled:
+            self.batch_window = batch_ms / 1000
+            return
+        self.batch_window = None
+        self._flush_batch()
+
+    def set_delta(self, enabled: bool):
+        """
+        Switch delta mode on or off
+
+        Either way the next update per symbol is a full keyframe.
+        """
+        self.delta = enabled
+        self._last_sent.clear()
+        self._since_keyframe.clear()
+
+    def discard_symbol(self, symbol: str):
+        """Forget throttle, delta state and any pending update for a symbol"""
+        self._pending.pop(symbol, None)
+        self._last_sent.pop(symbol, None)
+        self._since_keyframe.pop(symbol, None)
+        self.set_throttle(symbol, 0)
+
+    def set_encoding(self, encoding: str):
+        """Switch wire encoding, flushing any batch built in the old one"""
+        self._flush_batch()
+        self.encoding = encoding
+        # Binary records are fixed-layout, so delta state restarts on switch
+        self._last_sent.clear()
+        self._since_keyframe.clear()
+
+    def _flush(self, symbol: str):
+        self._timers.pop(symbol, None)
+        update = self._pending.pop(symbol, None)
+        if update is not None:
+            self._last_flush[symbol] = asyncio.get_running_loop().time()
+            self._emit(update)
+
+    def _delta(self, update: PriceUpdate) -> dict | None:
+        """
+        Fields that changed since the last update sent for this symbol
+
+        Returns:
+            None when a full keyframe is due instead
+        """
+        symbol = update.symbol
+        last = self._last_sent.get(symbol)
+        self._last_sent[symbol] = update.data
+        count = self._since_keyframe.get(symbol, 0) + 1
+        if last is None or count >= DELTA_KEYFRAME_EVERY:
+            self._since_keyframe[symbol] = 0
+            metrics.ws_delta_keyframes += 1
+            return None
+        self._since_keyframe[symbol] = count
+        metrics.ws_delta_updates += 1
+        changes = {k: v for k, v in update.data.items() if last.get(k) != v}
+        # Trade timestamps change every time: send the offset in ms instead
+        timestamp, last_timestamp = changes.get("timestamp"), last.get("timestamp")
+        if isinstance(timestamp, int) and isinstance(last_timestamp, int):
+            del changes["timestamp"]
+            changes["dt"] = timestamp - last_timestamp
+        return changes
+
+    def _emit(self, update: PriceUpdate):
+        delta = None
+        if self.delta and self.encoding == "json":
+            delta = self._delta(update)
+
+        symbol = update.symbol
+        if self.batch_window is None:
+            if not self.delta or self.encoding != "json":
+                self.put(update.encoded(self.encoding), symbol)
+            elif delta is None:
+                # Not conflatable: a newer keyframe replacing this one would
+                # jump ahead of deltas queued in between
+                self.put(update.encoded(self.encoding), chain={symbol: False})
+            else:
+                self.put(
+                    encode_message(
+                        {"type": "price_delta", "symbol": symbol, "data": delta}
+                    ),
+                    chain={symbol: True},
+                )
+            return
+
+        if delta is None:
+            self._batch.append({"symbol": symbol, "data": update.data})
+        else:
+            self._batch.append({"symbol": symbol, "delta": delta})
+        if self.delta and self.encoding == "json":
+            # The first entry per symbol decides what the frame depends on
+            self._batch_chain.setdefault(symbol, delta is not None)
+        if len(self._batch) >= MAX_BATCH_SIZE:
+            self._flush_batch()
+        elif self._batch_timer is None:
+            # The dispatcher enqueues a whole upstream frame without yielding,
+            # so call_soon fires only after every trade in it has been added
+            loop = asyncio.get_running_loop()
+            if self.batch_window:
+                self._batch_timer = loop.call_later(
+                    self.batch_window, self._flush_batch
+                )
+            else:
+                self._batch_timer = loop.call_soon(self._flush_batch)
+
+    def _flush_batch(self):
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        if not self._batch:
+            return
+        updates, self._batch = self._batch, []
+        chain, self._batch_chain = self._batch_chain or None, {}
+        metrics.ws_batched_updates += len(updates)
+        if self.encoding == "binary":
+            metrics.ws_payload_encodes += 1
+            self.put(wire_format.pack_batch(updates))
+        else:
+            self.put(
+                encode_message({"type": "price_batch", "updates": updates}),
+                chain=chain,
+            )
+
+    def close(self):
+        """Stop the writer task and discard anything still queued"""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        self._pending.clear()
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        self._batch.clear()
+        self._batch_chain.clear()
+        self._last_sent.clear()
+        self._since_keyframe.clear()
+        self._queue.clear()
+        self._queued_symbols.clear()
+        self.pending_bytes = 0
+        self._behind_since = None
+        if self.task is not asyncio.current_task():
+            self.task.cancel()
+
+    def snapshot(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "pending_bytes": self.pending_bytes,
+            "lag_ms": round(self.lag() * 1000, 1),
+            "lagging": self.lagging,
+            "dropped": self.dropped,
+            "conflated": self.conflated,
+            "throttled_symbols": len(self.throttle),
+            "batching": self.batch_window is not None,
+            "encoding": self.encoding,
+            "delta": self.delta,
+            "send_latency": self.send_latency.snapshot(),
+        }
+
+    async def _run(self):
+        while True:
+            if not self._queue:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            message = self._pop()[1]
+            started = time.perf_counter()
+            try:
+                if isinstance(message, str):
+                    await self.websocket.send_text(message)
+                else:
+                    await self.websocket.send_bytes(message)
+            except Exception as e:
+                print(f"❌ Failed to send message to client {self.client_id}: {e}")
+                # Remove client if connection is broken
+                self._on_error(self.client_id)
+                return
+            self._behind_since = self._queue[0][0] if self._queue else None
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.send_latency.record(elapsed_ms)
+            metrics.ws_send_latency.record(elapsed_ms)
+            metrics.ws_messages_sent += 1
+            if self.lagging and self.lag() < MAX_LAG_S / 2:
+                self.lagging = False
 
 
 class ClientManager:
@@ -19,9 +598,12 @@ class ClientManager:
         # Dictionary mapping client_id to WebSocket connection
         self.clients: Dict[str, WebSocket] = {}
 
+        # Dictionary mapping client_id to its outbound queue/writer
+        self.outboxes: Dict[str, ClientOutbox] = {}
+
     def add_client(self, websocket: WebSocket) -> str:
         """
-        Add a new client connection
+        Add a new client connection and start its writer task
 
         Args:
             websocket: WebSocket connection from client
@@ -31,6 +613,9 @@ class ClientManager:
         """
         client_id = str(uuid.uuid4())
         self.clients[client_id] = websocket
+        self.outboxes[client_id] = ClientOutbox(
+            client_id, websocket, self.remove_client
+        )
         print(f"➕ Client added: {client_id} (Total: {len(self.clients)})")
         return client_id
 
@@ -41,6 +626,9 @@ class ClientManager:
         Args:
             client_id: Unique identifier for the client
         """
+        outbox = self.outboxes.pop(client_id, None)
+        if outbox:
+            outbox.close()
         if client_id in self.clients:
             del self.clients[client_id]
             print(f"➖ Client removed: {client_id} (Total: {len(self.clients)})")
@@ -75,45 +663,193 @@ class ClientManager:
         """
         return len(self.clients)
 
-    async def send_to_client(self, client_id: str, message: dict):
+    def enqueue(self, client_id: str, message: Payload) -> bool:
+        """
+        Queue a message for a specific client without waiting for the send
+
+        Args:
+            client_id: Unique identifier for the client
+            message: Message dictionary, or pre-encoded JSON text / bytes
+
+        Returns:
+            True if the client exists and nothing was dropped
+        """
+        outbox = self.outboxes.get(client_id)
+        if outbox is None:
+            return False
+        return outbox.put(message)
+
+    def enqueue_update(self, client_id: str, update: PriceUpdate):
+        """
+        Queue a price update, honouring the client's throttle and batching
+
+        Args:
+            client_id: Unique identifier for the client
+            update: Shared update for one trade
+        """
+        outbox = self.outboxes.get(client_id)
+        if outbox is not None:
+            outbox.put_update(update)
+
+    def enqueue_snapshot(self, client_id: str, update: PriceUpdate) -> bool:
+        """
+        Queue a cached update for a client that just subscribed
+
+        Args:
+            client_id: Unique identifier for the client
+            update: Last cached update for the symbol
+
+        Returns:
+            True if queued; False if the client is gone or already has it
+        """
+        outbox = self.outboxes.get(client_id)
+        return outbox is not None and outbox.put_snapshot(update)
+
+    def set_encoding(self, client_id: str, encoding: str):
+        """
+        Choose the wire encoding for a client's price data
+
+        Args:
+            client_id: Unique identifier for the client
+            encoding: One of ``wire_format.ENCODINGS``
+        """
+        if encoding not in wire_format.ENCODINGS:
+            raise ValueError(f"Unknown encoding: {encoding}")
+        outbox = self.outboxes.get(client_id)
+        if outbox is not None:
+            outbox.set_encoding(encoding)
+
+    def set_delta(self, client_id: str, enabled: bool):
+        """
+        Opt a JSON client in or out of delta-encoded price updates
+
+        Args:
+            client_id: Unique identifier for the client
+            enabled: Whether to send ``price_delta`` between keyframes
+        """
+        outbox = self.outboxes.get(client_id)
+        if outbox is not None:
+            outbox.set_delta(enabled)
+
+    def set_batching(self, client_id: str, enabled: bool, batch_ms: int = 0):
+        """
+        Opt a client in or out of ``price_batch`` frames
+
+        Args:
+            client_id: Unique identifier for the client
+            enabled: Whether to bundle updates into ``price_batch`` frames
+            batch_ms: Collection window; 0 bundles per upstream frame
+        """
+        outbox = self.outboxes.get(client_id)
+        if outbox is not None:
+            outbox.set_batching(enabled, batch_ms)
+
+    def set_throttle(self, client_id: str, symbols: list[str], throttle_ms: int):
+        """
+        Set the conflation interval for a client's symbols
+
+        Args:
+            client_id: Unique identifier for the client
+            symbols: Upper-cased symbols the interval applies to
+            throttle_ms: Minimum milliseconds between updates (0 = every tick)
+        """
+        outbox = self.outboxes.get(client_id)
+        if outbox is None:
+            return
+        for symbol in symbols:
+            outbox.set_throttle(symbol, throttle_ms)
+
+    def discard_symbols(self, client_id: str, symbols: list[str]):
+        """
+        Drop throttle state and pending updates for unsubscribed symbols
+
+        Args:
+            client_id: Unique identifier for the client
+            symbols: Upper-cased symbols to forget
+        """
+        outbox = self.outboxes.get(client_id)
+        if outbox is None:
+            return
+        for symbol in symbols:
+            outbox.discard_symbol(symbol)
+
+    async def send_to_client(self, client_id: str, message: Payload):
         """
         Send a message to a specific client
 
+        The message is queued on the client's outbox and written by its
+        writer task, so this never waits on the network.
+
         Args:
             client_id: Unique identifier for the client
-            message: Message dictionary to send
+            message: Message dictionary, or pre-encoded JSON text / bytes
         """
-        client = self.get_client(client_id)
-        if client:
-            try:
-                await client.send_json(message)
-                metrics.ws_messages_sent += 1
-            except Exception as e:
-                print(f"❌ Failed to send message to client {client_id}: {e}")
-                # Remove client if connection is broken
-                self.remove_client(client_id)
+        self.enqueue(client_id, message)
 
-    async def broadcast(self, message: dict, exclude_client: str | None = None):
+    async def broadcast(self, message: Payload, exclude_client: str | None = None):
         """
         Broadcast a message to all connected clients
 
+        Dicts are encoded once up front and the same text is shared by
+        every recipient.
+
         Args:
-            message: Message dictionary to broadcast
+            message: Message dictionary, or pre-encoded JSON text / bytes
             exclude_client: Optional client_id to exclude from broadcast
         """
-        disconnected_clients = []
+        recipients = [
+            outbox
+            for client_id, outbox in self.outboxes.items()
+            if client_id != exclude_client
+        ]
+        if not recipients:
+            return
+        if isinstance(message, dict):
+            # Only count the sharing this call did; pre-encoded payloads
+            # were never going to be encoded per client here
+            message = encode_message(message)
+            metrics.ws_payload_encodes_saved += len(recipients) - 1
+        for outbox in recipients:
+            outbox.put(message)
 
-        for client_id, client in self.clients.items():
-            if client_id == exclude_client:
-                continue
+    def outbound_snapshot(self) -> dict:
+        """
+        Queue depth, drop and send latency figures for /metrics?detail=clients
 
-            try:
-                await client.send_json(message)
-                metrics.ws_messages_sent += 1
-            except Exception as e:
-                print(f"❌ Failed to broadcast to client {client_id}: {e}")
-                disconnected_clients.append(client_id)
+        Returns:
+            Aggregate totals plus a per-client breakdown
+        """
+        return {
+            **self.outbound_totals(),
+            "clients": {
+                client_id: outbox.snapshot()
+                for client_id, outbox in self.outboxes.items()
+            },
+        }
 
-        # Remove disconnected clients
-        for client_id in disconnected_clients:
-            self.remove_client(client_id)
+    def outbound_totals(self) -> dict:
+        """
+        Aggregate outbound queue figures, without the per-client breakdown
+
+        Reads counters only (no latency histograms), so it stays cheap with
+        many clients; used by the sampled /metrics payload and the
+        Prometheus exporter.
+        """
+        outboxes = self.outboxes.values()
+        now = time.monotonic()
+        depths = [outbox.queue_depth for outbox in outboxes]
+        lag_s = max((outbox.lag(now) for outbox in outboxes), default=0.0)
+        return {
+            "policy": BACKPRESSURE_POLICY,
+            "queue_capacity": SEND_QUEUE_SIZE,
+            "max_pending_bytes": MAX_PENDING_BYTES,
+            "max_lag_ms": MAX_LAG_S * 1000,
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "pending_bytes_total": sum(outbox.pending_bytes for outbox in outboxes),
+            "lag_ms_max": round(lag_s * 1000, 1),
+            "lagging_clients": sum(outbox.lagging for outbox in outboxes),
+            "messages_dropped": metrics.ws_messages_dropped,
+            "slow_clients": metrics.ws_slow_clients,
+            "clients_evicted": metrics.ws_clients_evicted,
+        }
@@ -0,0 +1,67 @@
+"""
+JSON codec for the hot paths: Finnhub ingest, the market bus and /ws egress.
+
+Uses orjson when it is installed and the stdlib ``json`` module otherwise.
+Both produce compact UTF-8 JSON (no spaces, non-ASCII kept as-is), the
+same form Starlette's ``send_json`` produced. Set ``JSON_CODEC=json`` to
+force the stdlib backend.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Callable, NamedTuple
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+# Raised by ``loads`` for either backend (orjson's error subclasses it)
+JSONDecodeError = json.JSONDecodeError
+
+
+class Codec(NamedTuple):
+    name: str
+    dumps: Callable[[Any], str]
+    dumps_bytes: Callable[[Any], bytes]
+    loads: Callable[[str | bytes], Any]
+
+
+def _json_dumps(obj: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+CODECS: dict[str, Codec] = {
+    "json": Codec(
+        "json",
+        _json_dumps,
+        lambda obj: _json_dumps(obj).encode(),
+        json.loads,
+    )
+}
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    CODECS["orjson"] = Codec(
+        "orjson",
+        lambda obj: orjson.dumps(obj, option=_ORJSON_OPTIONS).decode(),
+        lambda obj: orjson.dumps(obj, option=_ORJSON_OPTIONS),
+        orjson.loads,
+    )
+
+_requested = os.getenv("JSON_CODEC", "").strip().lower()
+codec = CODECS.get(_requested) or CODECS.get("orjson") or CODECS["json"]
+
+BACKEND = codec.name
+
+# Serialize to str (WebSocket text frames)
+dumps = codec.dumps
+
+# Serialize to UTF-8 bytes (sockets, HTTP bodies)
+dumps_bytes = codec.dumps_bytes
+
+# Parse str or bytes
+loads = codec.loads
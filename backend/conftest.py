@@ -0,0 +1,9 @@
+"""pytest configuration: the backend uses flat imports (``import metrics``)"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Manual script that needs a running server (python test_websocket.py)
+collect_ignore = ["test_websocket.py"]
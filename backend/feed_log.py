@@ -0,0 +1,284 @@
+"""
+Feed Log
+Records raw Finnhub frames to disk and replays them as an upstream source
+
+Set ``FEED_RECORD_PATH`` to append every frame the Finnhub connection(s)
+receive to a log. Set ``FEED_REPLAY_PATH`` to run the server against a log
+instead of Finnhub: ``FeedReplay`` has the same interface as
+``FinnhubWebSocketManager`` and feeds the recorded trades to the
+subscription manager at 1x, Nx or max speed, with no network or API key.
+
+One frame per line, prefixed with its receive time in microseconds:
+
+    1720000000123456<TAB>{"data":[...],"type":"trade"}
+
+Paths ending in ``.gz`` are gzip-compressed (a market session shrinks
+roughly 10x).
+"""
+
+import asyncio
+import gzip
+import os
+import queue
+import threading
+import time
+import zlib
+from typing import IO, Callable, Iterator, Optional, Set, Tuple
+
+import codec
+
+# Batched bytes before the recorder writes, and seconds between file flushes
+WRITE_BUFFER_BYTES = 256 * 1024
+FLUSH_INTERVAL_S = 1.0
+
+
+def _open(path: str, mode: str) -> IO[bytes]:
+    if path.endswith(".gz"):
+        # Low compression level: recording must keep up with the live feed
+        return gzip.open(path, mode, compresslevel=1)
+    return open(path, mode)
+
+
+class FeedRecorder:
+    """
+    Appends raw upstream frames with their receive time
+
+    ``record`` only timestamps the frame and puts it on a queue; a writer
+    thread batches, compresses and writes the lines, so neither disk I/O
+    nor gzip runs on the event loop.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.frames = 0
+        self._file: IO[bytes] = _open(path, "ab")
+        # bytes: a line; Event: flush, then set; None: write, close and exit
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._closed = False
+        self._writer = threading.Thread(
+            target=self._write_loop, name="feed-recorder", daemon=True
+        )
+        self._writer.start()
+        print(f"⏺️  Recording Finnhub feed to {path}")
+
+    def record(self, frame: str | bytes, received_us: Optional[int] = None):
+        """
+        Queue one raw frame as received (before parsing)
+
+        Args:
+            frame: Text or bytes exactly as read from the upstream socket
+            received_us: Receive time in µs since the epoch (default: now)
+        """
+        if self._closed:
+            return  # Closed at shutdown; late frames are not recorded
+        if isinstance(frame, str):
+            frame = frame.encode()
+        if received_us is None:
+            received_us = time.time_ns() // 1000
+        self._queue.put(b"%d\t%s\n" % (received_us, frame))
+        self.frames += 1
+
+    def flush(self):
+        """Block until every frame recorded so far is written and flushed"""
+        if self._closed:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        while not done.wait(0.1):
+            if not self._writer.is_alive():
+                return
+
+    def close(self):
+        """Write what is queued and close; writes the gzip trailer for ``.gz``"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+
+    def _write_loop(self):
+        batch: list[bytes] = []
+        batched = 0
+        flushed_at = time.monotonic()
+        try:
+            while True:
+                timeout = max(0.0, flushed_at + FLUSH_INTERVAL_S - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = False  # Flush interval reached with nothing queued
+                due = time.monotonic() - flushed_at >= FLUSH_INTERVAL_S
+                if isinstance(item, bytes):
+                    batch.append(item)
+                    batched += len(item)
+                    if batched < WRITE_BUFFER_BYTES and not due:
+                        continue
+                if batch:
+                    self._file.write(b"".join(batch))
+                    batch.clear()
+                    batched = 0
+                if item is None:
+                    break
+                if due or not isinstance(item, bytes):
+                    self._file.flush()
+                    flushed_at = time.monotonic()
+                if isinstance(item, threading.Event):
+                    item.set()
+        except OSError as e:
+            self._closed = True
+            print(f"❌ Feed recording stopped: {e}")
+        finally:
+            self._file.close()
+
+
+def read_frames(path: str) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yield ``(receive time in µs, raw frame)`` from a feed log
+
+    A log cut short by a kill or crash (a ``.gz`` without its trailer, or a
+    half-written last line) ends after its last complete frame.
+
+    Args:
+        path: Log written by ``FeedRecorder``
+    """
+    with _open(path, "rb") as f:
+        try:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Truncated last line
+                ts, sep, frame = line[:-1].partition(b"\t")
+                if sep and frame:
+                    yield int(ts), frame
+        except (EOFError, gzip.BadGzipFile, zlib.error):
+            print(f"⚠️  {path} is truncated; stopped after the last complete frame")
+
+
+def parse_speed(value: str) -> float:
+    """``"max"`` (or 0) means no pacing; otherwise a playback multiplier"""
+    value = value.strip().lower()
+    if value in ("", "max"):
+        return 0.0
+    return max(0.0, float(value.removesuffix("x")))
+
+
+class FeedReplay:
+    """
+    Upstream source that plays a feed log into the message handler
+
+    Drop-in for ``FinnhubWebSocketManager``: like Finnhub, it only delivers
+    trades for subscribed symbols. Replay starts on ``connect`` and keeps
+    the recorded gaps between frames, divided by ``speed`` (0 = max speed).
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = False):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.message_handler: Optional[Callable] = None
+        self.connected = False
+        self.symbols: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+        self.frames_replayed = 0
+        self.trades_replayed = 0
+        self.finished = asyncio.Event()
+
+    @classmethod
+    def from_env(cls, path: str) -> "FeedReplay":
+        return cls(
+            path,
+            speed=parse_speed(os.getenv("FEED_REPLAY_SPEED", "1")),
+            loop=os.getenv("FEED_REPLAY_LOOP", "0") == "1",
+        )
+
+    def set_message_handler(self, handler: Callable):
+        """Set the callback function to handle incoming messages"""
+        self.message_handler = handler
+
+    async def connect(self):
+        """Start playing the log"""
+        if not os.path.exists(self.path):
+            raise ValueError(f"Feed log not found: {self.path}")
+        self.connected = True
+        self.finished.clear()
+        self._task = asyncio.create_task(self._play())
+        speed = f"{self.speed:g}x" if self.speed else "max speed"
+        print(f"▶️  Replaying Finnhub feed from {self.path} at {speed}")
+
+    async def disconnect(self):
+        """Stop playback"""
+        self.connected = False
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    async def subscribe(self, symbols: list[str]):
+        self.symbols.update(s.upper() for s in symbols)
+
+    async def unsubscribe(self, symbols: list[str]):
+        self.symbols.difference_update(s.upper() for s in symbols)
+
+    def snapshot(self) -> dict:
+        """Replay progress for /metrics"""
+        return {
+            "replay": self.path,
+            "speed": self.speed or "max",
+            "connected": self.connected,
+            "symbols": len(self.symbols),
+            "frames_replayed": self.frames_replayed,
+            "trades_replayed": self.trades_replayed,
+        }
+
+    async def _play(self):
+        try:
+            while True:
+                await self._play_once()
+                if not self.loop:
+                    break
+        except Exception as e:
+            print(f"❌ Feed replay failed: {e}")
+        finally:
+            self.finished.set()
+        print(f"⏹️  Feed replay finished ({self.frames_replayed} frames)")
+
+    async def _play_once(self):
+        first_ts: Optional[int] = None
+        started = time.perf_counter()
+        for ts, frame in read_frames(self.path):
+            if not self.connected:
+                return
+            delay = 0.0
+            if self.speed:
+                if first_ts is None:
+                    first_ts = ts
+                # Pace against the start time so sleep overshoot doesn't add up
+                due = started + (ts - first_ts) / 1e6 / self.speed
+                delay = max(0.0, due - time.perf_counter())
+            # Always yield once per frame, like a socket read: at max speed
+            # the client writers would otherwise never run between frames
+            # and their queues would overflow
+            await asyncio.sleep(delay)
+
+            try:
+                message = codec.loads(frame)
+            except codec.JSONDecodeError as e:
+                print(f"❌ Failed to parse recorded frame: {e}")
+                continue
+            if message.get("type") != "trade":
+                continue
+
+            trades = [
+                trade
+                for trade in message.get("data", ())
+                if trade.get("s", "").upper() in self.symbols
+            ]
+            if not trades:
+                continue
+            message["data"] = trades
+            self.frames_replayed += 1
+            self.trades_replayed += len(trades)
+            if self.message_handler:
+                await self.message_handler(message)
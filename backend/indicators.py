@@ -0,0 +1,120 @@
+"""Incremental per-symbol indicators (VWAP, EMAs, rolling volatility)."""
+
+from __future__ import annotations
+
+import os
+from collections import deque
+
+# EMA periods, in trades
+EMA_PERIODS = (12, 26)
+
+# Trades in the rolling standard deviation window
+INDICATOR_WINDOW = max(2, int(os.getenv("INDICATOR_WINDOW", "100")))
+
+# Minimum spacing between indicators messages per symbol
+INDICATOR_INTERVAL_MS = max(1, int(os.getenv("INDICATOR_INTERVAL_MS", "1000")))
+
+
+class IndicatorState:
+    """
+    Running indicators for one symbol, each updated in O(1) per trade.
+
+    * VWAP: cumulative price x volume over cumulative volume since the
+      symbol started streaming.
+    * EMA: ``alpha = 2 / (period + 1)``, seeded with the first price.
+    * Stddev: sample standard deviation of the last ``window`` prices from
+      running sums. Prices are shifted by the first one seen so the sums
+      stay small and the variance doesn't lose precision to cancellation.
+    """
+
+    __slots__ = (
+        "trades",
+        "timestamp",
+        "_pv",
+        "_volume",
+        "_emas",
+        "_window",
+        "_shift",
+        "_sum",
+        "_sumsq",
+    )
+
+    def __init__(self, window: int = INDICATOR_WINDOW) -> None:
+        self.trades = 0
+        self.timestamp: int | None = None
+        self._pv = 0.0
+        self._volume = 0.0
+        self._emas: dict[int, float] = {}
+        self._window: deque[float] = deque(maxlen=window)
+        self._shift: float | None = None
+        self._sum = 0.0
+        self._sumsq = 0.0
+
+    def update(self, price: float, volume: float, timestamp: int | None) -> None:
+        self.trades += 1
+        if timestamp is not None:
+            self.timestamp = timestamp
+
+        self._pv += price * volume
+        self._volume += volume
+
+        for period in EMA_PERIODS:
+            previous = self._emas.get(period)
+            if previous is None:
+                self._emas[period] = price
+            else:
+                self._emas[period] = previous + (price - previous) * 2 / (period + 1)
+
+        if self._shift is None:
+            self._shift = price
+        value = price - self._shift
+        if len(self._window) == self._window.maxlen:
+            oldest = self._window[0]
+            self._sum -= oldest
+            self._sumsq -= oldest * oldest
+        self._window.append(value)
+        self._sum += value
+        self._sumsq += value * value
+
+    def vwap(self) -> float | None:
+        return self._pv / self._volume if self._volume else None
+
+    def stddev(self) -> float | None:
+        n = len(self._window)
+        if n < 2:
+            return None
+        variance = (self._sumsq - self._sum * self._sum / n) / (n - 1)
+        return max(variance, 0.0) ** 0.5
+
+    def to_dict(self) -> dict:
+        return {
+            "vwap": self.vwap(),
+            "ema": {str(period): value for period, value in self._emas.items()},
+            "stddev": self.stddev(),
+            "window": len(self._window),
+            "trades": self.trades,
+            "timestamp": self.timestamp,
+        }
+
+
+class IndicatorEngine:
+    """An ``IndicatorState`` for every streamed symbol."""
+
+    def __init__(self, window: int = INDICATOR_WINDOW) -> None:
+        self.window = window
+        self._states: dict[str, IndicatorState] = {}
+
+    def on_trade(
+        self, symbol: str, price: float, volume: float, timestamp: int | None
+    ) -> IndicatorState:
+        state = self._states.get(symbol)
+        if state is None:
+            state = self._states[symbol] = IndicatorState(self.window)
+        state.update(price, volume, timestamp)
+        return state
+
+    def get(self, symbol: str) -> IndicatorState | None:
+        return self._states.get(symbol)
+
+    def discard(self, symbol: str) -> None:
+        self._states.pop(symbol, None)
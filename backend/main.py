@@ -3,6 +3,7 @@ FastAPI WebSocket Server for Real-time Stock Data
 Connects to Finnhub WebSocket and broadcasts to connected clients
 """
 
+import asyncio
 import logging
 import os
 import platform
@@ -14,15 +15,37 @@ import time
 import fastapi
 import uvicorn
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi import (
+    FastAPI,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
 from fastapi.staticfiles import StaticFiles
-from starlette.responses import FileResponse
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse
 
+from access_log import AccessLogMiddleware, real_ip, start_queue_logging
 import activity_log
+import codec
 import metrics
-from websocket_manager import FinnhubWebSocketManager
-from client_manager import ClientManager
-from subscription_manager import SubscriptionManager
+import prometheus
+from snapshots import SNAPSHOT_INTERVAL_MS, SnapshotSampler
+from telemetry import TelemetryHub
+import wire_format
+from upstream_pool import FinnhubConnectionPool
+from market_bus import MarketBusClient
+from feed_log import FeedReplay
+from websocket_manager import feed_recorder
+from client_manager import DELTA_KEYFRAME_EVERY, ClientManager
+from subscription_manager import INDICATORS_CHANNEL, TRADES_CHANNEL, SubscriptionManager
+from alerts import Alert
+from quote_cache import QuoteCache
+from tick_history import TickHistory
+from bars import INTERVALS as BAR_INTERVALS, BarAggregator
+from indicators import INDICATOR_INTERVAL_MS
 from ai_provider import AIProviderError, AIProviderRateLimitError, GeminiChatProvider
 from chat_service import ChatRequestIn, ChatResponseBody, handle_chat_request
 
@@ -34,9 +57,34 @@ logging.basicConfig(level=logging.INFO)
 APP_VERSION = "1.0.0"
 STATIC_DIR = Path(__file__).resolve().parent / "static"
 
-finnhub_manager = FinnhubWebSocketManager()
+# With MARKET_BUS_SOCKET set, this worker gets trades from the shared ingest
+# process (market_bus.py) instead of opening its own Finnhub connection(s)
+MARKET_BUS_SOCKET = os.getenv("MARKET_BUS_SOCKET", "").strip()
+
+# With FEED_REPLAY_PATH set, trades come from a recorded feed log instead
+# (offline load tests; no API key or network needed)
+FEED_REPLAY_PATH = os.getenv("FEED_REPLAY_PATH", "").strip()
+
+if FEED_REPLAY_PATH:
+    UPSTREAM_NAME = "feed replay"
+    finnhub_manager = FeedReplay.from_env(FEED_REPLAY_PATH)
+elif MARKET_BUS_SOCKET:
+    UPSTREAM_NAME = "market bus"
+    finnhub_manager = MarketBusClient(MARKET_BUS_SOCKET)
+else:
+    UPSTREAM_NAME = "Finnhub WebSocket"
+    finnhub_manager = FinnhubConnectionPool()
 client_manager = ClientManager()
-subscription_manager = SubscriptionManager(finnhub_manager, client_manager)
+quote_cache = QuoteCache()
+tick_history = TickHistory()
+bar_aggregator = BarAggregator()
+subscription_manager = SubscriptionManager(
+    finnhub_manager,
+    client_manager,
+    quote_cache=quote_cache,
+    tick_history=tick_history,
+    bar_aggregator=bar_aggregator,
+)
 
 API_DESCRIPTION = """
 Real-Time Market Data API — WebSocket streaming, AI chat, health, and metrics.
@@ -48,14 +96,61 @@ Real-Time Market Data API — WebSocket streaming, AI chat, health, and metrics.
 {"action": "subscribe", "symbols": ["AAPL", "NVDA"]}
 ```
 
+Add `"throttle_ms": 250` to receive at most one update per symbol every
+250 ms (latest price wins) instead of every trade.
+
+Add `"batch": true` (optionally with `"batch_ms": 50`) to receive
+`price_batch` frames bundling every update from one upstream frame, or
+from each `batch_ms` window, instead of one `price_update` per trade.
+
+Connect with `/ws?encoding=binary` (or add `"encoding": "binary"` to a
+subscribe) to receive price data as compact little-endian binary frames;
+the subscription ack then carries `symbol_ids` mapping each symbol to the
+id used in those frames. See `wire_format.py` for the record layout.
+
+JSON clients can add `"delta": true` to receive `price_delta` messages
+carrying only the fields that changed since their previous update for that
+symbol, with a full `price_update` keyframe first and then periodically
+(`keyframe_every` in the ack); binary clients get `"delta": false`.
+`timestamp` is replaced by `dt`, the offset in ms from the previous update.
+If a frame is dropped for a slow client, the deltas that depended on it
+are dropped too and the symbol restarts with a keyframe, so a delta always
+applies to the last frame received.
+
+Add `"channel": "bars:1m"` (or `bars:1s`, `bars:5m`) to receive completed
+OHLCV `bar` messages for the symbols instead of trades; unsubscribe with the
+same channel. The default channel is `trades`.
+
+`"channel": "indicators"` instead delivers low-rate `indicators` messages
+(running VWAP, EMAs and rolling standard deviation, at most one per symbol
+per `interval_ms` in the ack) without the full-rate trade stream.
+
 **Client → server (unsubscribe):**
 ```json
 {"action": "unsubscribe", "symbols": ["AAPL"]}
 ```
 
+**Client → server (price alerts):**
+```json
+{"action": "add_alerts", "alerts": [
+  {"id": "a1", "symbol": "AAPL", "alert_type": "price_above", "threshold": 200}
+]}
+{"action": "remove_alerts", "ids": ["a1"]}
+```
+
+Alerts (`price_above` / `price_below`) are evaluated server-side against
+every trade and live as long as the connection. Each one fires once: the
+owner gets an `alert_triggered` message and the alert is removed. Adding an
+alert with an existing id replaces it.
+
+Alerts are not persisted: they are dropped when the connection closes, so
+an alert only fires while a client that registered it is connected, and
+clients must re-add their alerts after every reconnect. Crossings that
+happen while no client is connected are not reported.
+
 **Server → client (connection):**
 ```json
-{"type": "connection", "status": "connected", "client_id": "uuid"}
+{"type": "connection", "status": "connected", "client_id": "uuid", "encoding": "json"}
 ```
 
 **Server → client (price update):**
@@ -67,6 +162,53 @@ Real-Time Market Data API — WebSocket streaming, AI chat, health, and metrics.
 }
 ```
 
+**Server → client (price delta, opt-in):**
+```json
+{"type": "price_delta", "symbol": "AAPL", "data": {"price": 150.26, "dt": 1}}
+```
+
+**Server → client (price batch, opt-in):**
+```json
+{
+  "type": "price_batch",
+  "updates": [
+    {"symbol": "AAPL", "data": {"price": 150.25, "volume": 100, "timestamp": 1234567890}},
+    {"symbol": "NVDA", "data": {"price": 880.1, "volume": 20, "timestamp": 1234567891}}
+  ]
+}
+```
+
+**Server → client (completed bar, `bars:*` channels):**
+```json
+{
+  "type": "bar",
+  "symbol": "AAPL",
+  "interval": "1m",
+  "bar": {"start": 1720000020000, "open": 150.1, "high": 150.4, "low": 150.0,
+          "close": 150.3, "volume": 1200.0, "trades": 42}
+}
+```
+
+**Server → client (indicators, `indicators` channel):**
+```json
+{
+  "type": "indicators",
+  "symbol": "AAPL",
+  "data": {"vwap": 150.21, "ema": {"12": 150.28, "26": 150.19}, "stddev": 0.042,
+           "window": 100, "trades": 5120, "timestamp": 1720000020000}
+}
+```
+
+**Server → client (alert triggered):**
+```json
+{
+  "type": "alert_triggered",
+  "alert": {"id": "a1", "symbol": "AAPL", "alert_type": "price_above", "threshold": 200.0},
+  "price": 200.05,
+  "timestamp": 1720000020000
+}
+```
+
 **Server → client (subscription ack):**
 ```json
 {"type": "subscription", "status": "subscribed", "symbols": ["AAPL"]}
@@ -103,6 +245,34 @@ def _short_id(client_id: str) -> str:
     return client_id.split("-")[0]
 
 
+MAX_THROTTLE_MS = 60_000
+MAX_BATCH_MS = 1_000
+
+# Client actions on /ws; anything else is counted as "unknown" in metrics
+WS_ACTIONS = ("subscribe", "unsubscribe", "add_alerts", "remove_alerts")
+
+
+def _int_field(data: dict, name: str, maximum: int) -> int:
+    """Validate an optional non-negative integer field of a /ws message."""
+    value = data.get(name, 0)
+    if (
+        isinstance(value, bool)
+        or not isinstance(value, int)
+        or not 0 <= value <= maximum
+    ):
+        raise ValueError(f"{name} must be an integer between 0 and {maximum}")
+    return value
+
+
+def _symbol_list(symbols: list[str], channel: str) -> str:
+    sym_list = ", ".join(s.upper() for s in symbols)
+    return sym_list if channel == TRADES_CHANNEL else f"{sym_list} ({channel})"
+
+
+def _encoding_error() -> str:
+    return "encoding must be one of: " + ", ".join(wire_format.ENCODINGS)
+
+
 def _deployment_info() -> dict:
     return {
         "environment": os.getenv("DEPLOYMENT_ENV", "development"),
@@ -115,9 +285,9 @@ def _deployment_info() -> dict:
     }
 
 
-def _health_payload(request: Request) -> dict:
+def _health_payload() -> dict:
     finnhub_ok = finnhub_manager.is_connected()
-    return {
+    payload = {
         "status": "healthy" if finnhub_ok else "degraded",
         "version": APP_VERSION,
         "server_time": metrics.server_time_iso(),
@@ -125,12 +295,21 @@ def _health_payload(request: Request) -> dict:
         "api": "ok",
         "websocket": "ok" if finnhub_ok else "degraded",
         "finnhub_connection": "connected" if finnhub_ok else "disconnected",
-        "ai_chat_enabled": getattr(request.app.state, "ai_chat_ready", False),
+        "ai_chat_enabled": getattr(app.state, "ai_chat_ready", False),
         "clients": client_manager.get_client_count(),
         "subscriptions": subscription_manager.get_subscription_count(),
         "subscribed_symbols": subscription_manager.get_subscribed_symbols(),
         "deployment": _deployment_info(),
     }
+    if isinstance(finnhub_manager, FinnhubConnectionPool):
+        # Healthy only if every shard is up; say which ones are down
+        states = finnhub_manager.connection_states()
+        payload["finnhub_connections"] = {
+            "connected": sum(states),
+            "total": len(states),
+            "down": [i for i, up in enumerate(states) if not up],
+        }
+    return payload
 
 
 @asynccontextmanager
@@ -140,8 +319,8 @@ async def lifespan(app: FastAPI):
     print("🚀 Starting server...")
     activity_log.record_event("info", "Server starting")
     await finnhub_manager.connect()
-    print("✅ Connected to Finnhub WebSocket")
-    activity_log.record_event("info", "Connected to Finnhub WebSocket")
+    print(f"✅ Connected to {UPSTREAM_NAME}")
+    activity_log.record_event("info", f"Connected to {UPSTREAM_NAME}")
 
     api_key = (os.getenv("GEMINI_API_KEY") or "").strip()
     chat_model = os.getenv("GEMINI_CHAT_MODEL", "gemini-3.1-flash-lite")
@@ -158,11 +337,18 @@ async def lifespan(app: FastAPI):
         app.state.ai_chat_ready = False
         print("⚠️  GEMINI_API_KEY not set — POST /ai/chat will return 503")
 
+    snapshot_sampler.start()
+    print(f"✅ Health/metrics snapshots refresh every {SNAPSHOT_INTERVAL_MS}ms")
+
     yield
 
     print("🛑 Shutting down server...")
+    await snapshot_sampler.stop()
     await finnhub_manager.disconnect()
-    print("✅ Disconnected from Finnhub WebSocket")
+    print(f"✅ Disconnected from {UPSTREAM_NAME}")
+    if feed_recorder:
+        # Writes the gzip trailer, so the log stays readable
+        feed_recorder.close()
 
 
 app = FastAPI(
@@ -176,53 +362,27 @@ app = FastAPI(
 # access_log=False) so that requests show the real client IP instead of the
 # proxy peer when running behind a reverse proxy. Reads X-Forwarded-For when
 # present; falls back to X-Real-IP, then the direct socket address for local dev.
-# Static asset requests are excluded to reduce log noise.
-access_logger = logging.getLogger("access")
+# Static asset requests are excluded to reduce log noise. Lines are written
+# by a background thread so the event loop never blocks on log I/O.
+start_queue_logging()
 
 _QUIET_PREFIXES = ("/static",)
-_ACTIVITY_SKIP_PATHS = {"/health", "/metrics", "/activity", "/favicon.ico"}
-
-
-def _real_ip(request: Request) -> str:
-    """Extract the original client IP from X-Forwarded-For (reverse proxy), or
-    fall back to X-Real-IP, then the direct socket address for local dev."""
-    forwarded = request.headers.get("x-forwarded-for")
-    if forwarded:
-        return forwarded.split(",")[0].strip()
-    real_ip = request.headers.get("x-real-ip")
-    if real_ip:
-        return real_ip.strip()
-    return request.client.host if request.client else "unknown"
-
-
-@app.middleware("http")
-async def access_log_middleware(request: Request, call_next):
-    path = request.url.path
-    if not path.startswith(_QUIET_PREFIXES):
-        metrics.http_requests_total += 1
-
-    start = time.perf_counter()
-    response = await call_next(request)
-    elapsed_ms = (time.perf_counter() - start) * 1000
-
-    if not path.startswith(_QUIET_PREFIXES):
-        metrics.rest_api_latency.record(elapsed_ms)
-        access_logger.info(
-            '%s - "%s %s" %s %.0fms',
-            _real_ip(request),
-            request.method,
-            path,
-            response.status_code,
-            elapsed_ms,
-        )
-        if path not in _ACTIVITY_SKIP_PATHS:
-            activity_log.record_event(
-                "http",
-                f'{request.method} {path} {response.status_code} {elapsed_ms:.0f}ms',
-                level="warn" if response.status_code >= 400 else "info",
-            )
+_ACTIVITY_SKIP_PATHS = {
+    "/health",
+    "/health/live",
+    "/metrics",
+    "/metrics/prometheus",
+    "/activity",
+    "/quotes",
+    "/favicon.ico",
+}
+
 
-    return response
+app.add_middleware(
+    AccessLogMiddleware,
+    quiet_prefixes=_QUIET_PREFIXES,
+    activity_skip_paths=_ACTIVITY_SKIP_PATHS,
+)
 
 
 if STATIC_DIR.is_dir():
@@ -238,12 +398,34 @@ async def dashboard():
     return FileResponse(index)
 
 
+_LIVE_BODY = codec.dumps_bytes({"status": "alive"})
+
+
+@app.get(
+    "/health/live",
+    summary="Liveness probe",
+    description=(
+        "Constant response for liveness checks: the process is up and serving "
+        "requests. Touches no other state."
+    ),
+    responses={
+        200: {
+            "description": "Process is alive",
+            "content": {"application/json": {"example": {"status": "alive"}}},
+        }
+    },
+)
+async def health_live():
+    return Response(content=_LIVE_BODY, media_type="application/json")
+
+
 @app.get(
     "/health",
     summary="Health check",
     description=(
-        "Operational health for load balancers and the dashboard. "
-        "Returns service status, Finnhub connectivity, and subscription snapshot."
+        "Readiness for load balancers and the dashboard: service status, "
+        "Finnhub connectivity, and subscription snapshot. Served from a "
+        "snapshot refreshed every SNAPSHOT_INTERVAL_MS (default 1s)."
     ),
     responses={
         200: {
@@ -268,8 +450,10 @@ async def dashboard():
         }
     },
 )
-async def health(request: Request):
-    return _health_payload(request)
+async def health():
+    return Response(
+        content=snapshot_sampler.body("health"), media_type="application/json"
+    )
 
 
 @app.get(
@@ -277,7 +461,18 @@ async def health(request: Request):
     summary="Runtime metrics",
     description=(
         "Operational monitoring: message counters, HTTP traffic, CPU/memory, "
-        "and subscription counts for the dashboard."
+        "and subscription counts for the dashboard. Served from a snapshot "
+        "refreshed every SNAPSHOT_INTERVAL_MS (default 1s).\n\n"
+        "`latency` holds one entry per tracker: `rest_api`, `ai_chat`, "
+        "`ws_message`, `finnhub`, `ws_send`, `upstream_reconnect` and "
+        "`upstream_first_tick`. Each has lifetime percentiles plus one entry "
+        "under `windows` per LATENCY_WINDOWS_S window (default `60s` and "
+        "`300s`) with the same fields; percentiles are `null` until a sample "
+        "is recorded. The example shows one tracker and one window.\n\n"
+        "`outbound` holds queue totals; pass `detail=clients` to add a "
+        "per-client breakdown (queue depth, lag, encoding, send latency) under "
+        "`outbound.clients`. That part is built per request rather than "
+        "sampled, as it grows with the number of clients."
     ),
     responses={
         200: {
@@ -290,6 +485,21 @@ async def health(request: Request):
                         "subscribed_symbols": ["AAPL", "NVDA"],
                         "ws_messages_sent": 1240,
                         "ws_messages_received": 87,
+                        "ws_messages_dropped": 0,
+                        "ws_payload_encodes": 980,
+                        "ws_payload_encodes_saved": 1960,
+                        "ws_updates_conflated": 0,
+                        "ws_batched_updates": 0,
+                        "ws_delta_updates": 0,
+                        "ws_delta_keyframes": 0,
+                        "alerts_active": 12,
+                        "alerts_triggered": 3,
+                        "bars_late_trades_patched": 0,
+                        "bars_late_trades_dropped": 0,
+                        "upstream_batches": 14,
+                        "upstream_linger_reuses": 6,
+                        "upstream_lingering": 1,
+                        "upstream_reconnects": 0,
                         "finnhub_messages_received": 980,
                         "http_requests_total": 412,
                         "uptime_seconds": 3600.5,
@@ -299,33 +509,84 @@ async def health(request: Request):
                         "server_time": "2026-07-03T11:00:00Z",
                         "latency": {
                             "rest_api": {
+                                "samples": 240,
                                 "avg_ms": 1.2,
+                                "p50_ms": 0.8,
+                                "p90_ms": 1.9,
+                                "p99_ms": 6.4,
+                                "p999_ms": 21.0,
+                                "max_ms": 24.5,
                                 "last_ms": 0.8,
-                                "samples": 100,
-                            },
-                            "ai_chat": {
-                                "avg_ms": 1240.0,
-                                "last_ms": 1100.0,
-                                "samples": 5,
-                            },
-                            "ws_message": {
-                                "avg_ms": 0.3,
-                                "last_ms": 0.2,
-                                "samples": 100,
-                            },
-                            "finnhub": {
-                                "avg_ms": 0.5,
-                                "last_ms": 0.4,
-                                "samples": 100,
+                                "windows": {
+                                    "60s": {
+                                        "samples": 240,
+                                        "avg_ms": 1.2,
+                                        "p50_ms": 0.8,
+                                        "p90_ms": 1.9,
+                                        "p99_ms": 6.4,
+                                        "p999_ms": 21.0,
+                                        "max_ms": 24.5,
+                                    },
+                                },
                             },
                         },
+                        "tick_history_bytes": 294912,
+                        "upstream": {
+                            "connections": [
+                                {
+                                    "index": 0,
+                                    "connected": True,
+                                    "symbols": 3,
+                                    "messages": 980,
+                                    "messages_per_s": 4.2,
+                                    "lag": {
+                                        "samples": 1800,
+                                        "avg_ms": 85.0,
+                                        "p50_ms": 78.0,
+                                        "p90_ms": 120.0,
+                                        "p99_ms": 310.0,
+                                        "p999_ms": 640.0,
+                                        "max_ms": 702.0,
+                                        "last_ms": 72.3,
+                                    },
+                                }
+                            ]
+                        },
+                        "outbound": {
+                            "policy": "drop_oldest",
+                            "queue_capacity": 256,
+                            "max_pending_bytes": 1048576,
+                            "max_lag_ms": 10000.0,
+                            "queue_depth_total": 0,
+                            "queue_depth_max": 0,
+                            "pending_bytes_total": 0,
+                            "lag_ms_max": 0.0,
+                            "lagging_clients": 0,
+                            "messages_dropped": 0,
+                            "slow_clients": 0,
+                            "clients_evicted": 0,
+                        },
                     }
                 }
             },
         }
     },
 )
-async def get_metrics():
+async def get_metrics(detail: str | None = None):
+    if detail is None:
+        return Response(
+            content=snapshot_sampler.body("metrics"), media_type="application/json"
+        )
+    if detail != "clients":
+        raise HTTPException(status_code=400, detail="detail must be: clients")
+    payload = {
+        **snapshot_sampler.payload("metrics"),
+        "outbound": client_manager.outbound_snapshot(),
+    }
+    return Response(content=codec.dumps_bytes(payload), media_type="application/json")
+
+
+def _metrics_payload() -> dict:
     stats = metrics.system_stats()
     return {
         "connected_clients": client_manager.get_client_count(),
@@ -333,22 +594,240 @@ async def get_metrics():
         "subscribed_symbols": subscription_manager.get_subscribed_symbols(),
         "ws_messages_sent": metrics.ws_messages_sent,
         "ws_messages_received": metrics.ws_messages_received,
+        "ws_messages_dropped": metrics.ws_messages_dropped,
+        "ws_payload_encodes": metrics.ws_payload_encodes,
+        "ws_payload_encodes_saved": metrics.ws_payload_encodes_saved,
+        "ws_updates_conflated": metrics.ws_updates_conflated,
+        "ws_batched_updates": metrics.ws_batched_updates,
+        "ws_delta_updates": metrics.ws_delta_updates,
+        "ws_delta_keyframes": metrics.ws_delta_keyframes,
+        "alerts_active": len(subscription_manager.alert_engine),
+        "alerts_triggered": metrics.alerts_triggered,
+        "bars_late_trades_patched": metrics.bars_late_trades_patched,
+        "bars_late_trades_dropped": metrics.bars_late_trades_dropped,
+        "upstream_batches": metrics.upstream_batches,
+        "upstream_linger_reuses": metrics.upstream_linger_reuses,
+        "upstream_lingering": subscription_manager.get_lingering_count(),
+        "upstream_reconnects": metrics.upstream_reconnects,
         "finnhub_messages_received": metrics.finnhub_messages_received,
         "http_requests_total": metrics.http_requests_total,
         "uptime_seconds": round(metrics.uptime_seconds(), 1),
         "server_time": metrics.server_time_iso(),
         **stats,
         "latency": metrics.latency_snapshot(),
+        "outbound": client_manager.outbound_totals(),
+        "tick_history_bytes": tick_history.memory_bytes(),
+        "upstream": finnhub_manager.snapshot(),
+    }
+
+
+# Builds both payloads once per interval so /health and /metrics only
+# return bytes; started in lifespan
+snapshot_sampler = SnapshotSampler(
+    {"health": _health_payload, "metrics": _metrics_payload}
+)
+
+
+@app.get(
+    "/metrics/prometheus",
+    summary="Prometheus metrics",
+    description=(
+        "The same runtime metrics in Prometheus text exposition format for "
+        "scraping: counters by HTTP route and status, WebSocket action and "
+        "symbol (ticks and fan-out), gauges, and latency histograms."
+    ),
+    response_class=PlainTextResponse,
+    responses={
+        200: {
+            "description": "Prometheus text format 0.0.4",
+            "content": {
+                "text/plain": {
+                    "example": (
+                        "# HELP stock_http_requests_total HTTP requests by "
+                        "method, route and status\n"
+                        "# TYPE stock_http_requests_total counter\n"
+                        'stock_http_requests_total{method="GET",route="/health",'
+                        'status="200"} 42\n'
+                        "# HELP stock_symbol_ticks_total Trades handled per "
+                        "subscribed symbol\n"
+                        "# TYPE stock_symbol_ticks_total counter\n"
+                        'stock_symbol_ticks_total{symbol="AAPL"} 1830\n'
+                    )
+                }
+            },
+        }
+    },
+)
+async def get_prometheus_metrics():
+    return PlainTextResponse(
+        prometheus.render(client_manager, subscription_manager, finnhub_manager),
+        media_type=prometheus.CONTENT_TYPE,
+    )
+
+
+MAX_QUOTE_SYMBOLS = 100
+
+
+@app.get(
+    "/quotes",
+    summary="Cached last trade prices",
+    description=(
+        "Latest trade per symbol from the in-memory last-value cache fed by the "
+        "Finnhub stream. Only symbols the server has streamed are available; the "
+        "rest are listed under `missing`. Supports `If-None-Match` (304)."
+    ),
+    responses={
+        200: {
+            "description": "Cached quotes",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "quotes": {
+                            "AAPL": {
+                                "price": 150.25,
+                                "volume": 100,
+                                "timestamp": 1234567890,
+                            }
+                        },
+                        "missing": ["IBM"],
+                    }
+                }
+            },
+        },
+        304: {"description": "Not modified since the supplied ETag"},
+        400: {"description": "No symbols, or more than 100"},
+    },
+)
+async def get_quotes(request: Request, symbols: str):
+    requested = list(
+        dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip())
+    )
+    if not requested or len(requested) > MAX_QUOTE_SYMBOLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Provide between 1 and {MAX_QUOTE_SYMBOLS} comma-separated symbols.",
+        )
+
+    etag, quotes, missing = quote_cache.lookup(requested)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse({"quotes": quotes, "missing": missing}, headers=headers)
+
+
+@app.get(
+    "/ticks/{symbol}",
+    summary="Recent ticks for a symbol",
+    description=(
+        "Short-term intraday history from the in-memory ring buffer of a "
+        "currently subscribed symbol, oldest first. `since` (ms epoch) returns "
+        "only newer ticks; `limit` keeps the newest N."
+    ),
+    responses={
+        200: {
+            "description": "Columnar tick data",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "symbol": "AAPL",
+                        "capacity": 4096,
+                        "timestamps": [1234567890, 1234567950],
+                        "prices": [150.25, 150.27],
+                        "volumes": [100.0, 25.0],
+                    }
+                }
+            },
+        },
+        404: {"description": "Symbol is not being streamed"},
+    },
+)
+async def get_ticks(symbol: str, since: int | None = None, limit: int = 1000):
+    ring = tick_history.get(symbol.upper())
+    if ring is None:
+        raise HTTPException(
+            status_code=404, detail=f"No tick history for {symbol.upper()}"
+        )
+    limit = max(1, min(limit, ring.capacity))
+    return {
+        "symbol": symbol.upper(),
+        "capacity": ring.capacity,
+        **ring.query(since=since, limit=limit),
+    }
+
+
+@app.get(
+    "/bars/{symbol}",
+    summary="OHLCV bars for a symbol",
+    description=(
+        "Bars aggregated in-process from the Finnhub trade stream of a currently "
+        "streamed symbol. `bars` are completed bars, oldest first (newest `limit` "
+        "kept); `current` is the bar still forming. Intervals: 1s, 1m, 5m."
+    ),
+    responses={
+        200: {
+            "description": "Completed and in-progress bars",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "symbol": "AAPL",
+                        "interval": "1m",
+                        "bars": [
+                            {
+                                "start": 1720000020000,
+                                "open": 150.1,
+                                "high": 150.4,
+                                "low": 150.0,
+                                "close": 150.3,
+                                "volume": 1200.0,
+                                "trades": 42,
+                            }
+                        ],
+                        "current": None,
+                    }
+                }
+            },
+        },
+        400: {"description": "Unknown interval"},
+        404: {"description": "Symbol is not being streamed"},
+    },
+)
+async def get_bars(symbol: str, interval: str = "1m", limit: int = 100):
+    if interval not in BAR_INTERVALS:
+        raise HTTPException(
+            status_code=400,
+            detail="interval must be one of: " + ", ".join(BAR_INTERVALS),
+        )
+    builder = bar_aggregator.get(symbol.upper(), interval)
+    if builder is None:
+        raise HTTPException(status_code=404, detail=f"No bars for {symbol.upper()}")
+    completed = list(builder.completed)[-max(1, limit):]
+    return {
+        "symbol": symbol.upper(),
+        "interval": interval,
+        "bars": [bar.to_dict() for bar in completed],
+        "current": builder.current.to_dict() if builder.current else None,
     }
 
 
 @app.get(
     "/activity",
     summary="Recent activity log",
-    description="Recent backend events for the dashboard activity panel.",
+    description=(
+        "Recent backend events for the dashboard activity panel, newest first. "
+        "Pass the largest `id` seen as `since` to get only newer events, and "
+        "`type` (e.g. `http`, `ws_connect`) to filter. `X-Activity-Last-Id` "
+        "is the newest id logged; if it is below your cursor the server "
+        "restarted and the cursor should be reset to 0."
+    ),
 )
-async def get_activity(limit: int = 50):
-    return activity_log.get_events(limit)
+async def get_activity(
+    response: Response,
+    limit: int = 50,
+    since: int = 0,
+    event_type: str | None = Query(None, alias="type"),
+):
+    response.headers["X-Activity-Last-Id"] = str(activity_log.last_id())
+    return activity_log.get_events(limit, since=since, event_type=event_type)
 
 
 @app.post(
@@ -373,7 +852,7 @@ async def ai_chat(http_request: Request, body: ChatRequestIn):
             detail="AI chat is not configured. Set GEMINI_API_KEY on the server.",
         )
 
-    client_ip = _real_ip(http_request)
+    client_ip = real_ip(http_request.scope)
 
     if not chat_rate_limiter.allow(client_ip):
         logger.warning("chat rate limit exceeded ip=%s", client_ip)
@@ -425,6 +904,37 @@ async def ai_chat(http_request: Request, body: ChatRequestIn):
         ) from None
 
 
+def _telemetry_payload() -> dict:
+    # Reuses the sampler's payloads as they are (shared, never mutated)
+    return {
+        "health": snapshot_sampler.payload("health"),
+        "metrics": snapshot_sampler.payload("metrics"),
+    }
+
+
+telemetry_hub = TelemetryHub(_telemetry_payload)
+
+
+@app.websocket("/telemetry")
+async def telemetry_endpoint(websocket: WebSocket):
+    """Dashboard telemetry: a snapshot, then shared deltas and new activity."""
+    await websocket.accept()
+
+    async def pump():
+        async for message in telemetry_hub.stream():
+            await websocket.send_text(message)
+
+    sender = asyncio.create_task(pump())
+    try:
+        # Viewers don't send anything; this just waits for the disconnect
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time stock subscriptions and price updates."""
@@ -437,47 +947,159 @@ async def websocket_endpoint(websocket: WebSocket):
     )
 
     async def ws_send(payload: dict) -> None:
-        await websocket.send_json(payload)
-        metrics.ws_messages_sent += 1
+        # Goes through the client's outbox so acks stay ordered with price
+        # updates and only the writer task ever touches the socket
+        await client_manager.send_to_client(client_id, payload)
+
+    # Price data encoding can be negotiated at connect (?encoding=binary)
+    # or later on subscribe; control messages are always JSON
+    encoding = websocket.query_params.get("encoding", "json")
+    bad_encoding = encoding not in wire_format.ENCODINGS
+    if bad_encoding:
+        encoding = "json"
+    client_manager.set_encoding(client_id, encoding)
 
     try:
         await ws_send(
-            {"type": "connection", "status": "connected", "client_id": client_id}
+            {
+                "type": "connection",
+                "status": "connected",
+                "client_id": client_id,
+                "encoding": encoding,
+            }
         )
+        if bad_encoding:
+            await ws_send({"type": "error", "message": _encoding_error()})
 
         while True:
-            data = await websocket.receive_json()
+            data = codec.loads(await websocket.receive_text())
             ws_start = time.perf_counter()
             metrics.ws_messages_received += 1
 
             action = data.get("action")
             symbols = data.get("symbols", [])
+            counted = action if action in WS_ACTIONS else "unknown"
+            metrics.ws_actions[counted] = metrics.ws_actions.get(counted, 0) + 1
+            channel = data.get("channel", TRADES_CHANNEL)
+            # Checked before the lookup: a list or object is unhashable
+            known_channel = (
+                isinstance(channel, str) and channel in subscription_manager.channels
+            )
 
             if action == "subscribe":
-                await subscription_manager.subscribe(client_id, symbols)
-                await ws_send(
-                    {"type": "subscription", "status": "subscribed", "symbols": symbols}
-                )
-                sym_list = ", ".join(s.upper() for s in symbols)
-                activity_log.record_event(
-                    "subscribe",
-                    f"Client {_short_id(client_id)} subscribed {sym_list}",
-                )
+                try:
+                    throttle_ms = _int_field(data, "throttle_ms", MAX_THROTTLE_MS)
+                    batch_ms = _int_field(data, "batch_ms", MAX_BATCH_MS)
+                    if data.get("encoding", encoding) not in wire_format.ENCODINGS:
+                        raise ValueError(_encoding_error())
+                    if not known_channel:
+                        raise ValueError(f"Unknown channel: {channel}")
+                except ValueError as e:
+                    await ws_send({"type": "error", "message": str(e)})
+                else:
+                    await subscription_manager.subscribe(
+                        client_id, symbols, throttle_ms=throttle_ms, channel=channel
+                    )
+                    ack = {
+                        "type": "subscription",
+                        "status": "subscribed",
+                        "symbols": symbols,
+                    }
+                    if channel != TRADES_CHANNEL:
+                        ack["channel"] = channel
+                    if channel == INDICATORS_CHANNEL:
+                        ack["interval_ms"] = INDICATOR_INTERVAL_MS
+                    if throttle_ms:
+                        ack["throttle_ms"] = throttle_ms
+                    if "batch" in data:
+                        batch = bool(data["batch"])
+                        client_manager.set_batching(client_id, batch, batch_ms)
+                        ack["batch"] = batch
+                        if batch:
+                            ack["batch_ms"] = batch_ms
+                    if data.get("encoding", encoding) != encoding:
+                        encoding = data["encoding"]
+                        client_manager.set_encoding(client_id, encoding)
+                    if "delta" in data:
+                        # Delta frames are JSON only; ack what actually applies
+                        delta = bool(data["delta"]) and encoding == "json"
+                        client_manager.set_delta(client_id, delta)
+                        ack["delta"] = delta
+                        if delta:
+                            ack["keyframe_every"] = DELTA_KEYFRAME_EVERY
+                    if encoding == "binary":
+                        # Announce ids for everything the client holds, so a
+                        # mid-session switch to binary covers older symbols too
+                        ack["encoding"] = encoding
+                        ack["symbol_ids"] = wire_format.symbol_table.ids_for(
+                            sorted(
+                                subscription_manager.client_subscriptions.get(
+                                    client_id, ()
+                                )
+                            )
+                        )
+                    await ws_send(ack)
+                    if channel == TRADES_CHANNEL:
+                        # After the ack, so binary clients already have symbol_ids
+                        subscription_manager.send_snapshot(client_id, symbols)
+                    sym_list = _symbol_list(symbols, channel)
+                    activity_log.record_event(
+                        "subscribe",
+                        f"Client {_short_id(client_id)} subscribed {sym_list}",
+                    )
 
             elif action == "unsubscribe":
-                await subscription_manager.unsubscribe(client_id, symbols)
-                await ws_send(
-                    {
+                if not known_channel:
+                    await ws_send(
+                        {"type": "error", "message": f"Unknown channel: {channel}"}
+                    )
+                else:
+                    await subscription_manager.unsubscribe(
+                        client_id, symbols, channel=channel
+                    )
+                    ack = {
                         "type": "subscription",
                         "status": "unsubscribed",
                         "symbols": symbols,
                     }
-                )
-                sym_list = ", ".join(s.upper() for s in symbols)
-                activity_log.record_event(
-                    "unsubscribe",
-                    f"Client {_short_id(client_id)} unsubscribed {sym_list}",
-                )
+                    if channel != TRADES_CHANNEL:
+                        ack["channel"] = channel
+                    await ws_send(ack)
+                    sym_list = _symbol_list(symbols, channel)
+                    activity_log.record_event(
+                        "unsubscribe",
+                        f"Client {_short_id(client_id)} unsubscribed {sym_list}",
+                    )
+
+            elif action == "add_alerts":
+                try:
+                    alerts = data.get("alerts")
+                    if not isinstance(alerts, list) or not alerts:
+                        raise ValueError("alerts must be a non-empty list")
+                    alerts = [Alert.from_dict(client_id, a) for a in alerts]
+                    await subscription_manager.add_alerts(client_id, alerts)
+                except ValueError as e:
+                    await ws_send({"type": "error", "message": str(e)})
+                else:
+                    await ws_send(
+                        {
+                            "type": "alerts",
+                            "status": "added",
+                            "ids": [alert.id for alert in alerts],
+                        }
+                    )
+                    activity_log.record_event(
+                        "alerts",
+                        f"Client {_short_id(client_id)} added {len(alerts)} alert(s)",
+                    )
+
+            elif action == "remove_alerts":
+                ids = data.get("ids")
+                if not isinstance(ids, list):
+                    ids = []
+                ids = [i for i in ids if isinstance(i, str)]
+                removed = await subscription_manager.remove_alerts(client_id, ids)
+                await ws_send({"type": "alerts", "status": "removed", "ids": removed})
 
             else:
                 await ws_send({"type": "error", "message": f"Unknown action: {action}"})
@@ -494,8 +1116,6 @@ async def websocket_endpoint(websocket: WebSocket):
         activity_log.record_event(
             "ws_disconnect", f"Client {_short_id(client_id)} disconnected"
         )
-        await subscription_manager.unsubscribe_all(client_id)
-        client_manager.remove_client(client_id)
     except Exception as e:
         print(f"❌ Error with client {client_id}: {e}")
         activity_log.record_event(
@@ -503,7 +1123,13 @@ async def websocket_endpoint(websocket: WebSocket):
             f"WebSocket error ({_short_id(client_id)}): {e}",
             level="error",
         )
-        client_manager.remove_client(client_id)
+    finally:
+        # Every exit path releases the client's symbol refs and alerts, or
+        # they would pin upstream subscriptions forever
+        try:
+            await subscription_manager.unsubscribe_all(client_id)
+        finally:
+            client_manager.remove_client(client_id)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,290 @@
+"""
+Market Data Bus
+Lets several uvicorn workers share one Finnhub connection
+
+One ingest process (``python market_bus.py``) owns the Finnhub WebSocket
+and serves a local Unix socket. Each worker connects with a
+``MarketBusClient`` instead of its own ``FinnhubWebSocketManager`` and
+tells the broker which symbols it needs. The broker aggregates those
+subscriptions across workers, so every symbol is subscribed upstream
+exactly once, and forwards each Finnhub trade frame only to the workers
+holding one of its symbols.
+
+Frames are newline-delimited JSON in both directions:
+
+* worker → broker: ``{"op": "subscribe" | "unsubscribe", "symbols": [...]}``
+* broker → worker: Finnhub trade messages, unchanged
+"""
+
+import asyncio
+import os
+import signal
+from typing import Callable, Dict, Optional, Set
+
+import codec
+
+DEFAULT_SOCKET = "/tmp/stock-market-bus.sock"
+
+# Longest frame either side will read (a Finnhub trade frame is a few KiB)
+MAX_FRAME_BYTES = 1 << 20
+
+# Frames are dropped for a worker whose unread backlog exceeds this
+MAX_WORKER_BUFFER = 8 << 20
+
+
+def _encode(message: dict) -> bytes:
+    return codec.dumps_bytes(message) + b"\n"
+
+
+class MarketBusBroker:
+    """
+    Runs in the ingest process: owns the upstream connection and fans
+    trades out to connected workers
+    """
+
+    def __init__(self, upstream, path: str = DEFAULT_SOCKET):
+        self.upstream = upstream
+        self.path = path
+        self.server: Optional[asyncio.AbstractServer] = None
+
+        # Map worker to its symbols, and symbol to the workers that want it
+        self.worker_symbols: Dict[asyncio.StreamWriter, Set[str]] = {}
+        self.symbol_workers: Dict[str, Set[asyncio.StreamWriter]] = {}
+
+        self.frames_dropped = 0
+        self.upstream.set_message_handler(self._handle_upstream_message)
+
+    async def start(self):
+        """Connect upstream and start accepting workers"""
+        await self.upstream.connect()
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # Stale socket from a previous run
+        self.server = await asyncio.start_unix_server(
+            self._handle_worker, path=self.path, limit=MAX_FRAME_BYTES
+        )
+        print(f"✅ Market bus listening on {self.path}")
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        for writer in list(self.worker_symbols):
+            writer.close()
+        await self.upstream.disconnect()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _handle_worker(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        self.worker_symbols[writer] = set()
+        print(f"➕ Worker connected (Total: {len(self.worker_symbols)})")
+        try:
+            while line := await reader.readline():
+                try:
+                    request = codec.loads(line)
+                    symbols = [s.upper() for s in request.get("symbols", [])]
+                except (ValueError, AttributeError, TypeError) as e:
+                    print(f"❌ Bad frame from worker: {e}")
+                    continue
+                if request.get("op") == "subscribe":
+                    await self._subscribe(writer, symbols)
+                elif request.get("op") == "unsubscribe":
+                    await self._unsubscribe(writer, symbols)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            print(f"❌ Worker connection error: {e}")
+        finally:
+            await self._unsubscribe(writer, list(self.worker_symbols[writer]))
+            del self.worker_symbols[writer]
+            writer.close()
+            print(f"➖ Worker disconnected (Total: {len(self.worker_symbols)})")
+
+    async def _subscribe(self, writer: asyncio.StreamWriter, symbols: list[str]):
+        new_symbols = []
+        for symbol in symbols:
+            self.worker_symbols[writer].add(symbol)
+            workers = self.symbol_workers.setdefault(symbol, set())
+            if not workers:
+                new_symbols.append(symbol)
+            workers.add(writer)
+        if new_symbols:
+            await self.upstream.subscribe(new_symbols)
+
+    async def _unsubscribe(self, writer: asyncio.StreamWriter, symbols: list[str]):
+        symbols_to_unsubscribe = []
+        for symbol in symbols:
+            self.worker_symbols[writer].discard(symbol)
+            workers = self.symbol_workers.get(symbol)
+            if workers is None:
+                continue
+            workers.discard(writer)
+            if not workers:
+                del self.symbol_workers[symbol]
+                symbols_to_unsubscribe.append(symbol)
+        if symbols_to_unsubscribe:
+            await self.upstream.unsubscribe(symbols_to_unsubscribe)
+
+    async def _handle_upstream_message(self, message: dict):
+        """Forward a trade frame, encoded once, to every worker that needs it"""
+        targets: Set[asyncio.StreamWriter] = set()
+        for trade in message.get("data", []):
+            targets.update(self.symbol_workers.get(trade.get("s", "").upper(), ()))
+        if not targets:
+            return
+        frame = _encode(message)
+        for writer in targets:
+            if writer.transport.get_write_buffer_size() > MAX_WORKER_BUFFER:
+                self.frames_dropped += 1
+                continue
+            writer.write(frame)
+
+
+class MarketBusClient:
+    """
+    Used by each uvicorn worker in place of ``FinnhubWebSocketManager``
+    (same interface), receiving trades from the ingest process
+    """
+
+    def __init__(self, path: str = DEFAULT_SOCKET):
+        self.path = path
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.connected = False
+        self.message_handler: Optional[Callable] = None
+        self.reconnect_delay = 1  # seconds
+        self._listen_task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        # Symbols this worker holds, replayed to the broker on reconnect
+        self.symbols: Set[str] = set()
+
+    def set_message_handler(self, handler: Callable):
+        """Set the callback function to handle incoming messages"""
+        self.message_handler = handler
+
+    async def connect(self):
+        """Connect to the ingest process's bus socket"""
+        self._closing = False
+        print(f"🔌 Connecting to market bus at {self.path}...")
+        self.reader, self.writer = await asyncio.open_unix_connection(
+            self.path, limit=MAX_FRAME_BYTES
+        )
+        self.connected = True
+        print("✅ Connected to market bus")
+        if self.symbols:
+            await self._send({"op": "subscribe", "symbols": sorted(self.symbols)})
+        self._listen_task = asyncio.create_task(self._listen())
+
+    async def disconnect(self):
+        """Disconnect from the bus"""
+        self._closing = True
+        self.connected = False
+        if self._listen_task:
+            self._listen_task.cancel()
+            self._listen_task = None
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+            print("✅ Disconnected from market bus")
+
+    def is_connected(self) -> bool:
+        """Check if connected to the bus"""
+        return self.connected and self.writer is not None
+
+    async def subscribe(self, symbols: list[str]):
+        """
+        Ask the broker for symbols (it subscribes upstream if no worker had them)
+
+        While disconnected the symbols are only recorded and sent on reconnect.
+
+        Args:
+            symbols: List of stock symbols (e.g., ["AAPL", "NVDA"])
+        """
+        symbols = [s.upper() for s in symbols]
+        self.symbols.update(symbols)
+        if not self.is_connected():
+            return
+        await self._send({"op": "subscribe", "symbols": symbols})
+
+    async def unsubscribe(self, symbols: list[str]):
+        """
+        Release symbols this worker no longer needs
+
+        Args:
+            symbols: List of stock symbols to unsubscribe from
+        """
+        symbols = [s.upper() for s in symbols]
+        self.symbols.difference_update(symbols)
+        if not self.is_connected():
+            return
+        await self._send({"op": "unsubscribe", "symbols": symbols})
+
+    def snapshot(self) -> dict:
+        """Bus connection state for /metrics"""
+        return {
+            "bus_socket": self.path,
+            "connected": self.is_connected(),
+            "symbols": len(self.symbols),
+        }
+
+    async def _send(self, request: dict):
+        assert self.writer is not None
+        self.writer.write(_encode(request))
+        await self.writer.drain()
+
+    async def _listen(self):
+        """Read trade frames from the broker"""
+        assert self.reader is not None
+        try:
+            while line := await self.reader.readline():
+                try:
+                    message = codec.loads(line)
+                    if self.message_handler:
+                        await self.message_handler(message)
+                except codec.JSONDecodeError as e:
+                    print(f"❌ Failed to parse bus frame: {e}")
+                except Exception as e:
+                    print(f"❌ Error processing bus frame: {e}")
+        except (ConnectionError, ValueError) as e:
+            print(f"❌ Market bus read error: {e}")
+
+        self.connected = False
+        if self._closing:
+            return
+        print("❌ Market bus connection closed")
+        await self._reconnect_loop()
+
+    async def _reconnect_loop(self):
+        """Reconnect with exponential backoff; subscriptions are replayed"""
+        max_delay = 30
+        delay = self.reconnect_delay
+        while not self.connected and not self._closing:
+            try:
+                print(f"🔄 Reconnecting to market bus in {delay} seconds...")
+                await asyncio.sleep(delay)
+                await self.connect()
+            except OSError as e:
+                print(f"❌ Market bus reconnection failed: {e}")
+                delay = min(delay * 2, max_delay)
+
+
+async def run_broker(path: str):
+    """Run the ingest process until SIGINT/SIGTERM"""
+    from upstream_pool import FinnhubConnectionPool
+
+    broker = MarketBusBroker(FinnhubConnectionPool(), path)
+    await broker.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    print("🛑 Shutting down market bus...")
+    await broker.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_broker(os.getenv("MARKET_BUS_SOCKET") or DEFAULT_SOCKET))
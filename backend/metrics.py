@@ -2,6 +2,9 @@
 
 from __future__ import annotations
 
+import itertools
+import math
+import os
 import time
 from collections import deque
 from datetime import datetime, timezone
@@ -12,36 +15,205 @@ _started_at: float | None = None
 
 ws_messages_received: int = 0
 ws_messages_sent: int = 0
+ws_messages_dropped: int = 0
+# JSON encodes performed for fan-out, and per-client encodes avoided by sharing them
+ws_payload_encodes: int = 0
+ws_payload_encodes_saved: int = 0
+# Price updates superseded by a newer tick while waiting (throttle or send queue)
+ws_updates_conflated: int = 0
+# Clients that fell WS_MAX_LAG_S behind, and those closed for it (disconnect policy)
+ws_slow_clients: int = 0
+ws_clients_evicted: int = 0
+# Price updates delivered inside price_batch frames
+ws_batched_updates: int = 0
+# Delta mode: updates sent as changed fields only vs full keyframes
+ws_delta_updates: int = 0
+ws_delta_keyframes: int = 0
+# Batched upstream subscription sends, and lingering symbols picked up again
+# before they were dropped upstream
+upstream_batches: int = 0
+upstream_linger_reuses: int = 0
+# Upstream Finnhub reconnects after a dropped connection
+upstream_reconnects: int = 0
+# Server-side price alerts that fired and were pushed to their client
+alerts_triggered: int = 0
+# Trades for an already-closed bar: added to that bar while it is still in
+# history, otherwise dropped
+bars_late_trades_patched: int = 0
+bars_late_trades_dropped: int = 0
 finnhub_messages_received: int = 0
 http_requests_total: int = 0
 
+# Labeled counters for /metrics/prometheus
+# (method, route template, status) -> requests
+http_requests: dict[tuple[str, str, int], int] = {}
+# WebSocket action -> messages handled
+ws_actions: dict[str, int] = {}
+# Per-symbol trades handled and client deliveries; dropped with the symbol
+# so the label set stays bounded by what is subscribed
+symbol_ticks: dict[str, int] = {}
+symbol_fanout: dict[str, int] = {}
+
+
+def discard_symbol(symbol: str) -> None:
+    symbol_ticks.pop(symbol, None)
+    symbol_fanout.pop(symbol, None)
+
+
+# Latency windows in seconds; the first one is the headline figure in /metrics
+LATENCY_WINDOWS_S = sorted(
+    {max(1, int(w)) for w in os.getenv("LATENCY_WINDOWS_S", "60,300").split(",")}
+)
+# Windows are built from slices this long, so they are this coarse
+LATENCY_SLICE_S = max(1, LATENCY_WINDOWS_S[0] // 12)
+
+# Linear sub-buckets per power of two: buckets are at most 1/64 (~1.6%) wide,
+# so reported percentiles (bucket midpoints) are within ~0.8% of the truth
+_SUB_BUCKETS = 64
+_ZERO_BUCKET = -(1 << 30)  # Everything at or below zero
+
+PERCENTILES = (("p50_ms", 0.50), ("p90_ms", 0.90), ("p99_ms", 0.99), ("p999_ms", 0.999))
+
+
+def _bucket(ms: float) -> int:
+    if ms <= 0:
+        return _ZERO_BUCKET
+    mantissa, exponent = math.frexp(ms)  # ms = mantissa * 2**exponent, 0.5 <= m < 1
+    return exponent * _SUB_BUCKETS + int(mantissa * 2 * _SUB_BUCKETS) - _SUB_BUCKETS
 
-class LatencyTracker:
-    """Rolling window of recent latency samples."""
 
-    def __init__(self, maxlen: int = 100) -> None:
-        self._samples: deque[float] = deque(maxlen=maxlen)
+def _bucket_value(index: int) -> float:
+    """Midpoint of a bucket"""
+    if index == _ZERO_BUCKET:
+        return 0.0
+    exponent, sub = divmod(index, _SUB_BUCKETS)
+    return math.ldexp(0.5 + (sub + 0.5) / (2 * _SUB_BUCKETS), exponent)
+
+
+class _Slice:
+    __slots__ = ("start", "count", "total", "max", "buckets")
+
+    def __init__(self, start: int) -> None:
+        self.start = start
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets: dict[int, int] = {}
+
+
+class LatencyTracker:
+    """
+    Log-bucketed (HDR-style) latency histogram over sliding time windows.
+
+    ``record`` is O(1): one ``frexp`` picks a bucket and the current time
+    slice's counter is bumped. Snapshots merge the slices inside each window
+    and walk the sparse buckets for p50/p90/p99/p999.
+    """
+
+    def __init__(
+        self,
+        windows_s: list[int] = LATENCY_WINDOWS_S,
+        slice_s: int = LATENCY_SLICE_S,
+    ) -> None:
+        self.windows_s = windows_s
+        self.slice_s = slice_s
+        self._slices: deque[_Slice] = deque(maxlen=-(-max(windows_s) // slice_s) + 1)
+        self._current: _Slice | None = None
+        self._current_ends = 0.0
         self._last_ms: float | None = None
+        self.total_samples = 0
+        # All-time buckets and sum, for cumulative (Prometheus) histograms
+        self.total_ms = 0.0
+        self.total_buckets: dict[int, int] = {}
 
     def record(self, ms: float) -> None:
         self._last_ms = ms
-        self._samples.append(ms)
+        self.total_samples += 1
+        self.total_ms += ms
+        current = self._current
+        if current is None or time.monotonic() >= self._current_ends:
+            current = self._rotate()
+        current.count += 1
+        current.total += ms
+        if ms > current.max:
+            current.max = ms
+        buckets = current.buckets
+        index = _bucket(ms)
+        buckets[index] = buckets.get(index, 0) + 1
+        totals = self.total_buckets
+        totals[index] = totals.get(index, 0) + 1
+
+    def _rotate(self) -> _Slice:
+        start = int(time.monotonic()) // self.slice_s
+        self._current = _Slice(start)
+        self._current_ends = (start + 1) * self.slice_s
+        self._slices.append(self._current)
+        return self._current
+
+    def _window(self, window_s: int) -> dict:
+        oldest = int(time.monotonic()) // self.slice_s - window_s // self.slice_s
+        count, total, peak = 0, 0.0, 0.0
+        merged: dict[int, int] = {}
+        for s in self._slices:
+            if s.start <= oldest:
+                continue
+            count += s.count
+            total += s.total
+            peak = max(peak, s.max)
+            for index, n in s.buckets.items():
+                merged[index] = merged.get(index, 0) + n
+
+        stats: dict = {"samples": count}
+        if not count:
+            stats["avg_ms"] = None
+            stats.update((name, None) for name, _ in PERCENTILES)
+            stats["max_ms"] = None
+            return stats
+
+        stats["avg_ms"] = round(total / count, 2)
+        ordered = sorted(merged.items())
+        seen, i = 0, 0
+        for name, quantile in PERCENTILES:
+            rank = max(1, math.ceil(quantile * count))
+            while seen + ordered[i][1] < rank:
+                seen += ordered[i][1]
+                i += 1
+            stats[name] = round(min(_bucket_value(ordered[i][0]), peak), 2)
+        stats["max_ms"] = round(peak, 2)
+        return stats
+
+    def cumulative_counts(self, bounds_ms: tuple[float, ...]) -> list[int]:
+        """All-time sample counts at or below each bound (by bucket midpoint)"""
+        counts = [0] * len(bounds_ms)
+        for index, n in self.total_buckets.items():
+            value = _bucket_value(index)
+            for i, bound in enumerate(bounds_ms):
+                if value <= bound:
+                    counts[i] += n
+                    break
+        return list(itertools.accumulate(counts))
 
     def snapshot(self) -> dict:
-        if not self._samples:
-            return {"avg_ms": None, "last_ms": None, "samples": 0}
-        avg = sum(self._samples) / len(self._samples)
-        return {
-            "avg_ms": round(avg, 1),
-            "last_ms": round(self._last_ms or avg, 1),
-            "samples": len(self._samples),
-        }
+        """Stats over the first (shortest) window, plus the last sample"""
+        stats = self._window(self.windows_s[0])
+        stats["last_ms"] = None if self._last_ms is None else round(self._last_ms, 2)
+        return stats
+
+    def snapshot_windows(self) -> dict:
+        """``snapshot()`` plus the same stats for every configured window"""
+        stats = self.snapshot()
+        stats["windows"] = {f"{w}s": self._window(w) for w in self.windows_s}
+        return stats
 
 
 rest_api_latency = LatencyTracker()
 ai_chat_latency = LatencyTracker()
 ws_message_latency = LatencyTracker()
 finnhub_latency = LatencyTracker()
+ws_send_latency = LatencyTracker()
+# Upstream recovery: connection lost -> reconnected -> first trade received
+upstream_reconnect_latency = LatencyTracker()
+upstream_first_tick_latency = LatencyTracker()
 
 
 def mark_started() -> None:
@@ -70,8 +242,11 @@ def system_stats() -> dict[str, float]:
 
 def latency_snapshot() -> dict:
     return {
-        "rest_api": rest_api_latency.snapshot(),
-        "ai_chat": ai_chat_latency.snapshot(),
-        "ws_message": ws_message_latency.snapshot(),
-        "finnhub": finnhub_latency.snapshot(),
+        "rest_api": rest_api_latency.snapshot_windows(),
+        "ai_chat": ai_chat_latency.snapshot_windows(),
+        "ws_message": ws_message_latency.snapshot_windows(),
+        "finnhub": finnhub_latency.snapshot_windows(),
+        "ws_send": ws_send_latency.snapshot_windows(),
+        "upstream_reconnect": upstream_reconnect_latency.snapshot_windows(),
+        "upstream_first_tick": upstream_first_tick_latency.snapshot_windows(),
     }
@@ -0,0 +1,218 @@
+"""
+Prometheus text exposition (format 0.0.4) for GET /metrics/prometheus
+
+Renders the counters and histograms in ``metrics`` plus live gauges from
+the managers. Everything is read from in-memory state and joined into one
+string, so a scrape costs well under a millisecond and can run every few
+seconds.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable
+
+import metrics
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+PREFIX = "stock_"
+
+# Histogram bucket bounds in ms (exported in seconds)
+LATENCY_BOUNDS_MS = (
+    0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000,
+)  # fmt: skip
+
+_LATENCY_SOURCES = {
+    "rest_api": metrics.rest_api_latency,
+    "ai_chat": metrics.ai_chat_latency,
+    "ws_message": metrics.ws_message_latency,
+    "finnhub": metrics.finnhub_latency,
+    "ws_send": metrics.ws_send_latency,
+    "upstream_reconnect": metrics.upstream_reconnect_latency,
+    "upstream_first_tick": metrics.upstream_first_tick_latency,
+}
+
+# Unlabeled counters: attribute of ``metrics`` -> help text
+_COUNTERS = {
+    "ws_messages_received": "WebSocket messages received from clients",
+    "ws_messages_sent": "WebSocket messages sent to clients",
+    "ws_messages_dropped": "Outbound messages dropped for slow clients",
+    "ws_payload_encodes": "Price payloads encoded for fan-out",
+    "ws_payload_encodes_saved": "Per-client encodes avoided by sharing a payload",
+    "ws_updates_conflated": "Price updates superseded before sending",
+    "ws_batched_updates": "Price updates sent inside price_batch frames",
+    "ws_delta_updates": "Price updates sent as deltas",
+    "ws_delta_keyframes": "Full keyframes sent to delta-mode clients",
+    "ws_slow_clients": "Clients that fell too far behind",
+    "ws_clients_evicted": "Slow clients disconnected",
+    "finnhub_messages_received": "Upstream trade frames received",
+    "alerts_triggered": "Price alerts fired",
+    "bars_late_trades_patched": "Late trades added to an already-completed bar",
+    "bars_late_trades_dropped": (
+        "Late trades not added to a bar: older than the bar history, "
+        "or in a bucket that had no trades"
+    ),
+    "upstream_reconnects": "Upstream reconnects after a dropped connection",
+    "upstream_batches": "Batched upstream subscription sends",
+    "upstream_linger_reuses": "Lingering symbols requested again before being dropped",
+}
+
+
+def _number(value: float) -> str:
+    # repr keeps full precision (``:g`` would round large counters)
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def _escape(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: object) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    return "{" + inner + "}"
+
+
+def _family(lines: list[str], name: str, kind: str, help_text: str) -> str:
+    full = PREFIX + name
+    lines.append(f"# HELP {full} {help_text}")
+    lines.append(f"# TYPE {full} {kind}")
+    return full
+
+
+def _histogram(lines: list[str]) -> None:
+    name = _family(
+        lines, "latency_seconds", "histogram", "Latency by source (HDR buckets)"
+    )
+    bounds = [f"{ms / 1000:g}" for ms in LATENCY_BOUNDS_MS]
+    for source, tracker in _LATENCY_SOURCES.items():
+        counts = tracker.cumulative_counts(LATENCY_BOUNDS_MS)
+        for le, count in zip(bounds, counts):
+            lines.append(f"{name}_bucket{_labels(source=source, le=le)} {count}")
+        total = tracker.total_samples
+        lines.append(f'{name}_bucket{_labels(source=source, le="+Inf")} {total}')
+        total_s = _number(tracker.total_ms / 1000)
+        lines.append(f"{name}_sum{_labels(source=source)} {total_s}")
+        lines.append(f"{name}_count{_labels(source=source)} {total}")
+
+
+def _labeled(
+    lines: list[str],
+    name: str,
+    kind: str,
+    help_text: str,
+    samples: Iterable[tuple[dict, float]],
+) -> None:
+    full = _family(lines, name, kind, help_text)
+    for labels, value in samples:
+        lines.append(f"{full}{_labels(**labels)} {_number(value)}")
+
+
+def render(client_manager, subscription_manager, upstream) -> str:
+    """
+    Render every metric as Prometheus text
+
+    Args:
+        client_manager: Source of connection and outbound queue gauges
+        subscription_manager: Source of subscription gauges
+        upstream: Upstream manager; ``snapshot()["connections"]`` if pooled
+    """
+    lines: list[str] = []
+
+    _labeled(
+        lines,
+        "http_requests_total",
+        "counter",
+        "HTTP requests by method, route and status",
+        (
+            ({"method": m, "route": r, "status": s}, n)
+            for (m, r, s), n in sorted(metrics.http_requests.items())
+        ),
+    )
+    _labeled(
+        lines,
+        "ws_actions_total",
+        "counter",
+        "WebSocket client messages by action",
+        (({"action": a}, n) for a, n in sorted(metrics.ws_actions.items())),
+    )
+    _labeled(
+        lines,
+        "symbol_ticks_total",
+        "counter",
+        "Trades handled per subscribed symbol",
+        (({"symbol": s}, n) for s, n in sorted(metrics.symbol_ticks.items())),
+    )
+    _labeled(
+        lines,
+        "symbol_fanout_total",
+        "counter",
+        "Price updates queued to clients per symbol",
+        (({"symbol": s}, n) for s, n in sorted(metrics.symbol_fanout.items())),
+    )
+
+    for name, help_text in _COUNTERS.items():
+        full = _family(lines, name + "_total", "counter", help_text)
+        lines.append(f"{full} {getattr(metrics, name)}")
+
+    outbound = client_manager.outbound_totals()
+    gauges = {
+        "connected_clients": (
+            "Connected WebSocket clients",
+            client_manager.get_client_count(),
+        ),
+        "client_subscriptions": (
+            "Client-symbol subscriptions across all channels",
+            subscription_manager.get_client_subscription_count(),
+        ),
+        "subscribed_symbols": (
+            "Symbols subscribed upstream",
+            len(subscription_manager.get_subscribed_symbols()),
+        ),
+        "alerts_active": (
+            "Active price alerts",
+            len(subscription_manager.alert_engine),
+        ),
+        "upstream_lingering": (
+            "Symbols kept upstream after their last client left",
+            subscription_manager.get_lingering_count(),
+        ),
+        "outbound_queue_depth": (
+            "Messages queued to clients",
+            outbound["queue_depth_total"],
+        ),
+        "outbound_pending_bytes": (
+            "Bytes queued to clients",
+            outbound["pending_bytes_total"],
+        ),
+        "outbound_lag_seconds_max": (
+            "Age of the oldest unsent message across clients",
+            outbound["lag_ms_max"] / 1000,
+        ),
+        "uptime_seconds": ("Seconds since startup", metrics.uptime_seconds()),
+    }
+    for name, (help_text, value) in gauges.items():
+        full = _family(lines, name, "gauge", help_text)
+        lines.append(f"{full} {_number(value)}")
+
+    connections = upstream.snapshot().get("connections", [])
+    if connections:
+        _labeled(
+            lines,
+            "upstream_connected",
+            "gauge",
+            "1 if the upstream connection is up",
+            (({"connection": c["index"]}, int(c["connected"])) for c in connections),
+        )
+        _labeled(
+            lines,
+            "upstream_messages_total",
+            "counter",
+            "Frames received per upstream connection",
+            (({"connection": c["index"]}, c["messages"]) for c in connections),
+        )
+
+    _histogram(lines)
+    lines.append("")
+    return "\n".join(lines)
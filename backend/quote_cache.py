@@ -0,0 +1,56 @@
+"""Last-value cache of the most recent trade per symbol."""
+
+from __future__ import annotations
+
+import time
+
+from client_manager import PriceUpdate
+
+
+class QuoteCache:
+    """
+    Latest ``PriceUpdate`` per symbol, fed from the Finnhub trade path.
+
+    Every write bumps a process-wide version counter, so a set of symbols
+    can be fingerprinted (for ETags) without hashing the quotes themselves.
+    """
+
+    def __init__(self) -> None:
+        self._quotes: dict[str, tuple[int, PriceUpdate]] = {}
+        self._version = 0
+        # Distinguishes this process's versions from a previous run's
+        self._epoch = format(time.time_ns() // 1_000_000, "x")
+
+    def update(self, update: PriceUpdate) -> None:
+        self._version += 1
+        self._quotes[update.symbol] = (self._version, update)
+
+    def get(self, symbol: str) -> PriceUpdate | None:
+        entry = self._quotes.get(symbol)
+        return entry[1] if entry else None
+
+    def __len__(self) -> int:
+        return len(self._quotes)
+
+    def lookup(self, symbols: list[str]) -> tuple[str, dict[str, dict], list[str]]:
+        """
+        Cached quotes for ``symbols`` with a weak ETag for that exact view.
+
+        Returns:
+            ``(etag, quotes, missing)`` where ``quotes`` maps symbol to
+            ``{"price", "volume", "timestamp"}``
+        """
+        quotes: dict[str, dict] = {}
+        missing: list[str] = []
+        latest = 0
+        for symbol in symbols:
+            entry = self._quotes.get(symbol)
+            if entry is None:
+                missing.append(symbol)
+                continue
+            version, update = entry
+            latest = max(latest, version)
+            quotes[symbol] = update.data
+        # Versions only grow, so the newest one (plus the hit count, for
+        # symbols appearing) changes whenever any requested quote does
+        return f'W/"{self._epoch}-{latest}-{len(quotes)}"', quotes, missing
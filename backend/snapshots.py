@@ -0,0 +1,76 @@
+"""
+Background sampler for the /health and /metrics payloads
+
+Building those payloads touches psutil, copies the subscription tables and
+formats timestamps. The sampler does that once per
+``SNAPSHOT_INTERVAL_MS`` and keeps the result both as a dict (for the
+dashboard telemetry) and pre-encoded as JSON bytes, so a request only
+returns bytes that already exist however often it is polled.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from typing import Callable
+
+import codec
+
+SNAPSHOT_INTERVAL_MS = max(100, int(os.getenv("SNAPSHOT_INTERVAL_MS", "1000")))
+
+
+class SnapshotSampler:
+    """Rebuilds named JSON payloads on a timer and keeps them encoded"""
+
+    def __init__(
+        self,
+        builders: dict[str, Callable[[], dict]],
+        interval_ms: int = SNAPSHOT_INTERVAL_MS,
+    ):
+        self.builders = builders
+        self.interval_s = interval_ms / 1000
+        self.payloads: dict[str, dict] = {}
+        self.encoded: dict[str, bytes] = {}
+        self.sampled_at: float | None = None
+        self._task: asyncio.Task | None = None
+
+    def refresh(self):
+        """Rebuild and re-encode every payload now"""
+        for name, build in self.builders.items():
+            payload = build()
+            self.payloads[name] = payload
+            self.encoded[name] = codec.dumps_bytes(payload)
+        self.sampled_at = time.monotonic()
+
+    def start(self):
+        self.refresh()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def payload(self, name: str) -> dict:
+        if name not in self.payloads:
+            self.refresh()  # Not started (e.g. served without lifespan)
+        return self.payloads[name]
+
+    def body(self, name: str) -> bytes:
+        if name not in self.encoded:
+            self.refresh()
+        return self.encoded[name]
+
+    def age_ms(self) -> float | None:
+        if self.sampled_at is None:
+            return None
+        return (time.monotonic() - self.sampled_at) * 1000
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_s)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"❌ Snapshot refresh failed: {e}")
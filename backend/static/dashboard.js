@@ -4,6 +4,7 @@
   const TICKER_RE = /^[A-Za-z]{1,5}$/;
   const STALE_MS = 30_000;
   const POLL_MS = 5_000;
+  const ACTIVITY_MAX = 50;
   const WS_RECONNECT_BASE_MS = 2_000;
   const WS_RECONNECT_MAX_MS = 30_000;
 
@@ -14,6 +15,13 @@
   let intentionalClose = false;
   let chatLines = [];
   let chatLoading = false;
+  // Health/metrics/activity arrive pushed over /telemetry; polling is only
+  // the fallback while that socket is down
+  let telemetry = null;
+  let telemetrySocket = null;
+  let telemetryAttempt = 0;
+  let pollTimers = [];
+  let activityEvents = [];
 
   const wsStatusEl = document.getElementById("ws-status");
   const globalLastUpdateEl = document.getElementById("global-last-update");
@@ -37,9 +45,9 @@
   const chatError = document.getElementById("chat-error");
   const chatLoadingEl = document.getElementById("chat-loading");
 
-  function wsUrl() {
+  function wsUrl(path) {
     const proto = location.protocol === "https:" ? "wss:" : "ws:";
-    return proto + "//" + location.host + "/ws";
+    return proto + "//" + location.host + (path || "/ws");
   }
 
   function formatTime(date) {
@@ -283,77 +291,90 @@
     return "error";
   }
 
+  function renderHealth(data) {
+    renderKvList(healthList, [
+      ["Status", data.status, statusBadge(data.status, ["healthy"])],
+      ["Version", data.version || "—"],
+      ["Server time", data.server_time || "—"],
+      ["Uptime", formatUptime(data.uptime_seconds)],
+      ["API", data.api || "—", statusBadge(data.api || "", ["ok"])],
+      [
+        "WebSocket",
+        data.websocket || "—",
+        statusBadge(data.websocket || "", ["ok"]),
+      ],
+      [
+        "Finnhub",
+        data.finnhub_connection || "—",
+        statusBadge(data.finnhub_connection || "", ["connected"]),
+      ],
+      [
+        "AI chat",
+        data.ai_chat_enabled ? "enabled" : "disabled",
+        data.ai_chat_enabled ? "ok" : "warn",
+      ],
+      ["Clients", data.clients ?? "—"],
+      ["Subscriptions", data.subscriptions ?? "—"],
+    ]);
+    if (data.deployment) {
+      const d = data.deployment;
+      renderKvList(deploymentList, [
+        ["Environment", d.environment || "—"],
+        ["Region", d.region || "—"],
+        ["Host", d.host || "—"],
+        ["Port", d.port || "—"],
+        ["Python", d.python_version || "—"],
+        ["FastAPI", d.fastapi_version || "—"],
+        ["Uvicorn", d.uvicorn_version || "—"],
+      ]);
+    }
+    healthRefreshed.textContent = formatTime(new Date());
+    chatSend.disabled = chatLoading;
+  }
+
   async function refreshHealth() {
     try {
       const res = await fetch("/health");
-      const data = await res.json();
-      renderKvList(healthList, [
-        ["Status", data.status, statusBadge(data.status, ["healthy"])],
-        ["Version", data.version || "—"],
-        ["Server time", data.server_time || "—"],
-        ["Uptime", formatUptime(data.uptime_seconds)],
-        ["API", data.api || "—", statusBadge(data.api || "", ["ok"])],
-        [
-          "WebSocket",
-          data.websocket || "—",
-          statusBadge(data.websocket || "", ["ok"]),
-        ],
-        [
-          "Finnhub",
-          data.finnhub_connection || "—",
-          statusBadge(data.finnhub_connection || "", ["connected"]),
-        ],
-        [
-          "AI chat",
-          data.ai_chat_enabled ? "enabled" : "disabled",
-          data.ai_chat_enabled ? "ok" : "warn",
-        ],
-        ["Clients", data.clients ?? "—"],
-        ["Subscriptions", data.subscriptions ?? "—"],
-      ]);
-      if (data.deployment) {
-        const d = data.deployment;
-        renderKvList(deploymentList, [
-          ["Environment", d.environment || "—"],
-          ["Region", d.region || "—"],
-          ["Host", d.host || "—"],
-          ["Port", d.port || "—"],
-          ["Python", d.python_version || "—"],
-          ["FastAPI", d.fastapi_version || "—"],
-          ["Uvicorn", d.uvicorn_version || "—"],
-        ]);
-      }
-      healthRefreshed.textContent = formatTime(new Date());
-      chatSend.disabled = chatLoading;
+      renderHealth(await res.json());
     } catch {
       healthRefreshed.textContent = "error";
     }
   }
 
+  function renderMetrics(data) {
+    renderKvList(metricsList, [
+      ["Connected clients", data.connected_clients ?? "—"],
+      ["Active subscriptions", data.active_subscriptions ?? "—"],
+      ["WS messages sent", data.ws_messages_sent ?? "—"],
+      ["WS messages received", data.ws_messages_received ?? "—"],
+      [
+        "WS encodes (saved)",
+        (data.ws_payload_encodes ?? "—") +
+          " (" +
+          (data.ws_payload_encodes_saved ?? "—") +
+          ")",
+      ],
+      ["Finnhub messages", data.finnhub_messages_received ?? "—"],
+      ["HTTP requests", data.http_requests_total ?? "—"],
+      ["CPU", (data.cpu_percent ?? "—") + "%"],
+      [
+        "Memory",
+        (data.memory_percent ?? "—") +
+          "% (" +
+          (data.memory_used_mb ?? "—") +
+          " MB)",
+      ],
+      ["Uptime", formatUptime(data.uptime_seconds)],
+      ["Server time", data.server_time || "—"],
+    ]);
+    renderLatencyList(data.latency);
+    metricsRefreshed.textContent = formatTime(new Date());
+  }
+
   async function refreshMetrics() {
     try {
       const res = await fetch("/metrics");
-      const data = await res.json();
-      renderKvList(metricsList, [
-        ["Connected clients", data.connected_clients ?? "—"],
-        ["Active subscriptions", data.active_subscriptions ?? "—"],
-        ["WS messages sent", data.ws_messages_sent ?? "—"],
-        ["WS messages received", data.ws_messages_received ?? "—"],
-        ["Finnhub messages", data.finnhub_messages_received ?? "—"],
-        ["HTTP requests", data.http_requests_total ?? "—"],
-        ["CPU", (data.cpu_percent ?? "—") + "%"],
-        [
-          "Memory",
-          (data.memory_percent ?? "—") +
-            "% (" +
-            (data.memory_used_mb ?? "—") +
-            " MB)",
-        ],
-        ["Uptime", formatUptime(data.uptime_seconds)],
-        ["Server time", data.server_time || "—"],
-      ]);
-      renderLatencyList(data.latency);
-      metricsRefreshed.textContent = formatTime(new Date());
+      renderMetrics(await res.json());
     } catch {
       metricsRefreshed.textContent = "error";
     }
@@ -383,7 +404,10 @@
     if (val == null || val.avg_ms == null) {
       return emptyHint ? "— (" + emptyHint + ")" : "—";
     }
-    return "avg " + val.avg_ms + "ms, last " + (val.last_ms ?? "—") + "ms";
+    return (
+      "p50 " + val.p50_ms + "ms, p99 " + val.p99_ms + "ms, max " + val.max_ms +
+      "ms (avg " + val.avg_ms + "ms)"
+    );
   }
 
   function renderLatencyList(latency) {
@@ -396,6 +420,8 @@
       ["AI Chat", formatLatency(latency.ai_chat)],
       ["WS command handling", formatLatency(latency.ws_message)],
       ["Finnhub fan-out", formatLatency(latency.finnhub, "no samples")],
+      ["Finnhub reconnect", formatLatency(latency.upstream_reconnect, "no reconnects")],
+      ["First tick after reconnect", formatLatency(latency.upstream_first_tick, "no reconnects")],
     ]);
   }
 
@@ -430,16 +456,111 @@
   }
 
   async function refreshActivity() {
+    // Only fetch events newer than the newest one shown
+    const newest = activityEvents.length ? activityEvents[0].id || 0 : 0;
     try {
-      const res = await fetch("/activity");
-      const data = await res.json();
-      renderActivity(data);
-      activityRefreshed.textContent = formatTime(new Date());
+      const res = await fetch("/activity?since=" + newest);
+      const lastId = Number(res.headers.get("X-Activity-Last-Id"));
+      const events = await res.json();
+      if (lastId < newest) {
+        // Server restarted and ids began again: start over
+        activityEvents = [];
+        return refreshActivity();
+      }
+      addActivity(events, false);
     } catch {
       activityRefreshed.textContent = "error";
     }
   }
 
+  function applyDelta(target, delta) {
+    Object.keys(delta).forEach(function (key) {
+      const value = delta[key];
+      if (value === null) {
+        delete target[key];
+      } else if (
+        typeof value === "object" &&
+        !Array.isArray(value) &&
+        typeof target[key] === "object" &&
+        target[key] !== null &&
+        !Array.isArray(target[key])
+      ) {
+        applyDelta(target[key], value);
+      } else {
+        target[key] = value;
+      }
+    });
+  }
+
+  function addActivity(events, reset) {
+    if (reset) {
+      activityEvents = events;
+    } else {
+      const newest = activityEvents.length ? activityEvents[0].id || 0 : 0;
+      const fresh = events.filter(function (ev) {
+        return ev.id > newest;
+      });
+      activityEvents = fresh.concat(activityEvents).slice(0, ACTIVITY_MAX);
+    }
+    renderActivity(activityEvents);
+    activityRefreshed.textContent = formatTime(new Date());
+  }
+
+  function startPolling() {
+    if (pollTimers.length) return;
+    refreshHealth();
+    refreshMetrics();
+    refreshActivity();
+    pollTimers = [
+      setInterval(refreshHealth, POLL_MS),
+      setInterval(refreshMetrics, POLL_MS),
+      setInterval(refreshActivity, POLL_MS),
+    ];
+  }
+
+  function stopPolling() {
+    pollTimers.forEach(clearInterval);
+    pollTimers = [];
+  }
+
+  function connectTelemetry() {
+    telemetrySocket = new WebSocket(wsUrl("/telemetry"));
+
+    telemetrySocket.onmessage = function (event) {
+      let msg;
+      try {
+        msg = JSON.parse(event.data);
+      } catch {
+        return;
+      }
+      if (msg.type === "snapshot") {
+        telemetryAttempt = 0;
+        stopPolling();
+        telemetry = msg.data;
+      } else if (msg.type === "delta" && telemetry) {
+        applyDelta(telemetry, msg.data);
+      } else if (msg.type === "activity") {
+        addActivity(msg.events || [], msg.reset);
+        return;
+      } else {
+        return;
+      }
+      renderHealth(telemetry.health);
+      renderMetrics(telemetry.metrics);
+    };
+
+    telemetrySocket.onclose = function () {
+      telemetry = null;
+      startPolling();
+      const delay = Math.min(
+        WS_RECONNECT_BASE_MS * Math.pow(2, telemetryAttempt),
+        WS_RECONNECT_MAX_MS
+      );
+      telemetryAttempt += 1;
+      setTimeout(connectTelemetry, delay);
+    };
+  }
+
   function renderChat() {
     chatHistory.innerHTML = "";
     if (chatLines.length === 0) {
@@ -533,11 +654,6 @@
   });
 
   connectWebSocket();
-  refreshHealth();
-  refreshMetrics();
-  refreshActivity();
-  setInterval(refreshHealth, POLL_MS);
-  setInterval(refreshMetrics, POLL_MS);
-  setInterval(refreshActivity, POLL_MS);
+  connectTelemetry();
   setInterval(checkStale, 5_000);
 })();
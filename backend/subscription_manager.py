@@ -4,121 +4,439 @@ Manages symbol subscriptions and routes updates to clients
 """
 
 from typing import Dict, Set, List
+import asyncio
+import os
 import time
 
+import activity_log
 import metrics
 from websocket_manager import FinnhubWebSocketManager
-from client_manager import ClientManager
+from client_manager import ClientManager, PriceUpdate, encode_message
+from quote_cache import QuoteCache
+from tick_history import TickHistory
+from bars import INTERVALS, Bar, BarAggregator
+from indicators import INDICATOR_INTERVAL_MS, IndicatorEngine
+from alerts import Alert, AlertEngine
+
+# Upstream subscription changes made within this window go out as one batch
+UPSTREAM_BATCH_MS = max(0, int(os.getenv("UPSTREAM_BATCH_MS", "20")))
+
+# How long a symbol stays subscribed upstream after its last reference goes
+SUBSCRIBE_LINGER_MS = max(0, int(os.getenv("SUBSCRIBE_LINGER_MS", "10000")))
+
+# Default channel: every trade as a price_update
+TRADES_CHANNEL = "trades"
+
+# Low-rate running VWAP/EMA/volatility per symbol
+INDICATORS_CHANNEL = "indicators"
 
 
 class SubscriptionManager:
     """
     Manages subscriptions: tracks which clients want which symbols,
     and only subscribes to Finnhub once per unique symbol
+
+    Besides the default ``trades`` channel, clients can subscribe to
+    derived channels (e.g. ``bars:1m``, ``indicators``). Every (client, channel, symbol)
+    subscription holds one reference on the upstream symbol, and so does
+    every symbol with at least one registered price alert.
+
+    Upstream changes are coalesced into batched sends, and a symbol whose
+    last reference goes away stays subscribed for ``SUBSCRIBE_LINGER_MS``
+    so clients flapping between pages don't cause unsubscribe/resubscribe
+    round-trips and gaps in the data.
     """
 
     def __init__(
-        self, finnhub_manager: FinnhubWebSocketManager, client_manager: ClientManager
+        self,
+        finnhub_manager: FinnhubWebSocketManager,
+        client_manager: ClientManager,
+        quote_cache: QuoteCache | None = None,
+        tick_history: TickHistory | None = None,
+        bar_aggregator: BarAggregator | None = None,
+        indicator_engine: IndicatorEngine | None = None,
+        alert_engine: AlertEngine | None = None,
     ):
         self.finnhub_manager = finnhub_manager
         self.client_manager = client_manager
 
-        # Map client_id to set of subscribed symbols
+        # Last trade per symbol, replayed to new subscribers and served by /quotes
+        self.quote_cache = quote_cache if quote_cache is not None else QuoteCache()
+
+        # Recent ticks per subscribed symbol, served by /ticks/{symbol}
+        self.tick_history = (
+            tick_history if tick_history is not None else TickHistory()
+        )
+
+        # OHLCV bars per streamed symbol, pushed on bars:* channels
+        self.bar_aggregator = (
+            bar_aggregator if bar_aggregator is not None else BarAggregator()
+        )
+
+        # Running indicators per streamed symbol, pushed on the indicators
+        # channel at most once per INDICATOR_INTERVAL_MS
+        self.indicator_engine = (
+            indicator_engine if indicator_engine is not None else IndicatorEngine()
+        )
+        self._indicator_timers: Dict[str, asyncio.TimerHandle] = {}
+
+        # Client price alerts, checked against every trade; symbols in
+        # alert_symbols hold one upstream reference for all of their alerts
+        self.alert_engine = alert_engine if alert_engine is not None else AlertEngine()
+        self.alert_symbols: Set[str] = set()
+
+        # Map client_id to set of subscribed symbols (trades channel)
         self.client_subscriptions: Dict[str, Set[str]] = {}
 
-        # Map symbol to set of client_ids that want it
+        # Map symbol to set of client_ids that want it (trades channel)
         self.symbol_clients: Dict[str, Set[str]] = {}
 
+        # Derived channels: channel -> symbol -> client_ids, and the reverse
+        # client_id -> channel -> symbols for cleanup
+        self.channel_clients: Dict[str, Dict[str, Set[str]]] = {}
+        self.client_channels: Dict[str, Dict[str, Set[str]]] = {}
+
+        # Map symbol to number of subscriptions (any channel) holding it upstream
+        self.symbol_refs: Dict[str, int] = {}
+
+        # Symbols with no references left, still subscribed upstream until
+        # their linger timer fires (a returning client cancels it)
+        self._lingering: Dict[str, asyncio.TimerHandle] = {}
+
+        # Upstream changes waiting for the next batched send
+        self._pending_subscribe: Set[str] = set()
+        self._pending_unsubscribe: Set[str] = set()
+        self._flush_task: asyncio.Task | None = None
+
+        self.channels = {TRADES_CHANNEL, INDICATORS_CHANNEL} | {
+            f"bars:{name}" for name in INTERVALS
+        }
+
         # Set up message handler for Finnhub updates
         self.finnhub_manager.set_message_handler(self._handle_finnhub_message)
 
-    async def subscribe(self, client_id: str, symbols: List[str]):
+    async def subscribe(
+        self,
+        client_id: str,
+        symbols: List[str],
+        throttle_ms: int = 0,
+        channel: str = TRADES_CHANNEL,
+    ):
         """
         Subscribe a client to stock symbols
 
         Args:
             client_id: Unique identifier for the client
             symbols: List of stock symbols to subscribe to
+            throttle_ms: Deliver at most one (latest) update per symbol per
+                interval; 0 forwards every trade (trades channel only)
+            channel: ``trades`` or a derived channel such as ``bars:1m``
+                or ``indicators``
         """
+        if channel != TRADES_CHANNEL:
+            await self._subscribe_channel(client_id, symbols, channel)
+            return
+
         # Initialize client's subscription set if needed
         if client_id not in self.client_subscriptions:
             self.client_subscriptions[client_id] = set()
 
-        # Track which symbols are new (not already subscribed by anyone)
-        new_symbols = []
-
         for symbol in symbols:
             symbol_upper = symbol.upper()
+            if symbol_upper in self.client_subscriptions[client_id]:
+                continue
 
             # Add to client's subscriptions
             self.client_subscriptions[client_id].add(symbol_upper)
 
             # Add client to symbol's client list
-            if symbol_upper not in self.symbol_clients:
-                self.symbol_clients[symbol_upper] = set()
-                new_symbols.append(symbol_upper)
+            self.symbol_clients.setdefault(symbol_upper, set()).add(client_id)
 
-            self.symbol_clients[symbol_upper].add(client_id)
+            # Subscribes upstream only if no one held the symbol yet
+            self._retain(symbol_upper)
 
-        # Subscribe to Finnhub only for new symbols
-        if new_symbols and self.finnhub_manager.is_connected():
-            await self.finnhub_manager.subscribe(new_symbols)
+        # Re-subscribing replaces the previous throttle for these symbols
+        self.client_manager.set_throttle(
+            client_id, [s.upper() for s in symbols], throttle_ms
+        )
 
         print(f"📊 Client {client_id} subscribed to: {symbols}")
 
-    async def unsubscribe(self, client_id: str, symbols: List[str]):
+    async def unsubscribe(
+        self, client_id: str, symbols: List[str], channel: str = TRADES_CHANNEL
+    ):
         """
         Unsubscribe a client from stock symbols
 
         Args:
             client_id: Unique identifier for the client
             symbols: List of stock symbols to unsubscribe from
+            channel: Channel the symbols were subscribed on
         """
-        if client_id not in self.client_subscriptions:
+        if channel != TRADES_CHANNEL:
+            await self._unsubscribe_channel(client_id, symbols, channel)
             return
 
-        # Track which symbols should be unsubscribed from Finnhub
-        symbols_to_unsubscribe = []
+        if client_id not in self.client_subscriptions:
+            return
 
         for symbol in symbols:
             symbol_upper = symbol.upper()
+            if symbol_upper not in self.client_subscriptions[client_id]:
+                continue
 
             # Remove from client's subscriptions
             self.client_subscriptions[client_id].discard(symbol_upper)
 
             # Remove client from symbol's client list
-            if symbol_upper in self.symbol_clients:
-                self.symbol_clients[symbol_upper].discard(client_id)
+            self.symbol_clients[symbol_upper].discard(client_id)
+            if not self.symbol_clients[symbol_upper]:
+                del self.symbol_clients[symbol_upper]
 
-                # If no clients want this symbol anymore, unsubscribe from Finnhub
-                if len(self.symbol_clients[symbol_upper]) == 0:
-                    del self.symbol_clients[symbol_upper]
-                    symbols_to_unsubscribe.append(symbol_upper)
+            # If nothing wants this symbol anymore, it is dropped upstream
+            # after the linger period
+            self._release(symbol_upper)
 
-        # Unsubscribe from Finnhub for symbols with no clients
-        if symbols_to_unsubscribe and self.finnhub_manager.is_connected():
-            await self.finnhub_manager.unsubscribe(symbols_to_unsubscribe)
+        self.client_manager.discard_symbols(client_id, [s.upper() for s in symbols])
 
         print(f"📊 Client {client_id} unsubscribed from: {symbols}")
 
     async def unsubscribe_all(self, client_id: str):
         """
-        Unsubscribe a client from all symbols (when they disconnect)
+        Unsubscribe a client from all symbols on all channels and drop its
+        alerts (when they disconnect)
 
         Args:
             client_id: Unique identifier for the client
         """
-        if client_id not in self.client_subscriptions:
+        removed = self.alert_engine.remove_client(client_id)
+        await self._sync_alert_symbols({alert.symbol for alert in removed})
+
+        for channel, symbols in list(self.client_channels.get(client_id, {}).items()):
+            await self._unsubscribe_channel(client_id, list(symbols), channel)
+        self.client_channels.pop(client_id, None)
+
+        if client_id in self.client_subscriptions:
+            # Unsubscribe from all symbols this client was subscribed to
+            symbols = list(self.client_subscriptions[client_id])
+            await self.unsubscribe(client_id, symbols)
+
+            # Remove client's subscription record
+            del self.client_subscriptions[client_id]
+
+        self._log_leaked_refs()
+
+    def _log_leaked_refs(self):
+        """
+        Report upstream references left once no client holds a subscription,
+        channel or alert: each one is a refcounting bug that keeps a symbol
+        subscribed upstream. They are logged, not released, so the bug
+        stays visible.
+        """
+        if (
+            not self.symbol_refs
+            or self.client_subscriptions
+            or self.client_channels
+            or len(self.alert_engine)
+        ):
             return
+        leaked = ", ".join(f"{s}={n}" for s, n in self.symbol_refs.items())
+        print(f"❌ Symbol refs leaked with no clients left: {leaked}")
+        activity_log.record_event(
+            "error", f"Leaked symbol refs: {leaked}", level="error"
+        )
+
+    async def _subscribe_channel(
+        self, client_id: str, symbols: List[str], channel: str
+    ):
+        if channel not in self.channels:
+            raise ValueError(f"Unknown channel: {channel}")
 
-        # Get all symbols this client was subscribed to
-        symbols = list(self.client_subscriptions[client_id])
+        held = self.client_channels.setdefault(client_id, {}).setdefault(
+            channel, set()
+        )
+        by_symbol = self.channel_clients.setdefault(channel, {})
 
-        # Unsubscribe from all symbols
-        await self.unsubscribe(client_id, symbols)
+        for symbol in symbols:
+            symbol_upper = symbol.upper()
+            if symbol_upper in held:
+                continue
+            held.add(symbol_upper)
+            by_symbol.setdefault(symbol_upper, set()).add(client_id)
+            self._retain(symbol_upper)
 
-        # Remove client's subscription record
-        del self.client_subscriptions[client_id]
+        print(f"📊 Client {client_id} subscribed to {channel}: {symbols}")
+
+    async def _unsubscribe_channel(
+        self, client_id: str, symbols: List[str], channel: str
+    ):
+        held = self.client_channels.get(client_id, {}).get(channel)
+        if not held:
+            return
+
+        by_symbol = self.channel_clients.get(channel, {})
+
+        for symbol in symbols:
+            symbol_upper = symbol.upper()
+            if symbol_upper not in held:
+                continue
+            held.discard(symbol_upper)
+            clients = by_symbol.get(symbol_upper)
+            if clients is not None:
+                clients.discard(client_id)
+                if not clients:
+                    del by_symbol[symbol_upper]
+            self._release(symbol_upper)
+
+        print(f"📊 Client {client_id} unsubscribed from {channel}: {symbols}")
+
+    async def add_alerts(self, client_id: str, alerts: List[Alert]):
+        """
+        Register price alerts for a client (one-shot; an alert is removed
+        once it triggers)
+
+        Args:
+            client_id: Unique identifier for the client
+            alerts: Alerts to add; an existing alert with the same id is replaced
+
+        Raises:
+            ValueError: If the client would exceed its alert limit
+        """
+        replaced = self.alert_engine.add(alerts)
+        await self._sync_alert_symbols(
+            {alert.symbol for alert in alerts} | {alert.symbol for alert in replaced}
+        )
+        print(f"🔔 Client {client_id} added {len(alerts)} alert(s)")
+
+    async def remove_alerts(self, client_id: str, alert_ids: List[str]) -> List[str]:
+        """
+        Remove a client's price alerts
+
+        Args:
+            client_id: Unique identifier for the client
+            alert_ids: Ids of the alerts to remove
+
+        Returns:
+            Ids that were registered and are now removed
+        """
+        removed = [self.alert_engine.remove(client_id, i) for i in alert_ids]
+        removed = [alert for alert in removed if alert is not None]
+        await self._sync_alert_symbols({alert.symbol for alert in removed})
+        return [alert.id for alert in removed]
+
+    async def _sync_alert_symbols(self, symbols: Set[str]):
+        """Take or drop the alert reference on each symbol to match the engine"""
+        for symbol in symbols:
+            wanted = self.alert_engine.has_alerts(symbol)
+            if wanted and symbol not in self.alert_symbols:
+                self.alert_symbols.add(symbol)
+                self._retain(symbol)
+            elif not wanted and symbol in self.alert_symbols:
+                self.alert_symbols.discard(symbol)
+                self._release(symbol)
+
+    def _retain(self, symbol: str):
+        """Add an upstream reference, subscribing upstream on the first one"""
+        count = self.symbol_refs.get(symbol, 0) + 1
+        self.symbol_refs[symbol] = count
+        if count > 1:
+            return
+        timer = self._lingering.pop(symbol, None)
+        if timer:
+            # Still subscribed upstream; just stop the pending drop
+            timer.cancel()
+            metrics.upstream_linger_reuses += 1
+            return
+        self._queue_upstream(symbol, subscribe=True)
+
+    def _release(self, symbol: str):
+        """Drop an upstream reference; the last one starts the linger period"""
+        count = self.symbol_refs.get(symbol, 0) - 1
+        if count > 0:
+            self.symbol_refs[symbol] = count
+            return
+        self.symbol_refs.pop(symbol, None)
+        if SUBSCRIBE_LINGER_MS:
+            loop = asyncio.get_running_loop()
+            self._lingering[symbol] = loop.call_later(
+                SUBSCRIBE_LINGER_MS / 1000, self._drop_symbol, symbol
+            )
+        else:
+            self._drop_symbol(symbol)
+
+    def _drop_symbol(self, symbol: str):
+        """Forget per-symbol state and unsubscribe upstream"""
+        self._lingering.pop(symbol, None)
+        self.tick_history.discard(symbol)
+        self.bar_aggregator.discard(symbol)
+        self.indicator_engine.discard(symbol)
+        metrics.discard_symbol(symbol)
+        timer = self._indicator_timers.pop(symbol, None)
+        if timer:
+            timer.cancel()
+        self._queue_upstream(symbol, subscribe=False)
+
+    def _queue_upstream(self, symbol: str, subscribe: bool):
+        """
+        Queue an upstream subscribe/unsubscribe for the next batched send
+
+        Opposite changes to the same symbol within one batch cancel out.
+        """
+        add, cancel = (
+            (self._pending_subscribe, self._pending_unsubscribe)
+            if subscribe
+            else (self._pending_unsubscribe, self._pending_subscribe)
+        )
+        if symbol in cancel:
+            cancel.discard(symbol)
+        else:
+            add.add(symbol)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_upstream())
+
+    async def _flush_upstream(self):
+        """Send all queued upstream changes as one batch per direction"""
+        await asyncio.sleep(UPSTREAM_BATCH_MS / 1000)
+        self._flush_task = None
+        subscribe = sorted(self._pending_subscribe)
+        unsubscribe = sorted(self._pending_unsubscribe)
+        self._pending_subscribe.clear()
+        self._pending_unsubscribe.clear()
+        # The upstream records changes made while it is disconnected and
+        # replays them on reconnect
+        try:
+            if unsubscribe:
+                await self.finnhub_manager.unsubscribe(unsubscribe)
+            if subscribe:
+                await self.finnhub_manager.subscribe(subscribe)
+        except Exception as e:
+            print(f"❌ Upstream subscription update failed: {e}")
+        metrics.upstream_batches += 1
+
+    def send_snapshot(self, client_id: str, symbols: List[str]) -> int:
+        """
+        Queue the cached last trade for each symbol to a new subscriber
+
+        Called after the subscription ack so clients don't wait for the
+        next trade on thinly traded symbols or after the market closes. A
+        delta client re-subscribing a symbol it is already up to date on
+        gets nothing rather than an empty delta.
+
+        Args:
+            client_id: Unique identifier for the client
+            symbols: Symbols the client just subscribed to
+
+        Returns:
+            Number of cached updates queued
+        """
+        sent = 0
+        for symbol in symbols:
+            update = self.quote_cache.get(symbol.upper())
+            if update is not None and self.client_manager.enqueue_snapshot(
+                client_id, update
+            ):
+                sent += 1
+        return sent
 
     def get_subscribed_symbols(self) -> List[str]:
         """
@@ -127,7 +445,7 @@ class SubscriptionManager:
         Returns:
             List of subscribed symbols
         """
-        return list(self.symbol_clients.keys())
+        return list(self.symbol_refs.keys())
 
     def get_subscription_count(self) -> int:
         """
@@ -136,7 +454,31 @@ class SubscriptionManager:
         Returns:
             Number of subscribed symbols
         """
-        return len(self.symbol_clients)
+        return len(self.symbol_refs)
+
+    def get_client_subscription_count(self) -> int:
+        """
+        Get the number of (client, channel, symbol) subscriptions
+
+        Returns:
+            Subscriptions summed over clients and channels
+        """
+        trades = sum(len(symbols) for symbols in self.client_subscriptions.values())
+        channels = sum(
+            len(symbols)
+            for held in self.client_channels.values()
+            for symbols in held.values()
+        )
+        return trades + channels
+
+    def get_lingering_count(self) -> int:
+        """
+        Get the number of symbols kept upstream only by the linger period
+
+        Returns:
+            Number of lingering symbols
+        """
+        return len(self._lingering)
 
     async def _handle_finnhub_message(self, message: dict):
         """
@@ -149,6 +491,7 @@ class SubscriptionManager:
             started = time.perf_counter()
             metrics.finnhub_messages_received += 1
             trades = message["data"]
+            alert_symbols = set()
 
             for trade in trades:
                 symbol = trade.get("s", "").upper()  # Stock symbol
@@ -159,18 +502,107 @@ class SubscriptionManager:
                 if not symbol or price is None:
                     continue
 
-                # Find all clients subscribed to this symbol
-                clients_to_notify = self.symbol_clients.get(symbol, set())
+                # Prepare update message, encoded at most once and shared by
+                # every client
+                update = PriceUpdate(
+                    symbol,
+                    {"price": price, "volume": volume, "timestamp": timestamp},
+                )
+                self.quote_cache.update(update)
+
+                # Ignore stragglers for symbols nobody holds anymore; lingering
+                # symbols keep their history current for a returning client
+                if symbol not in self.symbol_refs and symbol not in self._lingering:
+                    continue
+                metrics.symbol_ticks[symbol] = metrics.symbol_ticks.get(symbol, 0) + 1
+
+                if timestamp is not None:
+                    self.tick_history.record(symbol, timestamp, price, volume or 0)
+                    for interval, bar in self.bar_aggregator.on_trade(
+                        symbol, timestamp, price, volume or 0
+                    ):
+                        self._publish_bar(symbol, interval, bar)
+                self.indicator_engine.on_trade(symbol, price, volume or 0, timestamp)
+                self._schedule_indicators(symbol)
+
+                fired = self.alert_engine.check(symbol, price)
+                if fired:
+                    alert_symbols.add(symbol)
+                    self._publish_alerts(fired, price, timestamp)
 
-                # Prepare update message
-                update_message = {
-                    "type": "price_update",
-                    "symbol": symbol,
-                    "data": {"price": price, "volume": volume, "timestamp": timestamp},
-                }
+                # Find all clients subscribed to this symbol
+                clients_to_notify = self.symbol_clients.get(symbol)
+                if not clients_to_notify:
+                    continue
 
-                # Broadcast to all subscribed clients
+                # Queue for all subscribed clients; each client's writer task
+                # does the actual send so a slow socket can't stall fan-out
                 for client_id in clients_to_notify:
-                    await self.client_manager.send_to_client(client_id, update_message)
+                    self.client_manager.enqueue_update(client_id, update)
+                metrics.symbol_fanout[symbol] = (
+                    metrics.symbol_fanout.get(symbol, 0) + len(clients_to_notify)
+                )
 
             metrics.finnhub_latency.record((time.perf_counter() - started) * 1000)
+
+            if alert_symbols:
+                # Symbols whose last alert just fired may no longer be needed
+                await self._sync_alert_symbols(alert_symbols)
+
+    def _publish_bar(self, symbol: str, interval: str, bar: Bar):
+        """Push a completed bar to its bars:<interval> subscribers"""
+        clients = self.channel_clients.get(f"bars:{interval}", {}).get(symbol)
+        if not clients:
+            return
+        message = encode_message(
+            {
+                "type": "bar",
+                "symbol": symbol,
+                "interval": interval,
+                "bar": bar.to_dict(),
+            }
+        )
+        metrics.ws_payload_encodes_saved += len(clients) - 1
+        for client_id in clients:
+            self.client_manager.enqueue(client_id, message)
+
+    def _schedule_indicators(self, symbol: str):
+        """Arrange one indicators push for ``symbol`` if anyone wants it"""
+        if symbol in self._indicator_timers:
+            return
+        if not self.channel_clients.get(INDICATORS_CHANNEL, {}).get(symbol):
+            return
+        loop = asyncio.get_running_loop()
+        self._indicator_timers[symbol] = loop.call_later(
+            INDICATOR_INTERVAL_MS / 1000, self._publish_indicators, symbol
+        )
+
+    def _publish_indicators(self, symbol: str):
+        """Push the latest indicator values to indicators subscribers"""
+        self._indicator_timers.pop(symbol, None)
+        clients = self.channel_clients.get(INDICATORS_CHANNEL, {}).get(symbol)
+        state = self.indicator_engine.get(symbol)
+        if not clients or state is None:
+            return
+        message = encode_message(
+            {"type": "indicators", "symbol": symbol, "data": state.to_dict()}
+        )
+        metrics.ws_payload_encodes_saved += len(clients) - 1
+        for client_id in clients:
+            self.client_manager.enqueue(client_id, message)
+
+    def _publish_alerts(self, fired: List[Alert], price: float, timestamp):
+        """Notify each owner of a triggered alert"""
+        metrics.alerts_triggered += len(fired)
+        for alert in fired:
+            self.client_manager.enqueue(
+                alert.client_id,
+                encode_message(
+                    {
+                        "type": "alert_triggered",
+                        "alert": alert.to_dict(),
+                        "price": price,
+                        "timestamp": timestamp,
+                    }
+                ),
+            )
@@ -0,0 +1,133 @@
+"""
+Dashboard telemetry stream (WebSocket /telemetry)
+
+One hub task builds the health/metrics snapshot every
+``TELEMETRY_INTERVAL_MS``, diffs it against the previous one and encodes the
+changes once; every open dashboard gets the same text. New activity log
+events ride along. The task only runs while someone is watching.
+
+Messages (JSON):
+
+* ``{"type": "snapshot", "data": {...}}``: full state, on connect and to
+  resync a viewer that fell behind
+* ``{"type": "delta", "data": {...}}``: changed fields only, nested like the
+  snapshot; removed keys are ``null``
+* ``{"type": "activity", "events": [...]}``: new events, newest first;
+  ``"reset": true`` on connect
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import AsyncIterator, Callable
+
+import activity_log
+import codec
+
+TELEMETRY_INTERVAL_MS = max(250, int(os.getenv("TELEMETRY_INTERVAL_MS", "2000")))
+
+# Messages buffered per viewer before it is resynced with a fresh snapshot
+VIEWER_QUEUE_SIZE = 16
+
+_MISSING = object()
+
+
+def diff(old: dict, new: dict) -> dict:
+    """Nested dict of the values in ``new`` that differ from ``old``"""
+    changes: dict = {}
+    for key, value in new.items():
+        before = old.get(key, _MISSING)
+        if value == before:
+            continue
+        if isinstance(value, dict) and isinstance(before, dict):
+            changes[key] = diff(before, value)
+        else:
+            changes[key] = value
+    for key in old.keys() - new.keys():
+        changes[key] = None
+    return changes
+
+
+class TelemetryHub:
+    """Computes telemetry once per interval and fans it out to viewers"""
+
+    def __init__(
+        self,
+        build: Callable[[], dict],
+        interval_ms: int = TELEMETRY_INTERVAL_MS,
+    ):
+        self.build = build
+        self.interval_s = interval_ms / 1000
+        self._viewers: set[asyncio.Queue] = set()
+        self._task: asyncio.Task | None = None
+        self._state: dict | None = None
+        self._snapshot_text: str | None = None
+        self._activity_id = 0
+
+    @property
+    def viewers(self) -> int:
+        return len(self._viewers)
+
+    def _snapshot(self) -> str:
+        """Full-state message, encoded at most once per interval"""
+        if self._state is None:
+            self._state = self.build()
+        if self._snapshot_text is None:
+            self._snapshot_text = codec.dumps({"type": "snapshot", "data": self._state})
+        return self._snapshot_text
+
+    async def stream(self) -> AsyncIterator[str]:
+        """Encoded messages for one viewer, starting with a snapshot"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=VIEWER_QUEUE_SIZE)
+        if not self._viewers:
+            self._state = self._snapshot_text = None  # Stale since last viewer
+        self._viewers.add(queue)
+        if self._task is None or self._task.done():
+            self._activity_id = activity_log.last_id()
+            self._task = asyncio.create_task(self._run())
+        try:
+            yield self._snapshot()
+            yield codec.dumps(
+                {"type": "activity", "events": activity_log.get_events(), "reset": True}
+            )
+            while True:
+                yield await queue.get()
+        finally:
+            self._viewers.discard(queue)
+            if not self._viewers and self._task:
+                self._task.cancel()
+                self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_s)
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"❌ Telemetry tick failed: {e}")
+
+    def tick(self):
+        """Build, diff and publish one interval's messages"""
+        state = self.build()
+        changes = diff(self._state, state) if self._state is not None else state
+        self._state = state
+        self._snapshot_text = None
+
+        messages = []
+        if changes:
+            messages.append(codec.dumps({"type": "delta", "data": changes}))
+        events = activity_log.events_since(self._activity_id)
+        if events:
+            self._activity_id = events[0]["id"]
+            messages.append(codec.dumps({"type": "activity", "events": events}))
+
+        for queue in self._viewers:
+            if queue.qsize() + len(messages) > queue.maxsize:
+                # Too far behind for deltas to apply cleanly: start it over
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(self._snapshot())
+                continue
+            for message in messages:
+                queue.put_nowait(message)
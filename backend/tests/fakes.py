@@ -0,0 +1,61 @@
+"""Test doubles for the client socket and the upstream connection"""
+
+import asyncio
+
+import codec
+
+
+class FakeWebSocket:
+    """Collects what the writer sends, optionally slowly"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.sent: list = []
+        self.closed_with: int | None = None
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(codec.loads(text))
+
+    async def send_bytes(self, data: bytes):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(data)
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.closed_with = code
+
+
+class FakeUpstream:
+    """Records upstream subscribe/unsubscribe calls"""
+
+    def __init__(self):
+        self.subscribed: list[str] = []
+        self.unsubscribed: list[str] = []
+        self.calls: list[tuple[str, list[str]]] = []
+        self.message_handler = None
+        self.connected = False
+
+    def set_message_handler(self, handler):
+        self.message_handler = handler
+
+    async def connect(self):
+        self.connected = True
+
+    async def disconnect(self):
+        self.connected = False
+
+    def is_connected(self) -> bool:
+        return True
+
+    async def subscribe(self, symbols: list[str]):
+        self.subscribed.extend(symbols)
+        self.calls.append(("subscribe", list(symbols)))
+
+    async def unsubscribe(self, symbols: list[str]):
+        self.unsubscribed.extend(symbols)
+        self.calls.append(("unsubscribe", list(symbols)))
+
+    def snapshot(self) -> dict:
+        return {}
@@ -0,0 +1,96 @@
+import logging
+import threading
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import access_log
+import activity_log
+import metrics
+from access_log import AccessLogMiddleware, real_ip, start_queue_logging
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    @app.get("/polled")
+    async def polled():
+        return {}
+
+    app.add_middleware(
+        AccessLogMiddleware,
+        quiet_prefixes=("/assets",),
+        activity_skip_paths={"/polled"},
+    )
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_requests_are_counted_by_route_template_and_status(monkeypatch):
+    monkeypatch.setattr(metrics, "http_requests", {})
+    monkeypatch.setattr(metrics, "http_requests_total", 0)
+    client = _client()
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/items/x")
+    client.get("/boom")
+    client.get("/nowhere")
+    client.get("/assets/app.js")  # Quiet: not counted at all
+    assert metrics.http_requests == {
+        ("GET", "/items/{item_id}", 200): 2,
+        ("GET", "/items/{item_id}", 422): 1,
+        ("GET", "/boom", 500): 1,
+        ("GET", "unmatched", 404): 1,
+    }
+    assert metrics.http_requests_total == 5
+
+
+def test_polled_paths_stay_out_of_the_activity_log():
+    client = _client()
+    before = activity_log.last_id()
+    client.get("/polled")
+    client.get("/items/404")
+    summaries = [e["summary"] for e in activity_log.events_since(before)]
+    assert len(summaries) == 1
+    assert summaries[0].startswith("GET /items/404 200 ")
+
+
+def test_real_ip_prefers_forwarded_headers():
+    scope = {
+        "client": ("10.0.0.1", 5000),
+        "headers": [
+            (b"x-real-ip", b"198.51.100.2"),
+            (b"x-forwarded-for", b"203.0.113.7, 10.0.0.1"),
+        ],
+    }
+    assert real_ip(scope) == "203.0.113.7"
+    scope["headers"] = scope["headers"][:1]
+    assert real_ip(scope) == "198.51.100.2"
+    assert real_ip({"client": ("10.0.0.1", 5000)}) == "10.0.0.1"
+    assert real_ip({}) == "unknown"
+
+
+def test_queue_logging_formats_on_the_listener_thread(monkeypatch):
+    monkeypatch.setattr(access_log.atexit, "register", lambda fn: None)
+    emitted: list[tuple[str, str]] = []
+
+    class Recorder(logging.Handler):
+        def emit(self, record):
+            emitted.append((threading.current_thread().name, self.format(record)))
+
+    logger = logging.getLogger("test_access_queue")
+    logger.setLevel(logging.INFO)
+    logger.addHandler(Recorder())
+    listener = start_queue_logging(logger)
+    logger.info('%s - "%s %s" %s', "1.2.3.4", "GET", "/x", 200)
+    listener.stop()
+
+    assert emitted == [(emitted[0][0], '1.2.3.4 - "GET /x" 200')]
+    assert emitted[0][0] != threading.current_thread().name
@@ -0,0 +1,43 @@
+import re
+
+import activity_log
+
+
+def test_since_returns_only_newer_events_newest_first():
+    activity_log.record_event("http", "GET /a 200 1ms")
+    cursor = activity_log.last_id()
+    activity_log.record_event("ws_connect", "Client 1 connected")
+    activity_log.record_event("http", "GET /b 404 0ms", level="warn")
+
+    events = activity_log.get_events(since=cursor)
+    assert [e["summary"] for e in events] == ["GET /b 404 0ms", "Client 1 connected"]
+    assert [e["id"] for e in events] == [cursor + 2, cursor + 1]
+    assert events[0]["level"] == "warn"
+    assert re.fullmatch(r"\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d+Z", events[0]["ts"])
+
+    assert activity_log.get_events(since=activity_log.last_id()) == []
+    assert activity_log.events_since(cursor) == events
+
+
+def test_type_filter_and_limit():
+    cursor = activity_log.last_id()
+    for i in range(5):
+        activity_log.record_event("http", f"GET /{i} 200 0ms")
+        activity_log.record_event("subscribe", f"Client {i} subscribed AAPL")
+
+    subscribes = activity_log.get_events(since=cursor, event_type="subscribe")
+    assert [e["summary"] for e in subscribes] == [
+        f"Client {i} subscribed AAPL" for i in range(4, -1, -1)
+    ]
+    assert len(activity_log.get_events(2, since=cursor)) == 2
+    assert activity_log.get_events(since=cursor, event_type="nope") == []
+
+
+def test_log_keeps_only_the_newest_events():
+    for i in range(200):
+        activity_log.record_event("http", f"GET /{i} 200 0ms")
+    events = activity_log.get_events(limit=1000)
+    assert len(events) == activity_log._MAX_EVENTS
+    assert events[0]["id"] == activity_log.last_id()
+    # A cursor older than the log returns everything still held
+    assert len(activity_log.get_events(since=0)) == activity_log._MAX_EVENTS
@@ -0,0 +1,69 @@
+import pytest
+
+from alerts import Alert, AlertEngine
+
+
+def _alert(alert_id: str, alert_type: str, threshold: float, client: str = "c1"):
+    return Alert(alert_id, client, "AAPL", alert_type, threshold)
+
+
+def test_alerts_fire_once_when_threshold_is_crossed():
+    engine = AlertEngine()
+    engine.add(
+        [
+            _alert("up-200", "price_above", 200),
+            _alert("up-210", "price_above", 210),
+            _alert("down-190", "price_below", 190),
+        ]
+    )
+
+    assert engine.check("AAPL", 199.99) == []
+    assert [a.id for a in engine.check("AAPL", 200.0)] == ["up-200"]
+    # One-shot: a fired alert is gone
+    assert engine.check("AAPL", 205.0) == []
+    assert [a.id for a in engine.check("AAPL", 189.5)] == ["down-190"]
+    assert [a.id for a in engine.check("AAPL", 250.0)] == ["up-210"]
+    assert len(engine) == 0
+    assert not engine.has_alerts("AAPL")
+
+
+def test_one_trade_fires_every_crossed_alert():
+    engine = AlertEngine()
+    engine.add([_alert(f"a{t}", "price_above", t) for t in (101, 102, 103, 150)])
+    fired = engine.check("AAPL", 120.0)
+    assert sorted(a.id for a in fired) == ["a101", "a102", "a103"]
+    assert len(engine) == 1
+
+
+def test_re_adding_an_id_replaces_the_alert():
+    engine = AlertEngine()
+    engine.add([_alert("a", "price_above", 100)])
+    replaced = engine.add([_alert("a", "price_above", 300)])
+    assert [a.threshold for a in replaced] == [100]
+    assert engine.check("AAPL", 200.0) == []
+    assert [a.threshold for a in engine.check("AAPL", 300.0)] == [300]
+
+
+def test_remove_client_drops_only_its_alerts():
+    engine = AlertEngine()
+    engine.add([_alert("a", "price_above", 100, "c1")])
+    engine.add([_alert("a", "price_above", 100, "c2")])
+    assert len(engine.remove_client("c1")) == 1
+    assert [a.client_id for a in engine.check("AAPL", 100.0)] == ["c2"]
+
+
+def test_per_client_limit_is_all_or_nothing():
+    engine = AlertEngine(max_per_client=2)
+    engine.add([_alert("a", "price_above", 100)])
+    with pytest.raises(ValueError):
+        engine.add([_alert("b", "price_above", 100), _alert("c", "price_above", 100)])
+    assert len(engine) == 1
+
+
+def test_from_dict_validates_fields():
+    data = {"id": "x", "symbol": " aapl ", "alert_type": "price_below", "threshold": 5}
+    alert = Alert.from_dict("c1", data)
+    assert (alert.symbol, alert.threshold) == ("AAPL", 5.0)
+    del data["threshold"]
+    with pytest.raises(ValueError):
+        Alert.from_dict("c1", data)
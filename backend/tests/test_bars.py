@@ -0,0 +1,97 @@
+import asyncio
+
+import metrics
+from bars import BarAggregator, BarBuilder
+from client_manager import ClientManager
+from subscription_manager import SubscriptionManager
+
+from .fakes import FakeUpstream, FakeWebSocket
+
+
+def test_trades_roll_into_bars():
+    builder = BarBuilder(1000)
+    assert builder.update(100, 10.0, 1) is None
+    assert builder.update(900, 12.0, 2) is None
+    completed = builder.update(1_100, 11.0, 1)
+    assert completed.to_dict() == {
+        "start": 0,
+        "open": 10.0,
+        "high": 12.0,
+        "low": 10.0,
+        "close": 12.0,
+        "volume": 3,
+        "trades": 2,
+    }
+    assert builder.current.start == 1_000
+
+
+def test_late_trade_patches_its_own_bar_not_the_current_one():
+    builder = BarBuilder(1000)
+    builder.update(100, 10.0, 1)
+    builder.update(1_100, 11.0, 1)
+    builder.update(3_100, 13.0, 1)  # Nothing traded in 2000-2999
+    patched = metrics.bars_late_trades_patched
+    dropped = metrics.bars_late_trades_dropped
+
+    builder.update(500, 50.0, 4)
+    first = builder.completed[0]
+    assert (first.high, first.close, first.volume, first.trades) == (50.0, 10.0, 5, 2)
+
+    builder.update(2_500, 1.0, 1)  # Bucket with no bar: dropped
+    assert metrics.bars_late_trades_patched == patched + 1
+    assert metrics.bars_late_trades_dropped == dropped + 1
+    current = builder.current
+    assert (current.high, current.low, current.volume) == (13.0, 13.0, 1)
+    assert current.trades == 1
+    assert len(builder.completed) == 2
+
+
+def test_aggregator_completes_each_interval_on_its_own_boundary():
+    aggregator = BarAggregator()
+    assert aggregator.on_trade("AAPL", 59_500, 1.0, 1) == []
+    completed = aggregator.on_trade("AAPL", 60_200, 2.0, 1)
+    assert [(name, bar.start) for name, bar in completed] == [
+        ("1s", 59_000),
+        ("1m", 0),
+    ]
+    assert aggregator.get("AAPL", "5m").current.volume == 2
+    aggregator.discard("AAPL")
+    assert aggregator.get("AAPL", "1s") is None
+
+
+def test_completed_bars_are_pushed_to_channel_subscribers():
+    async def run():
+        clients = ClientManager()
+        manager = SubscriptionManager(FakeUpstream(), clients)
+        bar_ws, trade_ws = FakeWebSocket(), FakeWebSocket()
+        bar_client = clients.add_client(bar_ws)
+        trade_client = clients.add_client(trade_ws)
+        await manager.subscribe(bar_client, ["AAPL"], channel="bars:1s")
+        await manager.subscribe(trade_client, ["AAPL"])
+        for timestamp, price in ((100, 1.0), (900, 3.0), (1_100, 2.0)):
+            trade = {"s": "AAPL", "p": price, "t": timestamp, "v": 1}
+            await manager._handle_finnhub_message({"type": "trade", "data": [trade]})
+        await asyncio.sleep(0.01)
+        for client_id in (bar_client, trade_client):
+            await manager.unsubscribe_all(client_id)
+            clients.remove_client(client_id)
+        return bar_ws.sent, trade_ws.sent
+
+    bars, trades = asyncio.run(run())
+    assert bars == [
+        {
+            "type": "bar",
+            "symbol": "AAPL",
+            "interval": "1s",
+            "bar": {
+                "start": 0,
+                "open": 1.0,
+                "high": 3.0,
+                "low": 1.0,
+                "close": 3.0,
+                "volume": 2,
+                "trades": 2,
+            },
+        }
+    ]
+    assert [m["type"] for m in trades] == ["price_update"] * 3
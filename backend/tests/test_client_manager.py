@@ -0,0 +1,363 @@
+import asyncio
+
+import client_manager
+import metrics
+from client_manager import ClientManager, ClientOutbox, PriceUpdate
+
+from .fakes import FakeWebSocket
+
+
+def test_slow_client_does_not_hold_up_the_others():
+    async def run():
+        manager = ClientManager()
+        slow = FakeWebSocket(delay=0.05)
+        fast = FakeWebSocket()
+        manager.add_client(slow)
+        manager.add_client(fast)
+        for i in range(10):
+            await manager.broadcast({"type": "ping", "i": i})
+        await asyncio.sleep(0.02)
+        sent = len(slow.sent), len(fast.sent)
+        for client_id in list(manager.outboxes):
+            manager.remove_client(client_id)
+        return sent
+
+    slow_sent, fast_sent = asyncio.run(run())
+    assert fast_sent == 10
+    assert slow_sent <= 1
+
+
+def test_full_queue_drops_the_oldest_messages(monkeypatch):
+    monkeypatch.setattr(client_manager, "BACKPRESSURE_POLICY", "drop_oldest")
+
+    async def run():
+        ws = FakeWebSocket()
+        outbox = ClientOutbox("c", ws, lambda _: None, maxsize=3)
+        # The writer only runs once this coroutine yields
+        accepted = [outbox.put({"i": i}) for i in range(10)]
+        await asyncio.sleep(0.01)
+        outbox.close()
+        return accepted, outbox.dropped, ws.sent
+
+    accepted, dropped, sent = asyncio.run(run())
+    assert accepted == [True] * 3 + [False] * 7
+    assert dropped == 7
+    assert sent == [{"i": 7}, {"i": 8}, {"i": 9}]
+
+
+def test_send_failure_reports_the_client():
+    class BrokenWebSocket(FakeWebSocket):
+        async def send_text(self, text: str):
+            raise ConnectionError("gone")
+
+    async def run():
+        failed = []
+        outbox = ClientOutbox("c", BrokenWebSocket(), failed.append)
+        outbox.put({"type": "ping"})
+        await asyncio.sleep(0.01)
+        return failed, outbox.task.done()
+
+    assert asyncio.run(run()) == (["c"], True)
+
+
+
+class StalledWebSocket(FakeWebSocket):
+    """A socket whose sends never complete"""
+
+    async def send_text(self, text: str):
+        await asyncio.Event().wait()
+
+
+def test_stalled_socket_is_evicted_while_drops_keep_its_queue_short(monkeypatch):
+    monkeypatch.setattr(client_manager, "BACKPRESSURE_POLICY", "disconnect")
+    monkeypatch.setattr(client_manager, "MAX_LAG_S", 0.2)
+
+    async def run():
+        ws = StalledWebSocket()
+        removed = []
+        outbox = ClientOutbox("c", ws, removed.append, maxsize=8)
+        for i in range(100):  # About 1000 msgs/s for 0.5 s
+            outbox.put({"i": i})
+            await asyncio.sleep(0.005)
+        await asyncio.sleep(0.01)
+        outbox.close()
+        return outbox, ws, removed
+
+    outbox, ws, removed = asyncio.run(run())
+    assert outbox.dropped > 0
+    assert outbox.evicted
+    assert outbox.lagging
+    assert removed == ["c"]
+    assert ws.closed_with == client_manager.SLOW_CLIENT_CLOSE_CODE
+
+
+def test_lag_counts_from_the_oldest_undelivered_message():
+    async def run():
+        outbox = ClientOutbox("c", StalledWebSocket(), lambda _: None, maxsize=2)
+        outbox.put({"i": 0})
+        await asyncio.sleep(0.05)  # The writer took it and never finishes
+        for i in range(1, 5):
+            outbox.put({"i": i})  # Drops all but the newest two
+        stalled = outbox.lag()
+        outbox.close()
+
+        fast = ClientOutbox("c", FakeWebSocket(), lambda _: None)
+        fast.put({"i": 0})
+        await asyncio.sleep(0.01)
+        caught_up = fast.lag()
+        fast.close()
+        return stalled, caught_up
+
+    stalled, caught_up = asyncio.run(run())
+    assert stalled >= 0.05
+    assert caught_up == 0.0
+
+def test_price_update_is_encoded_once_for_every_subscriber():
+    async def run():
+        manager = ClientManager()
+        sockets = [FakeWebSocket() for _ in range(4)]
+        ids = [manager.add_client(ws) for ws in sockets]
+        encodes = metrics.ws_payload_encodes
+        update = PriceUpdate("AAPL", {"price": 1.5, "volume": 2, "timestamp": 3})
+        for client_id in ids:
+            manager.enqueue_update(client_id, update)
+        await asyncio.sleep(0.01)
+        for client_id in ids:
+            manager.remove_client(client_id)
+        return sockets, metrics.ws_payload_encodes - encodes
+
+    sockets, encodes = asyncio.run(run())
+    assert encodes == 1
+    expected = {"type": "price_update", "symbol": "AAPL"}
+    expected["data"] = {"price": 1.5, "volume": 2, "timestamp": 3}
+    assert all(ws.sent == [expected] for ws in sockets)
+
+
+def test_broadcast_counts_saved_encodes_only_when_it_encoded():
+    async def run():
+        manager = ClientManager()
+        for _ in range(3):
+            manager.add_client(FakeWebSocket())
+        before = metrics.ws_payload_encodes_saved
+        await manager.broadcast('{"type":"ping"}')
+        pre_encoded = metrics.ws_payload_encodes_saved - before
+        await manager.broadcast({"type": "ping"})
+        encoded = metrics.ws_payload_encodes_saved - before - pre_encoded
+        for client_id in list(manager.outboxes):
+            manager.remove_client(client_id)
+        return pre_encoded, encoded
+
+    assert asyncio.run(run()) == (0, 2)
+
+
+def _update(symbol: str, price: float, timestamp: int, volume: int = 1) -> PriceUpdate:
+    return PriceUpdate(
+        symbol, {"price": price, "volume": volume, "timestamp": timestamp}
+    )
+
+
+def test_throttled_symbol_sends_first_and_latest_update_per_interval():
+    async def run():
+        ws = FakeWebSocket()
+        outbox = ClientOutbox("c", ws, lambda _: None)
+        outbox.set_throttle("AAPL", 50)
+        for i in range(5):
+            outbox.put_update(_update("AAPL", 100 + i, i))
+            outbox.put_update(_update("MSFT", 200 + i, i))
+        await asyncio.sleep(0.01)
+        before_flush = [(m["symbol"], m["data"]["price"]) for m in ws.sent]
+        await asyncio.sleep(0.08)
+        outbox.close()
+        return before_flush, [(m["symbol"], m["data"]["price"]) for m in ws.sent]
+
+    before_flush, sent = asyncio.run(run())
+    msft = [("MSFT", 200 + i) for i in range(5)]
+    assert [m for m in before_flush if m[0] == "AAPL"] == [("AAPL", 100)]
+    assert [m for m in sent if m[0] == "AAPL"] == [("AAPL", 100), ("AAPL", 104)]
+    assert [m for m in sent if m[0] == "MSFT"] == msft
+
+
+def test_clearing_a_throttle_flushes_the_pending_update():
+    async def run():
+        ws = FakeWebSocket()
+        outbox = ClientOutbox("c", ws, lambda _: None)
+        outbox.set_throttle("AAPL", 10_000)
+        outbox.put_update(_update("AAPL", 1.0, 1))
+        outbox.put_update(_update("AAPL", 2.0, 2))
+        outbox.set_throttle("AAPL", 0)
+        await asyncio.sleep(0.01)
+        outbox.close()
+        return [m["data"]["price"] for m in ws.sent]
+
+    assert asyncio.run(run()) == [1.0, 2.0]
+
+
+def test_batching_bundles_one_upstream_frame_into_one_price_batch():
+    async def run():
+        ws = FakeWebSocket()
+        outbox = ClientOutbox("c", ws, lambda _: None)
+        outbox.set_batching(True, 0)
+        # One upstream frame: enqueued without yielding
+        for i, symbol in enumerate(("AAPL", "MSFT", "AAPL")):
+            outbox.put_update(_update(symbol, 10 + i, i))
+        await asyncio.sleep(0.01)
+        outbox.put_update(_update("TSLA", 5, 9))
+        await asyncio.sleep(0.01)
+        outbox.close()
+        return ws.sent
+
+    first, second = asyncio.run(run())
+    assert first["type"] == "price_batch"
+    assert [(u["symbol"], u["data"]["price"]) for u in first["updates"]] == [
+        ("AAPL", 10),
+        ("MSFT", 11),
+        ("AAPL", 12),
+    ]
+    assert [u["symbol"] for u in second["updates"]] == ["TSLA"]
+
+
+def test_batch_window_collects_updates_until_it_elapses():
+    async def run():
+        ws = FakeWebSocket()
+        outbox = ClientOutbox("c", ws, lambda _: None)
+        outbox.set_batching(True, 50)
+        for i in range(3):
+            outbox.put_update(_update("AAPL", i, i))
+            await asyncio.sleep(0.005)
+        during = len(ws.sent)
+        await asyncio.sleep(0.08)
+        outbox.set_batching(False)
+        outbox.put_update(_update("AAPL", 9, 9))
+        await asyncio.sleep(0.01)
+        outbox.close()
+        return during, ws.sent
+
+    during, sent = asyncio.run(run())
+    assert during == 0
+    assert [frame["type"] for frame in sent] == ["price_batch", "price_update"]
+    assert len(sent[0]["updates"]) == 3
+
+
+def _apply(frames: list) -> tuple[dict, int]:
+    """Replay frames like a delta client; returns (state, orphan deltas)"""
+    state: dict = {}
+    orphans = 0
+    for frame in frames:
+        if frame["type"] == "price_batch":
+            entries = [
+                ("price_delta", u["symbol"], u["delta"])
+                if "delta" in u
+                else ("price_update", u["symbol"], u["data"])
+                for u in frame["updates"]
+            ]
+        else:
+            entries = [(frame["type"], frame["symbol"], frame["data"])]
+        for kind, symbol, data in entries:
+            if kind == "price_update":
+                state[symbol] = dict(data)
+            elif symbol not in state:
+                orphans += 1
+            else:
+                data = dict(data)
+                dt = data.pop("dt", None)
+                state[symbol].update(data)
+                if dt is not None:
+                    state[symbol]["timestamp"] += dt
+    return state, orphans
+
+
+def test_delta_sends_changed_fields_and_timestamp_offset():
+    async def run():
+        ws = FakeWebSocket()
+        outbox = ClientOutbox("c", ws, lambda _: None)
+        outbox.set_delta(True)
+        outbox.put_update(_update("AAPL", 150.0, 1_000, volume=5))
+        outbox.put_update(_update("AAPL", 150.5, 1_040, volume=5))
+        await asyncio.sleep(0.01)
+        outbox.close()
+        return ws.sent
+
+    keyframe, delta = asyncio.run(run())
+    assert keyframe["type"] == "price_update"
+    assert delta == {
+        "type": "price_delta",
+        "symbol": "AAPL",
+        "data": {"price": 150.5, "dt": 40},
+    }
+
+
+def test_resubscribe_snapshot_is_skipped_when_a_delta_client_has_it():
+    async def run(delta: bool):
+        ws = FakeWebSocket()
+        outbox = ClientOutbox("c", ws, lambda _: None)
+        outbox.set_delta(delta)
+        cached = _update("AAPL", 150.0, 1_000)
+        queued = [outbox.put_snapshot(cached)]
+        queued.append(outbox.put_snapshot(cached))  # Re-subscribe, no new trade
+        outbox.put_update(_update("AAPL", 150.5, 1_040))
+        await asyncio.sleep(0.01)
+        outbox.close()
+        return queued, [frame["type"] for frame in ws.sent]
+
+    assert asyncio.run(run(True)) == ([True, False], ["price_update", "price_delta"])
+    # Without delta state the client just gets the cached quote again
+    assert asyncio.run(run(False)) == ([True, True], ["price_update"] * 3)
+
+
+def test_delta_restarts_with_keyframe_after_dropped_frame():
+    async def run(batch: bool):
+        ws = FakeWebSocket(delay=0.002)
+        outbox = ClientOutbox("c", ws, lambda _: None, maxsize=2)
+        outbox.set_delta(True)
+        if batch:
+            outbox.set_batching(True, 0)
+        truth = {}
+        timestamp = 1_000
+        for i in range(300):
+            for symbol in ("AAPL", "MSFT"):
+                timestamp += 7
+                update = _update(symbol, 100 + i % 5, timestamp, volume=i)
+                truth[symbol] = update.data
+                outbox.put_update(update)
+            if i % 3 == 0:
+                await asyncio.sleep(0)
+        await asyncio.sleep(0.2)
+        for symbol in truth:
+            timestamp += 1
+            truth[symbol] = {"price": 1.0, "volume": 1, "timestamp": timestamp}
+            outbox.put_update(PriceUpdate(symbol, truth[symbol]))
+        await asyncio.sleep(0.1)
+        outbox.close()
+        return ws.sent, truth, outbox.dropped
+
+    for batch in (False, True):
+        sent, truth, dropped = asyncio.run(run(batch))
+        state, orphans = _apply(sent)
+        assert dropped > 0
+        assert orphans == 0
+        assert state == truth
+
+
+def test_conflate_policy_does_not_replace_keyframes(monkeypatch):
+    monkeypatch.setattr(client_manager, "BACKPRESSURE_POLICY", "conflate")
+
+    async def run():
+        ws = FakeWebSocket()
+        outbox = ClientOutbox("c", ws, lambda _: None)
+        outbox.set_delta(True)
+        # Nothing is sent until the writer runs, so all three stay queued
+        outbox.put_update(_update("AAPL", 1.0, 10))
+        outbox.put_update(_update("AAPL", 2.0, 20))
+        outbox.set_delta(True)  # Forces the next update to be a keyframe
+        outbox.put_update(_update("AAPL", 3.0, 30))
+        await asyncio.sleep(0.01)
+        outbox.close()
+        return ws.sent
+
+    sent = asyncio.run(run())
+    assert [frame["type"] for frame in sent] == [
+        "price_update",
+        "price_delta",
+        "price_update",
+    ]
+    assert _apply(sent)[0]["AAPL"]["price"] == 3.0
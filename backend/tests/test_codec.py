@@ -0,0 +1,34 @@
+import pytest
+
+import codec
+
+MESSAGE = {
+    "type": "price_update",
+    "symbol": "BINANCE:BTCUSDT",
+    "data": {"price": 64_250.5, "volume": 0.013, "timestamp": 1_720_000_000_123},
+    "note": "Zürich €",
+    "flags": [True, False, None],
+}
+
+
+@pytest.mark.parametrize("name", sorted(codec.CODECS))
+def test_backends_produce_the_same_compact_json(name):
+    backend = codec.CODECS[name]
+    text = backend.dumps(MESSAGE)
+    assert text == codec.CODECS["json"].dumps(MESSAGE)
+    assert " " not in text.replace("Zürich €", "")
+    assert "Zürich €" in text  # Not \u-escaped
+    assert backend.dumps_bytes(MESSAGE) == text.encode()
+    assert backend.loads(text) == MESSAGE
+    assert backend.loads(text.encode()) == MESSAGE
+
+
+@pytest.mark.parametrize("name", sorted(codec.CODECS))
+def test_bad_input_raises_the_shared_decode_error(name):
+    with pytest.raises(codec.JSONDecodeError):
+        codec.CODECS[name].loads("{not json")
+
+
+def test_orjson_is_preferred_when_installed():
+    expected = "orjson" if codec.orjson is not None else "json"
+    assert codec.BACKEND in (expected, codec._requested)
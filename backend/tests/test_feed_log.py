@@ -0,0 +1,152 @@
+import asyncio
+import gzip
+import threading
+import time
+
+import pytest
+
+import codec
+import feed_log
+import metrics
+from client_manager import ClientManager
+from feed_log import FeedRecorder, FeedReplay, parse_speed, read_frames
+from subscription_manager import SubscriptionManager
+
+from .fakes import FakeWebSocket
+
+
+def _trade_frame(symbol: str, i: int) -> str:
+    trade = {"p": 100 + i, "s": symbol, "t": i, "v": 1}
+    return codec.dumps({"data": [trade], "type": "trade"})
+
+
+@pytest.mark.parametrize("name", ["feed.log", "feed.log.gz"])
+def test_recorded_frames_read_back_unchanged(tmp_path, name):
+    path = str(tmp_path / name)
+    frames = [_trade_frame("AAPL", i) for i in range(1000)]
+    recorder = FeedRecorder(path)
+    for i, frame in enumerate(frames):
+        recorder.record(frame, received_us=1_000_000 + i)
+    recorder.close()
+    recorder.close()  # Idempotent
+    recorder.record("ignored after close")
+
+    read = list(read_frames(path))
+    assert [ts for ts, _ in read] == [1_000_000 + i for i in range(1000)]
+    assert [frame.decode() for _, frame in read] == frames
+
+
+def test_unclosed_gzip_log_reads_up_to_last_complete_frame(tmp_path):
+    path = str(tmp_path / "crash.log.gz")
+    recorder = FeedRecorder(path)
+    for i in range(2000):
+        recorder.record(_trade_frame("AAPL", i), received_us=i)
+    recorder.flush()  # Flushed but never closed: no gzip trailer
+
+    read = list(read_frames(path))
+    assert 0 < len(read) <= 2000
+    assert [ts for ts, _ in read] == list(range(len(read)))
+
+
+def test_writes_happen_off_the_caller_thread_every_flush_interval(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setattr(feed_log, "FLUSH_INTERVAL_S", 0.05)
+    path = tmp_path / "feed.log"
+    recorder = FeedRecorder(str(path))
+    writers = set()
+    write = recorder._file.write
+
+    def spy(data: bytes) -> int:
+        writers.add(threading.current_thread().name)
+        return write(data)
+
+    recorder._file.write = spy
+    recorder.record(_trade_frame("AAPL", 1), received_us=1)
+    assert writers == set()  # record() only queues
+    for _ in range(100):
+        if path.stat().st_size:
+            break
+        time.sleep(0.01)
+    assert [ts for ts, _ in read_frames(str(path))] == [1]  # No flush() needed
+    recorder.close()
+    assert writers == {"feed-recorder"}
+
+
+def test_truncated_logs_stop_cleanly(tmp_path):
+    path = str(tmp_path / "cut.log.gz")
+    with gzip.open(path, "wb") as f:
+        f.write(b"".join(b"%d\t{}\n" % i for i in range(5000)))
+    data = open(path, "rb").read()
+    with open(path, "wb") as f:
+        f.write(data[: len(data) // 2])
+    read = list(read_frames(path))
+    assert [ts for ts, _ in read] == list(range(len(read)))
+
+    plain = tmp_path / "cut.log"
+    plain.write_bytes(b"1\t{}\n2\t{}\n3\t{\"half")
+    assert [ts for ts, _ in read_frames(str(plain))] == [1, 2]
+
+
+def test_parse_speed():
+    assert parse_speed("max") == 0.0
+    assert parse_speed("") == 0.0
+    assert parse_speed("10x") == 10.0
+    assert parse_speed("0.5") == 0.5
+
+
+def test_replay_delivers_only_subscribed_symbols(tmp_path):
+    path = str(tmp_path / "feed.log")
+    recorder = FeedRecorder(path)
+    for i in range(10):
+        recorder.record(_trade_frame("AAPL" if i % 2 else "MSFT", i), received_us=i)
+    recorder.close()
+
+    async def run():
+        received = []
+
+        async def handler(message: dict):
+            received.extend(trade["s"] for trade in message["data"])
+
+        replay = FeedReplay(path, speed=0)
+        replay.set_message_handler(handler)
+        await replay.subscribe(["AAPL"])
+        await replay.connect()
+        await asyncio.wait_for(replay.finished.wait(), 5)
+        await replay.disconnect()
+        return received, replay.frames_replayed
+
+    received, frames = asyncio.run(run())
+    assert received == ["AAPL"] * 5
+    assert frames == 5
+
+
+def test_max_speed_replay_lets_client_writers_keep_up(tmp_path):
+    path = str(tmp_path / "feed.log")
+    recorder = FeedRecorder(path)
+    for i in range(200):
+        trades = [{"p": 1.0 + j, "s": "AAPL", "t": i, "v": 1} for j in range(5)]
+        frame = codec.dumps({"data": trades, "type": "trade"})
+        recorder.record(frame, received_us=i)
+    recorder.close()
+
+    async def run():
+        replay = FeedReplay(path, speed=0)
+        clients = ClientManager()
+        manager = SubscriptionManager(replay, clients)
+        sockets = [FakeWebSocket() for _ in range(3)]
+        for ws in sockets:
+            await manager.subscribe(clients.add_client(ws), ["AAPL"])
+        await asyncio.sleep(0.05)  # Let the batched upstream subscribe go out
+        dropped = metrics.ws_messages_dropped
+        await replay.connect()
+        await asyncio.wait_for(replay.finished.wait(), 5)
+        await asyncio.sleep(0.05)
+        for client_id in list(clients.outboxes):
+            await manager.unsubscribe_all(client_id)
+            clients.remove_client(client_id)
+        return metrics.ws_messages_dropped - dropped, sockets
+
+    dropped, sockets = asyncio.run(run())
+    assert dropped == 0
+    assert all(len(ws.sent) == 1000 for ws in sockets)
@@ -0,0 +1,74 @@
+import asyncio
+import random
+import statistics
+
+import pytest
+
+import subscription_manager
+from client_manager import ClientManager
+from indicators import IndicatorEngine, IndicatorState
+from subscription_manager import INDICATORS_CHANNEL, SubscriptionManager
+
+from .fakes import FakeUpstream, FakeWebSocket
+
+
+def test_indicators_match_direct_computation():
+    rng = random.Random(7)
+    trades = [(10_000 + rng.gauss(0, 5), rng.randint(1, 500)) for _ in range(1000)]
+    state = IndicatorState(window=50)
+    emas = {12: None, 26: None}
+    for price, volume in trades:
+        state.update(price, volume, 1)
+        for period, ema in emas.items():
+            alpha = 2 / (period + 1)
+            emas[period] = price if ema is None else ema + (price - ema) * alpha
+
+    values = state.to_dict()
+    total_volume = sum(v for _, v in trades)
+    assert values["vwap"] == pytest.approx(sum(p * v for p, v in trades) / total_volume)
+    assert values["ema"] == {str(k): pytest.approx(v) for k, v in emas.items()}
+    window = [p for p, _ in trades[-50:]]
+    assert values["stddev"] == pytest.approx(statistics.stdev(window), rel=1e-9)
+    assert (values["window"], values["trades"]) == (50, 1000)
+
+
+def test_empty_and_single_trade_states():
+    state = IndicatorState()
+    assert state.vwap() is None
+    state.update(10.0, 0, None)
+    assert state.vwap() is None  # No volume yet
+    assert state.stddev() is None
+    assert state.timestamp is None
+
+
+def test_engine_keeps_one_state_per_symbol():
+    engine = IndicatorEngine(window=5)
+    engine.on_trade("AAPL", 1.0, 1, 1)
+    engine.on_trade("MSFT", 2.0, 1, 1)
+    engine.discard("AAPL")
+    assert engine.get("AAPL") is None
+    assert engine.get("MSFT").trades == 1
+
+
+def test_indicators_are_pushed_at_most_once_per_interval(monkeypatch):
+    monkeypatch.setattr(subscription_manager, "INDICATOR_INTERVAL_MS", 30)
+
+    async def run():
+        clients = ClientManager()
+        manager = SubscriptionManager(FakeUpstream(), clients)
+        ws = FakeWebSocket()
+        client_id = clients.add_client(ws)
+        await manager.subscribe(client_id, ["AAPL"], channel=INDICATORS_CHANNEL)
+        for i in range(5):
+            trade = {"s": "AAPL", "p": 100.0 + i, "t": i, "v": 1}
+            await manager._handle_finnhub_message({"type": "trade", "data": [trade]})
+        await asyncio.sleep(0.06)
+        await manager.unsubscribe_all(client_id)
+        clients.remove_client(client_id)
+        return ws.sent
+
+    (message,) = asyncio.run(run())
+    assert message["type"] == "indicators"
+    assert message["symbol"] == "AAPL"
+    assert message["data"]["trades"] == 5
+    assert message["data"]["vwap"] == pytest.approx(102.0)
@@ -0,0 +1,186 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from client_manager import PriceUpdate
+
+from .fakes import FakeUpstream
+
+
+@pytest.fixture
+def client(monkeypatch):
+    upstream = FakeUpstream()
+
+    async def noop():
+        pass
+
+    monkeypatch.setattr(main.finnhub_manager, "connect", noop)
+    monkeypatch.setattr(main.finnhub_manager, "disconnect", noop)
+    monkeypatch.setattr(main.finnhub_manager, "subscribe", upstream.subscribe)
+    monkeypatch.setattr(main.finnhub_manager, "unsubscribe", upstream.unsubscribe)
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+def _wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_ws_error_path_releases_subscriptions_and_alerts(client):
+    manager = main.subscription_manager
+    with client.websocket_connect("/ws") as ws:
+        ws.receive_json()
+        ws.send_json({"action": "subscribe", "symbols": ["MSFT", "TSLA"]})
+        ws.receive_json()
+        alert = {"id": "a", "symbol": "AAPL", "alert_type": "price_above"}
+        alert["threshold"] = 1
+        ws.send_json({"action": "add_alerts", "alerts": [alert]})
+        ws.receive_json()
+        assert manager.symbol_refs == {"MSFT": 1, "TSLA": 1, "AAPL": 1}
+        ws.send_text("{not json")  # Raises inside the handler
+        assert _wait_for(lambda: main.client_manager.get_client_count() == 0)
+
+    assert manager.symbol_refs == {}
+    assert len(manager.alert_engine) == 0
+
+
+def test_subscribe_validates_and_acks_throttle_ms(client):
+    with client.websocket_connect("/ws") as ws:
+        ws.receive_json()
+        ws.send_json({"action": "subscribe", "symbols": ["MSFT"], "throttle_ms": -1})
+        assert ws.receive_json()["type"] == "error"
+        ws.send_json({"action": "subscribe", "symbols": ["MSFT"], "throttle_ms": 250})
+        ack = ws.receive_json()
+    assert ack["status"] == "subscribed"
+    assert ack["throttle_ms"] == 250
+
+
+def test_non_string_channel_is_rejected_without_dropping_the_socket(client):
+    with client.websocket_connect("/ws") as ws:
+        ws.receive_json()
+        for action in ("subscribe", "unsubscribe"):
+            ws.send_json({"action": action, "symbols": ["MSFT"], "channel": ["x"]})
+            error = ws.receive_json()
+            assert error == {"type": "error", "message": "Unknown channel: ['x']"}
+        ws.send_json({"action": "subscribe", "symbols": ["MSFT"]})
+        assert ws.receive_json()["status"] == "subscribed"
+
+
+def test_binary_encoding_is_negotiated_and_symbol_ids_announced(client):
+    with client.websocket_connect("/ws?encoding=binary") as ws:
+        assert ws.receive_json()["encoding"] == "binary"
+        ws.send_json({"action": "subscribe", "symbols": ["MSFT"]})
+        ack = ws.receive_json()
+        ws.send_json({"action": "subscribe", "symbols": ["X"], "encoding": "xml"})
+        error = ws.receive_json()
+    assert ack["encoding"] == "binary"
+    assert ack["symbol_ids"] == {"MSFT": main.wire_format.symbol_table.id_for("MSFT")}
+    assert error["type"] == "error"
+
+
+def test_binary_client_is_told_delta_does_not_apply(client):
+    with client.websocket_connect("/ws?encoding=binary") as ws:
+        ws.receive_json()
+        ws.send_json({"action": "subscribe", "symbols": ["MSFT"], "delta": True})
+        ack = ws.receive_json()
+    assert ack["delta"] is False
+    assert "keyframe_every" not in ack
+
+
+def test_quotes_etag_and_snapshot_on_subscribe(client):
+    data = {"price": 10.5, "volume": 3, "timestamp": 1_000}
+    main.quote_cache.update(PriceUpdate("QTEST", data))
+
+    response = client.get("/quotes", params={"symbols": "qtest, NOPE"})
+    assert response.json() == {"quotes": {"QTEST": data}, "missing": ["NOPE"]}
+    etag = response.headers["ETag"]
+    cached = client.get(
+        "/quotes", params={"symbols": "QTEST,NOPE"}, headers={"If-None-Match": etag}
+    )
+    assert cached.status_code == 304
+    assert client.get("/quotes", params={"symbols": " , "}).status_code == 400
+
+    with client.websocket_connect("/ws") as ws:
+        ws.receive_json()
+        ws.send_json({"action": "subscribe", "symbols": ["QTEST"]})
+        assert ws.receive_json()["type"] == "subscription"
+        snapshot = ws.receive_json()
+    assert snapshot == {"type": "price_update", "symbol": "QTEST", "data": data}
+
+
+def test_ticks_endpoint(client):
+    for i in range(5):
+        main.tick_history.record("TTEST", 1_000 + i, 10.0 + i, i)
+
+    body = client.get("/ticks/ttest", params={"since": 1_001, "limit": 2}).json()
+    assert body["symbol"] == "TTEST"
+    assert body["timestamps"] == [1_003, 1_004]
+    assert body["prices"] == [13.0, 14.0]
+    assert client.get("/ticks/NOPE").status_code == 404
+    main.tick_history.discard("TTEST")
+
+
+def test_bars_endpoint(client):
+    main.bar_aggregator.on_trade("BTEST", 100, 1.0, 1)
+    main.bar_aggregator.on_trade("BTEST", 1_100, 2.0, 1)
+
+    body = client.get("/bars/btest", params={"interval": "1s"}).json()
+    assert [bar["start"] for bar in body["bars"]] == [0]
+    assert body["current"]["start"] == 1_000
+    assert client.get("/bars/BTEST", params={"interval": "2h"}).status_code == 400
+    assert client.get("/bars/NOPE").status_code == 404
+    main.bar_aggregator.discard("BTEST")
+
+
+def test_alert_actions_are_acknowledged_and_validated(client):
+    alert = {"id": "a", "symbol": "AAPL", "alert_type": "price_above", "threshold": 1}
+    with client.websocket_connect("/ws") as ws:
+        ws.receive_json()
+        ws.send_json({"action": "add_alerts", "alerts": [alert]})
+        added = ws.receive_json()
+        ws.send_json({"action": "add_alerts", "alerts": [{**alert, "threshold": -1}]})
+        error = ws.receive_json()
+        ws.send_json({"action": "remove_alerts", "ids": ["a", "b", 3]})
+        removed = ws.receive_json()
+    assert added == {"type": "alerts", "status": "added", "ids": ["a"]}
+    assert error["type"] == "error"
+    assert removed == {"type": "alerts", "status": "removed", "ids": ["a"]}
+
+
+def test_activity_cursor_and_type_filter(client):
+    client.get("/missing-1")
+    newest = client.get("/activity").json()[0]["id"]
+    client.get("/missing-2")
+
+    response = client.get("/activity", params={"since": newest})
+    assert [e["summary"].split()[1] for e in response.json()] == ["/missing-2"]
+    assert int(response.headers["X-Activity-Last-Id"]) >= newest + 1
+    filtered = client.get("/activity", params={"since": newest, "type": "ws_connect"})
+    assert filtered.json() == []
+
+
+def test_liveness_and_snapshot_endpoints(client):
+    assert client.get("/health/live").json() == {"status": "alive"}
+    health = client.get("/health")
+    assert health.headers["content-type"] == "application/json"
+    assert health.json()["status"] in ("healthy", "degraded")
+    assert "outbound" in client.get("/metrics").json()
+
+
+def test_per_client_outbound_detail_is_built_on_request(client):
+    with client.websocket_connect("/ws") as ws:
+        client_id = ws.receive_json()["client_id"]
+        sampled = client.get("/metrics").json()["outbound"]
+        detailed = client.get("/metrics?detail=clients").json()["outbound"]
+        invalid = client.get("/metrics?detail=everything")
+    assert "clients" not in sampled
+    assert detailed["clients"][client_id]["queue_depth"] == 0
+    assert "send_latency" in detailed["clients"][client_id]
+    assert invalid.status_code == 400
@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+from market_bus import MarketBusBroker, MarketBusClient
+
+from .fakes import FakeUpstream
+
+
+async def _until(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        await asyncio.sleep(0.005)
+
+
+async def _worker(path: str) -> tuple[MarketBusClient, list]:
+    received: list = []
+
+    async def handler(message: dict):
+        received.append([trade["s"] for trade in message["data"]])
+
+    client = MarketBusClient(path)
+    client.reconnect_delay = 0.01
+    client.set_message_handler(handler)
+    await client.connect()
+    return client, received
+
+
+def _trade(symbol: str) -> dict:
+    return {"type": "trade", "data": [{"s": symbol, "p": 1.0, "t": 1, "v": 1}]}
+
+
+def test_symbols_are_subscribed_upstream_once_and_routed_by_worker(tmp_path):
+    async def run():
+        path = str(tmp_path / "bus.sock")
+        upstream = FakeUpstream()
+        broker = MarketBusBroker(upstream, path)
+        await broker.start()
+        a, a_received = await _worker(path)
+        b, b_received = await _worker(path)
+        await a.subscribe(["aapl"])
+        await b.subscribe(["AAPL", "MSFT"])
+        await _until(lambda: len(broker.symbol_workers) == 2)
+        assert sorted(upstream.subscribed) == ["AAPL", "MSFT"]
+
+        await upstream.message_handler(_trade("AAPL"))
+        await upstream.message_handler(_trade("MSFT"))
+        await upstream.message_handler(_trade("TSLA"))
+        await _until(lambda: len(b_received) == 2)
+        assert a_received == [["AAPL"]]
+        assert b_received == [["AAPL"], ["MSFT"]]
+
+        await a.unsubscribe(["AAPL"])
+        await _until(lambda: len(broker.symbol_workers["AAPL"]) == 1)
+        assert upstream.unsubscribed == []
+        await b.disconnect()
+        await _until(lambda: not broker.symbol_workers)
+        assert sorted(upstream.unsubscribed) == ["AAPL", "MSFT"]
+
+        await a.disconnect()
+        await broker.stop()
+
+    asyncio.run(run())
+
+
+def test_worker_replays_its_symbols_after_the_broker_restarts(tmp_path):
+    async def run():
+        path = str(tmp_path / "bus.sock")
+        broker = MarketBusBroker(FakeUpstream(), path)
+        await broker.start()
+        client, received = await _worker(path)
+        await client.subscribe(["NVDA"])
+        await _until(lambda: "NVDA" in broker.symbol_workers)
+        await broker.stop()
+        await _until(lambda: not client.is_connected())
+
+        upstream = FakeUpstream()
+        restarted = MarketBusBroker(upstream, path)
+        await restarted.start()
+        await _until(lambda: upstream.subscribed == ["NVDA"])
+        await upstream.message_handler(_trade("NVDA"))
+        await _until(lambda: received == [["NVDA"]])
+
+        await client.disconnect()
+        await restarted.stop()
+
+    asyncio.run(run())
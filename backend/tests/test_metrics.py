@@ -0,0 +1,70 @@
+import math
+import random
+
+import pytest
+
+import metrics
+from metrics import LatencyTracker, _bucket, _bucket_value
+
+
+@pytest.mark.parametrize("ms", [0.001, 0.37, 1.0, 1.5, 2.0, 63.9, 1000.0, 123456.7])
+def test_bucket_midpoint_is_within_bucket_error(ms):
+    # 64 linear sub-buckets per power of two: <= 1/128 relative error
+    assert abs(_bucket_value(_bucket(ms)) - ms) / ms <= 1 / 128
+
+
+def test_buckets_are_monotonic_and_zero_has_its_own():
+    values = [0.01 * 1.01**i for i in range(1500)]
+    indexes = [_bucket(v) for v in values]
+    assert indexes == sorted(indexes)
+    assert _bucket(0) == _bucket(-1.0)
+    assert _bucket_value(_bucket(0)) == 0.0
+    assert _bucket(0) < _bucket(1e-9)
+
+
+def test_percentiles_match_exact_values():
+    rng = random.Random(3)
+    samples = [rng.lognormvariate(1.5, 1.0) for _ in range(20_000)]
+    tracker = LatencyTracker(windows_s=[60], slice_s=5)
+    for ms in samples:
+        tracker.record(ms)
+
+    stats = tracker.snapshot()
+    ordered = sorted(samples)
+    for name, quantile in metrics.PERCENTILES:
+        exact = ordered[max(1, math.ceil(quantile * len(samples))) - 1]
+        assert stats[name] == pytest.approx(exact, rel=0.01, abs=0.01)
+    assert stats["samples"] == len(samples)
+    assert stats["max_ms"] == round(max(samples), 2)
+    assert stats["avg_ms"] == pytest.approx(sum(samples) / len(samples), abs=0.01)
+
+
+def test_empty_tracker_reports_none():
+    stats = LatencyTracker().snapshot_windows()
+    assert stats["samples"] == 0
+    assert stats["p99_ms"] is None
+    assert stats["last_ms"] is None
+    assert set(stats["windows"]) == {f"{w}s" for w in metrics.LATENCY_WINDOWS_S}
+
+
+def test_samples_leave_the_window(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(metrics.time, "monotonic", lambda: now[0])
+    tracker = LatencyTracker(windows_s=[60, 300], slice_s=5)
+    tracker.record(10.0)
+    now[0] += 120
+    tracker.record(20.0)
+
+    windows = tracker.snapshot_windows()["windows"]
+    assert windows["60s"]["samples"] == 1
+    assert windows["60s"]["max_ms"] == 20.0
+    assert windows["300s"]["samples"] == 2
+    assert tracker.total_samples == 2
+
+
+def test_cumulative_counts_are_cumulative():
+    tracker = LatencyTracker()
+    for ms in (0.2, 0.7, 3.0, 3.0, 40.0, 9000.0):
+        tracker.record(ms)
+    assert tracker.cumulative_counts((1, 5, 50, 100)) == [2, 4, 5, 5]
+    assert tracker.total_ms == pytest.approx(9046.9)
@@ -0,0 +1,78 @@
+import asyncio
+
+import metrics
+import prometheus
+from client_manager import ClientManager
+from subscription_manager import SubscriptionManager
+
+from .fakes import FakeUpstream, FakeWebSocket
+
+
+def _render() -> str:
+    async def run():
+        clients = ClientManager()
+        manager = SubscriptionManager(FakeUpstream(), clients)
+        client_id = clients.add_client(FakeWebSocket())
+        await manager.subscribe(client_id, ["AAPL"])
+        text = prometheus.render(clients, manager, manager.finnhub_manager)
+        await manager.unsubscribe_all(client_id)
+        clients.remove_client(client_id)
+        return text
+
+    return asyncio.run(run())
+
+
+def _samples(text: str) -> dict[str, float]:
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_every_sample_belongs_to_a_declared_family():
+    text = _render()
+    assert text.endswith("\n")
+    declared = {
+        line.split()[2]: line.split()[3]
+        for line in text.splitlines()
+        if line.startswith("# TYPE ")
+    }
+    helped = {
+        line.split()[2] for line in text.splitlines() if line.startswith("# HELP ")
+    }
+    assert helped == set(declared)
+    for name in _samples(text):
+        family = name.split("{")[0]
+        if declared.get(family) is None:
+            family = family.rsplit("_", 1)[0]  # _bucket, _sum, _count
+            assert declared[family] == "histogram"
+
+
+def test_counters_and_gauges_report_current_values(monkeypatch):
+    monkeypatch.setattr(metrics, "ws_payload_encodes_saved", 1960)
+    monkeypatch.setattr(metrics, "ws_delta_keyframes", 7)
+    monkeypatch.setitem(metrics.http_requests, ("GET", '/a"b', 200), 3)
+    samples = _samples(_render())
+    assert samples["stock_ws_payload_encodes_saved_total"] == 1960
+    assert samples["stock_ws_delta_keyframes_total"] == 7
+    route = 'stock_http_requests_total{method="GET",route="/a\\"b",status="200"}'
+    assert samples[route] == 3  # Quotes in label values are escaped
+    assert samples["stock_connected_clients"] == 1
+    assert samples["stock_subscribed_symbols"] == 1
+
+
+def test_latency_histogram_is_cumulative(monkeypatch):
+    tracker = metrics.LatencyTracker()
+    for ms in (0.2, 3.0, 40.0, 90_000.0):
+        tracker.record(ms)
+    monkeypatch.setitem(prometheus._LATENCY_SOURCES, "rest_api", tracker)
+    samples = _samples(_render())
+    prefix = 'stock_latency_seconds_bucket{source="rest_api",le="'
+    buckets = [v for k, v in samples.items() if k.startswith(prefix)]
+    assert buckets == sorted(buckets)
+    assert samples[prefix + '0.00025"}'] == 1
+    assert samples[prefix + '10"}'] == 3
+    assert samples[prefix + '+Inf"}'] == 4
+    assert samples['stock_latency_seconds_count{source="rest_api"}'] == 4
@@ -0,0 +1,31 @@
+from client_manager import PriceUpdate
+from quote_cache import QuoteCache
+
+
+def _update(symbol: str, price: float) -> PriceUpdate:
+    return PriceUpdate(symbol, {"price": price, "volume": 1, "timestamp": 1})
+
+
+def test_lookup_returns_latest_quotes_and_missing_symbols():
+    cache = QuoteCache()
+    cache.update(_update("AAPL", 1.0))
+    cache.update(_update("AAPL", 2.0))
+    etag, quotes, missing = cache.lookup(["AAPL", "IBM"])
+    assert quotes == {"AAPL": {"price": 2.0, "volume": 1, "timestamp": 1}}
+    assert missing == ["IBM"]
+    assert etag.startswith('W/"')
+    assert len(cache) == 1
+
+
+def test_etag_changes_only_when_a_requested_quote_does():
+    cache = QuoteCache()
+    cache.update(_update("AAPL", 1.0))
+    etag = cache.lookup(["AAPL", "MSFT"])[0]
+
+    cache.update(_update("TSLA", 1.0))
+    assert cache.lookup(["AAPL", "MSFT"])[0] == etag
+    cache.update(_update("MSFT", 1.0))  # A missing symbol appearing
+    changed = cache.lookup(["AAPL", "MSFT"])[0]
+    assert changed != etag
+    cache.update(_update("AAPL", 3.0))
+    assert cache.lookup(["AAPL", "MSFT"])[0] != changed
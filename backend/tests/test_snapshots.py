@@ -0,0 +1,33 @@
+import asyncio
+
+import codec
+from snapshots import SnapshotSampler
+
+
+def test_payloads_are_built_once_per_interval_and_served_encoded():
+    builds = {"n": 0}
+
+    def build() -> dict:
+        builds["n"] += 1
+        return {"n": builds["n"]}
+
+    async def run():
+        sampler = SnapshotSampler({"metrics": build}, interval_ms=30)
+        sampler.start()
+        bodies = [sampler.body("metrics") for _ in range(100)]
+        await asyncio.sleep(0.1)
+        latest = sampler.body("metrics")
+        await sampler.stop()
+        return bodies, latest, sampler.age_ms()
+
+    bodies, latest, age_ms = asyncio.run(run())
+    assert set(bodies) == {codec.dumps_bytes({"n": 1})}  # Requests never build
+    assert codec.loads(latest)["n"] > 1
+    assert age_ms is not None and age_ms < 100
+
+
+def test_unstarted_sampler_builds_on_first_read():
+    sampler = SnapshotSampler({"health": lambda: {"status": "healthy"}})
+    assert sampler.age_ms() is None
+    assert sampler.payload("health") == {"status": "healthy"}
+    assert codec.loads(sampler.body("health")) == {"status": "healthy"}
@@ -0,0 +1,171 @@
+import asyncio
+import random
+
+import pytest
+
+import metrics
+import subscription_manager
+from alerts import Alert
+from client_manager import ClientManager
+from subscription_manager import SubscriptionManager
+
+from .fakes import FakeUpstream, FakeWebSocket
+
+LINGER_S = 0.05
+
+
+@pytest.fixture(autouse=True)
+def fast_timers(monkeypatch):
+    monkeypatch.setattr(subscription_manager, "UPSTREAM_BATCH_MS", 0)
+    monkeypatch.setattr(subscription_manager, "SUBSCRIBE_LINGER_MS", LINGER_S * 1000)
+
+
+def _managers():
+    upstream = FakeUpstream()
+    clients = ClientManager()
+    return upstream, clients, SubscriptionManager(upstream, clients)
+
+
+async def _disconnect(manager: SubscriptionManager, clients: ClientManager, client_id):
+    await manager.unsubscribe_all(client_id)
+    clients.remove_client(client_id)
+
+
+def test_symbol_is_refcounted_and_dropped_upstream_after_linger():
+    async def run():
+        upstream, clients, manager = _managers()
+        a = clients.add_client(FakeWebSocket())
+        b = clients.add_client(FakeWebSocket())
+        await manager.subscribe(a, ["AAPL"])
+        await manager.subscribe(b, ["aapl"])
+        await manager.subscribe(b, ["AAPL"], channel="bars:1m")
+        await asyncio.sleep(0.01)
+        assert manager.symbol_refs == {"AAPL": 3}
+        assert upstream.subscribed == ["AAPL"]
+        assert manager.get_client_subscription_count() == 3
+
+        await _disconnect(manager, clients, a)
+        assert manager.symbol_refs == {"AAPL": 2}
+        await _disconnect(manager, clients, b)
+        assert manager.symbol_refs == {}
+        assert manager.get_lingering_count() == 1
+        assert upstream.unsubscribed == []
+
+        await asyncio.sleep(LINGER_S + 0.05)
+        assert manager.get_lingering_count() == 0
+        assert upstream.unsubscribed == ["AAPL"]
+
+    asyncio.run(run())
+
+
+def test_changes_within_a_batch_window_go_upstream_together(monkeypatch):
+    monkeypatch.setattr(subscription_manager, "UPSTREAM_BATCH_MS", 20)
+    monkeypatch.setattr(subscription_manager, "SUBSCRIBE_LINGER_MS", 0)
+
+    async def run():
+        upstream, clients, manager = _managers()
+        a = clients.add_client(FakeWebSocket())
+        await manager.subscribe(a, ["MSFT"])
+        await manager.subscribe(a, ["AAPL", "TSLA"])
+        await manager.unsubscribe(a, ["TSLA"])  # Cancels out within the batch
+        await asyncio.sleep(0.05)
+        await _disconnect(manager, clients, a)
+        await asyncio.sleep(0.05)
+        return upstream.calls
+
+    assert asyncio.run(run()) == [
+        ("subscribe", ["AAPL", "MSFT"]),
+        ("unsubscribe", ["AAPL", "MSFT"]),
+    ]
+
+
+def test_returning_client_cancels_the_linger():
+    async def run():
+        upstream, clients, manager = _managers()
+        a = clients.add_client(FakeWebSocket())
+        await manager.subscribe(a, ["MSFT"])
+        await asyncio.sleep(0.01)
+        await _disconnect(manager, clients, a)
+
+        reuses = metrics.upstream_linger_reuses
+        b = clients.add_client(FakeWebSocket())
+        await manager.subscribe(b, ["MSFT"])
+        await asyncio.sleep(LINGER_S + 0.05)
+        assert metrics.upstream_linger_reuses == reuses + 1
+        assert upstream.subscribed == ["MSFT"]
+        assert upstream.unsubscribed == []
+        await _disconnect(manager, clients, b)
+
+    asyncio.run(run())
+
+
+def test_alert_holds_its_symbol_until_it_fires():
+    async def run():
+        upstream, clients, manager = _managers()
+        ws = FakeWebSocket()
+        a = clients.add_client(ws)
+        await manager.add_alerts(a, [Alert("x", a, "TSLA", "price_above", 300.0)])
+        assert manager.symbol_refs == {"TSLA": 1}
+
+        trade = {"s": "TSLA", "p": 301.0, "t": 1_000, "v": 1}
+        await manager._handle_finnhub_message({"type": "trade", "data": [trade]})
+        assert manager.symbol_refs == {}
+        assert len(manager.alert_engine) == 0
+
+        await asyncio.sleep(0.01)
+        assert [m["type"] for m in ws.sent] == ["alert_triggered"]
+        assert ws.sent[0]["alert"]["id"] == "x"
+        await _disconnect(manager, clients, a)
+
+    asyncio.run(run())
+
+
+def test_no_refs_remain_once_every_client_is_gone():
+    async def run():
+        upstream, clients, manager = _managers()
+        ids = [clients.add_client(FakeWebSocket()) for _ in range(3)]
+        await manager.subscribe(ids[0], ["AAPL", "MSFT"])
+        await manager.subscribe(ids[1], ["AAPL"], channel="indicators")
+        await manager.add_alerts(ids[2], [Alert("x", ids[2], "NVDA", "price_below", 1)])
+        for client_id in ids:
+            await _disconnect(manager, clients, client_id)
+        assert not manager.symbol_refs
+        assert not manager.alert_symbols
+
+    asyncio.run(run())
+
+
+def test_refs_return_to_zero_after_random_churn():
+    rng = random.Random(11)
+    symbols = ["AAPL", "MSFT", "NVDA", "TSLA", "AMZN"]
+    channels = ["trades", "bars:1m", "indicators"]
+
+    async def run():
+        upstream, clients, manager = _managers()
+        ids = [clients.add_client(FakeWebSocket()) for _ in range(4)]
+        for step in range(400):
+            client_id = rng.choice(ids)
+            picked = rng.sample(symbols, rng.randint(1, 3))
+            channel = rng.choice(channels)
+            roll = rng.random()
+            if roll < 0.35:
+                await manager.subscribe(client_id, picked, channel=channel)
+            elif roll < 0.65:
+                await manager.unsubscribe(client_id, picked, channel=channel)
+            elif roll < 0.8:
+                alert = Alert(f"a{step % 6}", client_id, picked[0], "price_above", 1e9)
+                await manager.add_alerts(client_id, [alert])
+            elif roll < 0.95:
+                await manager.remove_alerts(client_id, [f"a{step % 6}"])
+            else:
+                await _disconnect(manager, clients, client_id)
+                ids.remove(client_id)
+                ids.append(clients.add_client(FakeWebSocket()))
+        for client_id in ids:
+            await _disconnect(manager, clients, client_id)
+        assert manager.symbol_refs == {}
+        assert manager.alert_symbols == set()
+        await asyncio.sleep(LINGER_S * 3)
+        assert set(upstream.subscribed) == set(upstream.unsubscribed)
+
+    asyncio.run(run())
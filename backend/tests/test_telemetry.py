@@ -0,0 +1,75 @@
+import asyncio
+
+import activity_log
+import codec
+import telemetry
+from telemetry import TelemetryHub, diff
+
+
+def test_diff_keeps_only_changed_nested_values():
+    old = {"a": 1, "b": {"x": 1, "y": 2}, "gone": 3}
+    new = {"a": 1, "b": {"x": 1, "y": 5}, "added": [1]}
+    assert diff(old, new) == {"b": {"y": 5}, "added": [1], "gone": None}
+    assert diff(new, new) == {}
+
+
+def test_viewers_share_one_encoded_message_per_tick():
+    async def run():
+        state = {"clients": 1, "cpu": {"percent": 5.0}}
+        builds = 0
+
+        def build() -> dict:
+            nonlocal builds
+            builds += 1
+            return dict(state)
+
+        hub = TelemetryHub(build, interval_ms=60_000)
+        streams = [hub.stream(), hub.stream()]
+        first = [await anext(s) for s in streams]
+        [await anext(s) for s in streams]  # Activity backlog
+        state["clients"] = 2
+        activity_log.record_event("test", "telemetry tick")
+        hub.tick()
+        deltas = [await anext(s) for s in streams]
+        activity = [await anext(s) for s in streams]
+        running = hub._task is not None
+        for s in streams:
+            await s.aclose()
+        return builds, first, deltas, activity, running, hub
+
+    builds, first, deltas, activity, running, hub = asyncio.run(run())
+    assert builds == 2  # One initial snapshot for both viewers, one tick
+    assert first[0] is first[1]
+    assert codec.loads(first[0]) == {
+        "type": "snapshot",
+        "data": {"clients": 1, "cpu": {"percent": 5.0}},
+    }
+    assert deltas[0] is deltas[1]
+    assert codec.loads(deltas[0]) == {"type": "delta", "data": {"clients": 2}}
+    assert activity[0] is activity[1]
+    assert codec.loads(activity[0])["events"][0]["summary"] == "telemetry tick"
+    assert running
+    assert hub.viewers == 0 and hub._task is None  # Stops with the last viewer
+
+
+def test_a_viewer_that_falls_behind_is_resynced(monkeypatch):
+    monkeypatch.setattr(telemetry, "VIEWER_QUEUE_SIZE", 2)
+
+    async def run():
+        counter = {"n": 0}
+
+        def build() -> dict:
+            counter["n"] += 1
+            return {"n": counter["n"]}
+
+        hub = TelemetryHub(build, interval_ms=60_000)
+        stream = hub.stream()
+        await anext(stream)
+        await anext(stream)
+        for _ in range(3):  # The third tick overflows the queue
+            hub.tick()
+        message = await anext(stream)
+        await stream.aclose()
+        return message
+
+    assert codec.loads(asyncio.run(run())) == {"type": "snapshot", "data": {"n": 4}}
@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from tick_history import TickHistory, TickRing
+
+
+def _columns(ticks: list[tuple[int, float, float]]) -> dict:
+    return {
+        "timestamps": [t[0] for t in ticks],
+        "prices": [t[1] for t in ticks],
+        "volumes": [t[2] for t in ticks],
+    }
+
+
+@pytest.mark.parametrize("count", [0, 1, 7, 8, 9, 20, 33])
+def test_query_matches_a_plain_list_across_wraparound(count):
+    rng = random.Random(count)
+    ring = TickRing(8)
+    ticks = []
+    timestamp = 1_000
+    for i in range(count):
+        timestamp += rng.choice((0, 1, 5))
+        ring.append(timestamp, 100.0 + i, float(i))
+        ticks.append((timestamp, 100.0 + i, float(i)))
+    held = ticks[-8:]
+    assert len(ring) == len(held)
+
+    assert ring.query() == _columns(held)
+    for since in [0, 1_000, timestamp, timestamp + 1] + [t[0] for t in held]:
+        newer = [t for t in held if t[0] > since]
+        assert ring.query(since=since) == _columns(newer)
+        for limit in (1, 3, 8):
+            assert ring.query(since=since, limit=limit) == _columns(newer[-limit:])
+
+
+def test_out_of_order_trade_is_stored_at_the_previous_timestamp():
+    ring = TickRing(4)
+    ring.append(2_000, 1.0, 1.0)
+    ring.append(1_500, 2.0, 1.0)
+    assert ring.query()["timestamps"] == [2_000, 2_000]
+
+
+def test_history_keeps_one_ring_per_symbol():
+    history = TickHistory(capacity=16)
+    history.record("AAPL", 1, 1.0, 1)
+    history.record("MSFT", 1, 2.0, 1)
+    assert history.memory_bytes() == 2 * 16 * 24
+    history.discard("AAPL")
+    assert history.get("AAPL") is None
+    assert history.get("MSFT").query()["prices"] == [2.0]
@@ -0,0 +1,65 @@
+import asyncio
+
+from upstream_pool import FinnhubConnectionPool
+
+SYMBOLS = [f"SYM{i:04d}" for i in range(400)]
+
+
+def test_each_symbol_is_subscribed_on_exactly_its_shard():
+    async def run():
+        pool = FinnhubConnectionPool(4)
+        # Disconnected managers only record the symbols to replay
+        await pool.subscribe(SYMBOLS)
+        await pool.unsubscribe(SYMBOLS[:100])
+        return pool
+
+    pool = asyncio.run(run())
+    held = [conn.manager.symbols for conn in pool.connections]
+    assert set().union(*held) == set(SYMBOLS[100:])
+    assert sum(len(symbols) for symbols in held) == 300
+    for symbol in SYMBOLS[100:]:
+        assert symbol in pool.shard_for(symbol.lower()).manager.symbols
+    # 64 ring points per connection keep the spread roughly even
+    assert all(len(symbols) > 300 / 4 / 2 for symbols in held)
+
+
+def test_growing_the_pool_moves_only_some_symbols():
+    before = FinnhubConnectionPool(4)
+    after = FinnhubConnectionPool(5)
+    moved = sum(
+        before.shard_for(s).index != after.shard_for(s).index for s in SYMBOLS
+    )
+    # Ideally 1/5 of symbols move to the new connection; a modulo hash moves ~4/5
+    assert moved < len(SYMBOLS) * 0.35
+
+
+def test_connected_only_when_every_shard_is_up():
+    pool = FinnhubConnectionPool(3)
+    for conn in pool.connections:
+        conn.manager.connected = True
+        conn.manager.websocket = object()
+    assert pool.is_connected()
+    pool.connections[1].manager.connected = False
+    assert pool.connection_states() == [True, False, True]
+    assert not pool.is_connected()
+
+
+def test_frames_are_counted_per_connection_and_forwarded():
+    async def run():
+        pool = FinnhubConnectionPool(2)
+        received = []
+
+        async def handler(message: dict):
+            received.append(message)
+
+        pool.set_message_handler(handler)
+        frame = {"type": "trade", "data": [{"s": "AAPL", "p": 1.0, "t": 1, "v": 1}]}
+        await pool.connections[1].manager.message_handler(frame)
+        return pool, received
+
+    pool, received = asyncio.run(run())
+    assert len(received) == 1
+    assert [conn.messages for conn in pool.connections] == [0, 1]
+    snapshot = pool.snapshot()["connections"][1]
+    assert snapshot["messages"] == 1
+    assert snapshot["lag"]["samples"] == 1
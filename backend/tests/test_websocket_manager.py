@@ -0,0 +1,74 @@
+import asyncio
+
+from websockets.asyncio.server import serve
+
+import codec
+import metrics
+import websocket_manager
+from websocket_manager import FinnhubWebSocketManager
+
+
+def test_reconnects_immediately_and_replays_subscriptions(monkeypatch):
+    async def run():
+        connections: list[list[dict]] = []
+
+        async def handler(websocket):
+            frames: list[dict] = []
+            connections.append(frames)
+            async for raw in websocket:
+                frames.append(codec.loads(raw))
+                if len(connections) == 1 and len(frames) == 2:
+                    await websocket.close()  # Drop the first connection
+
+        async with serve(handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            url = f"ws://127.0.0.1:{port}/?token="
+            monkeypatch.setattr(websocket_manager, "FINNHUB_WS_URL", url)
+            manager = FinnhubWebSocketManager()
+            manager.api_key = "test"
+            manager.reconnect_delay = 5  # Only the immediate first retry fits
+            reconnects = metrics.upstream_reconnects
+            await manager.connect()
+            await manager.subscribe(["AAPL", "MSFT"])
+            for _ in range(200):
+                if len(connections) == 2 and len(connections[1]) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            await manager.disconnect()
+            return connections, metrics.upstream_reconnects - reconnects
+
+    connections, reconnects = asyncio.run(run())
+    replayed = [(f["type"], f["symbol"]) for f in connections[1]]
+    assert replayed == [("subscribe", "AAPL"), ("subscribe", "MSFT")]
+    assert reconnects == 1
+
+
+def test_retries_back_off_exponentially_with_full_jitter(monkeypatch):
+    caps: list[float] = []
+
+    def uniform(low: float, high: float) -> float:
+        caps.append(high)
+        return 0.0
+
+    monkeypatch.setattr(websocket_manager.random, "uniform", uniform)
+
+    async def run():
+        manager = FinnhubWebSocketManager()
+        manager.reconnect_delay = 0.5
+        manager.max_reconnect_delay = 3
+        attempts = 0
+
+        async def connect():
+            nonlocal attempts
+            attempts += 1
+            if attempts < 6:
+                raise ConnectionError("refused")
+            manager.connected = True
+
+        manager.connect = connect
+        await manager._reconnect_loop()
+        return attempts
+
+    assert asyncio.run(run()) == 6
+    # No wait before the first attempt, then capped exponential windows
+    assert caps == [1.0, 2.0, 3, 3, 3]
@@ -0,0 +1,59 @@
+import asyncio
+import struct
+
+import wire_format
+from client_manager import ClientOutbox, PriceUpdate
+from wire_format import SymbolTable, pack_batch, pack_update
+
+from .fakes import FakeWebSocket
+
+
+def test_update_record_layout():
+    symbol_id = wire_format.symbol_table.id_for("AAPL")
+    frame = pack_update("AAPL", {"price": 189.5, "volume": 12, "timestamp": 1_700})
+    assert len(frame) == 27
+    assert struct.unpack("<BHddq", frame) == (
+        wire_format.KIND_PRICE_UPDATE,
+        symbol_id,
+        189.5,
+        12.0,
+        1_700,
+    )
+
+
+def test_batch_layout_and_missing_fields():
+    frame = pack_batch(
+        [
+            {"symbol": "AAPL", "data": {"price": 1.0, "volume": 2, "timestamp": 3}},
+            {"symbol": "MSFT", "data": {"price": 4.0}},
+        ]
+    )
+    kind, count = struct.unpack_from("<BH", frame)
+    records = list(struct.iter_unpack("<Hddq", frame[3:]))
+    assert (kind, count) == (wire_format.KIND_PRICE_BATCH, 2)
+    ids = wire_format.symbol_table.ids_for(["AAPL", "MSFT"])
+    assert records == [(ids["AAPL"], 1.0, 2.0, 3), (ids["MSFT"], 4.0, 0.0, 0)]
+
+
+def test_symbol_ids_are_stable_and_dense():
+    table = SymbolTable()
+    assert table.ids_for(["B", "A", "B"]) == {"B": 1, "A": 2}
+    assert table.id_for("A") == 2
+
+
+def test_binary_client_receives_shared_binary_frames():
+    async def run():
+        ws = FakeWebSocket()
+        outbox = ClientOutbox("c", ws, lambda _: None)
+        outbox.set_encoding("binary")
+        update = PriceUpdate("AAPL", {"price": 2.0, "volume": 1, "timestamp": 5})
+        outbox.put_update(update)
+        outbox.set_batching(True, 0)
+        outbox.put_update(update)
+        await asyncio.sleep(0.01)
+        outbox.close()
+        return update, ws.sent
+
+    update, (single, batch) = asyncio.run(run())
+    assert single == update.binary()
+    assert batch == pack_batch([{"symbol": "AAPL", "data": update.data}])
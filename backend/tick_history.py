@@ -0,0 +1,112 @@
+"""Short-term intraday tick history in fixed-size, array-backed ring buffers."""
+
+from __future__ import annotations
+
+import os
+from array import array
+from bisect import bisect_right
+
+# Ticks kept per symbol; memory is 24 bytes per slot (i64 + 2 x f64)
+TICK_HISTORY_SIZE = max(1, int(os.getenv("TICK_HISTORY_SIZE", "4096")))
+
+
+class TickRing:
+    """
+    Fixed-capacity ring of ``(timestamp, price, volume)`` columns.
+
+    Storage is three preallocated typed arrays, so memory per symbol is
+    constant and queries are one ``bisect`` plus at most two contiguous
+    slices per column. Timestamps are kept non-decreasing (an out-of-order
+    trade is stored at the previous timestamp) so the search stays valid.
+    """
+
+    def __init__(self, capacity: int = TICK_HISTORY_SIZE) -> None:
+        self.capacity = capacity
+        self._ts = array("q", bytes(8 * capacity))
+        self._price = array("d", bytes(8 * capacity))
+        self._volume = array("d", bytes(8 * capacity))
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, timestamp: int, price: float, volume: float) -> None:
+        if self._size:
+            last = self._ts[(self._start + self._size - 1) % self.capacity]
+            timestamp = max(timestamp, last)
+        if self._size < self.capacity:
+            idx = (self._start + self._size) % self.capacity
+            self._size += 1
+        else:
+            idx = self._start
+            self._start = (self._start + 1) % self.capacity
+        self._ts[idx] = timestamp
+        self._price[idx] = price
+        self._volume[idx] = volume
+
+    def _segments(self, since: int | None) -> list[tuple[int, int]]:
+        """Physical ``[lo, hi)`` ranges, oldest first, with timestamp > since."""
+        if not self._size:
+            return []
+        end = self._start + self._size
+        if end <= self.capacity:
+            first, second = (self._start, end), (0, 0)
+        else:
+            first, second = (self._start, self.capacity), (0, end - self.capacity)
+        if since is None:
+            return [s for s in (first, second) if s[1] > s[0]]
+        if second[1] and since >= self._ts[0]:
+            lo = bisect_right(self._ts, since, 0, second[1])
+            return [(lo, second[1])]
+        lo = bisect_right(self._ts, since, first[0], first[1])
+        return [s for s in ((lo, first[1]), second) if s[1] > s[0]]
+
+    def query(self, since: int | None = None, limit: int | None = None) -> dict:
+        """
+        Ticks newer than ``since`` (ms), oldest first, capped to the newest ``limit``.
+
+        Returns:
+            Columnar ``{"timestamps", "prices", "volumes"}`` lists
+        """
+        segments = self._segments(since)
+        if limit is not None:
+            # Trim from the oldest end so the newest `limit` ticks remain
+            excess = sum(hi - lo for lo, hi in segments) - limit
+            while excess > 0 and segments:
+                lo, hi = segments[0]
+                if hi - lo <= excess:
+                    excess -= hi - lo
+                    segments.pop(0)
+                else:
+                    segments[0] = (lo + excess, hi)
+                    excess = 0
+        result: dict[str, list] = {"timestamps": [], "prices": [], "volumes": []}
+        for lo, hi in segments:
+            result["timestamps"].extend(self._ts[lo:hi])
+            result["prices"].extend(self._price[lo:hi])
+            result["volumes"].extend(self._volume[lo:hi])
+        return result
+
+
+class TickHistory:
+    """One ``TickRing`` per subscribed symbol."""
+
+    def __init__(self, capacity: int = TICK_HISTORY_SIZE) -> None:
+        self.capacity = capacity
+        self._rings: dict[str, TickRing] = {}
+
+    def record(self, symbol: str, timestamp: int, price: float, volume: float) -> None:
+        ring = self._rings.get(symbol)
+        if ring is None:
+            ring = self._rings[symbol] = TickRing(self.capacity)
+        ring.append(timestamp, price, volume)
+
+    def get(self, symbol: str) -> TickRing | None:
+        return self._rings.get(symbol)
+
+    def discard(self, symbol: str) -> None:
+        self._rings.pop(symbol, None)
+
+    def memory_bytes(self) -> int:
+        return len(self._rings) * self.capacity * 24
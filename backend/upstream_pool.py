@@ -0,0 +1,173 @@
+"""
+Upstream Connection Pool
+Shards symbols across several Finnhub WebSocket connections
+"""
+
+import asyncio
+import hashlib
+import math
+import os
+import time
+from bisect import bisect_right
+from typing import Callable, Dict, List, Optional
+
+import metrics
+from websocket_manager import FinnhubWebSocketManager
+
+# Number of upstream Finnhub connections (check your plan's connection limit)
+FINNHUB_CONNECTIONS = max(1, int(os.getenv("FINNHUB_CONNECTIONS", "1")))
+
+# Points per connection on the hash ring; more points = more even spread
+RING_REPLICAS = 64
+
+# Time constant of the per-connection message rate (seconds)
+RATE_WINDOW_S = 10.0
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class RateMeter:
+    """Exponentially decaying events-per-second rate, O(1) per event."""
+
+    def __init__(self, window_s: float = RATE_WINDOW_S) -> None:
+        self.window_s = window_s
+        self._rate = 0.0
+        self._updated = time.monotonic()
+
+    def _decay(self, now: float) -> None:
+        self._rate *= math.exp(-(now - self._updated) / self.window_s)
+        self._updated = now
+
+    def mark(self, count: int = 1) -> None:
+        self._decay(time.monotonic())
+        self._rate += count / self.window_s
+
+    def rate(self) -> float:
+        self._decay(time.monotonic())
+        return self._rate
+
+
+class PooledConnection:
+    """One upstream connection plus the symbols and stats it carries"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.manager = FinnhubWebSocketManager()
+        self.messages = 0
+        self.rate = RateMeter()
+        # Wall clock minus the newest trade timestamp in each frame
+        self.lag = metrics.LatencyTracker()
+
+    def record(self, message: dict):
+        self.messages += 1
+        self.rate.mark()
+        timestamps = [t["t"] for t in message.get("data", ()) if t.get("t")]
+        if timestamps:
+            self.lag.record(max(0.0, time.time() * 1000 - max(timestamps)))
+
+    def snapshot(self) -> dict:
+        return {
+            "index": self.index,
+            "connected": self.manager.is_connected(),
+            "symbols": len(self.manager.symbols),
+            "messages": self.messages,
+            "messages_per_s": round(self.rate.rate(), 2),
+            "lag": self.lag.snapshot(),
+        }
+
+
+class FinnhubConnectionPool:
+    """
+    Drop-in replacement for ``FinnhubWebSocketManager`` that spreads
+    symbols over ``size`` upstream connections by consistent hashing
+
+    Each connection has its own read loop and its own per-connection
+    symbol limit, so a burst on one shard doesn't delay the others, and
+    the pool can grow without reshuffling most symbols.
+    """
+
+    def __init__(self, size: int = FINNHUB_CONNECTIONS):
+        self.connections = [PooledConnection(i) for i in range(size)]
+        self.message_handler: Optional[Callable] = None
+
+        # Sorted hash ring of (point, connection index)
+        ring = sorted(
+            (_hash(f"conn-{i}-{r}"), i)
+            for i in range(size)
+            for r in range(RING_REPLICAS)
+        )
+        self._ring_points = [point for point, _ in ring]
+        self._ring_owners = [owner for _, owner in ring]
+
+        for conn in self.connections:
+            conn.manager.set_message_handler(self._handler_for(conn))
+
+    def _handler_for(self, conn: PooledConnection) -> Callable:
+        async def handle(message: dict):
+            conn.record(message)
+            if self.message_handler:
+                await self.message_handler(message)
+
+        return handle
+
+    def set_message_handler(self, handler: Callable):
+        """Set the callback function to handle incoming messages"""
+        self.message_handler = handler
+
+    def shard_for(self, symbol: str) -> PooledConnection:
+        """Connection that carries ``symbol``"""
+        idx = bisect_right(self._ring_points, _hash(symbol.upper()))
+        return self.connections[self._ring_owners[idx % len(self._ring_owners)]]
+
+    def _group(self, symbols: List[str]) -> Dict[int, List[str]]:
+        groups: Dict[int, List[str]] = {}
+        for symbol in symbols:
+            groups.setdefault(self.shard_for(symbol).index, []).append(symbol.upper())
+        return groups
+
+    async def connect(self):
+        """Connect every pooled connection"""
+        await asyncio.gather(*(conn.manager.connect() for conn in self.connections))
+
+    async def disconnect(self):
+        """Disconnect every pooled connection"""
+        await asyncio.gather(*(conn.manager.disconnect() for conn in self.connections))
+
+    def is_connected(self) -> bool:
+        """
+        Check that every pooled connection is up
+
+        Symbols on a down shard get no data, so one connection being up is
+        not enough to count as connected.
+        """
+        return all(self.connection_states())
+
+    def connection_states(self) -> List[bool]:
+        """Whether each pooled connection is up, by index"""
+        return [conn.manager.is_connected() for conn in self.connections]
+
+    async def subscribe(self, symbols: list[str]):
+        """
+        Subscribe each symbol on its shard
+
+        Args:
+            symbols: List of stock symbols (e.g., ["AAPL", "NVDA"])
+        """
+        for index, group in self._group(symbols).items():
+            await self.connections[index].manager.subscribe(group)
+
+    async def unsubscribe(self, symbols: list[str]):
+        """
+        Unsubscribe each symbol from its shard
+
+        Args:
+            symbols: List of stock symbols to unsubscribe from
+        """
+        for index, group in self._group(symbols).items():
+            await self.connections[index].manager.unsubscribe(group)
+
+    def snapshot(self) -> dict:
+        """Per-connection symbol counts, message rates and lag for /metrics"""
+        return {"connections": [conn.snapshot() for conn in self.connections]}
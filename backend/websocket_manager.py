@@ -5,18 +5,28 @@ Handles connection to Finnhub WebSocket and processes incoming messages
 
 import asyncio
 import websockets
-import json
 import os
+import random
+import time
 from typing import Callable, Optional, TYPE_CHECKING
 from dotenv import load_dotenv
 
+import codec
+import metrics
+from feed_log import FeedRecorder
+
 if TYPE_CHECKING:
     from websockets.asyncio.client import ClientConnection
 
 load_dotenv()
 
-# Finnhub WebSocket URL
-FINNHUB_WS_URL = "wss://ws.finnhub.io?token="
+# Finnhub WebSocket URL (the API key is appended); point it at a local
+# fake upstream (benchmarks/fake_finnhub.py) for load tests
+FINNHUB_WS_URL = os.getenv("FINNHUB_WS_URL", "wss://ws.finnhub.io?token=")
+
+# Optional raw feed log, shared by every connection in this process
+FEED_RECORD_PATH = os.getenv("FEED_RECORD_PATH", "")
+feed_recorder = FeedRecorder(FEED_RECORD_PATH) if FEED_RECORD_PATH else None
 
 
 class FinnhubWebSocketManager:
@@ -30,7 +40,17 @@ class FinnhubWebSocketManager:
         self.connected = False
         self.message_handler: Optional[Callable] = None
         self.reconnect_task: Optional[asyncio.Task] = None
-        self.reconnect_delay = 5  # seconds
+        self.reconnect_delay = 0.5  # seconds, base of the jittered backoff
+        self.max_reconnect_delay = 30  # seconds
+        self._closing = False
+
+        # Symbols that should be subscribed; replayed after every (re)connect
+        self.symbols: set[str] = set()
+
+        # Recovery timing: when the connection was lost, and when it came back
+        # (until the first trade after it arrives)
+        self._disconnected_at: Optional[float] = None
+        self._reconnected_at: Optional[float] = None
 
     def set_message_handler(self, handler: Callable):
         """Set the callback function to handle incoming messages"""
@@ -48,10 +68,25 @@ class FinnhubWebSocketManager:
         try:
             url = f"{FINNHUB_WS_URL}{self.api_key}"
             print(f"🔌 Connecting to Finnhub WebSocket...")
+            self._closing = False
             self.websocket = await websockets.connect(url)
             self.connected = True
             print("✅ Connected to Finnhub WebSocket")
 
+            if self._disconnected_at is not None:
+                now = time.perf_counter()
+                metrics.upstream_reconnects += 1
+                metrics.upstream_reconnect_latency.record(
+                    (now - self._disconnected_at) * 1000
+                )
+                self._disconnected_at = None
+                self._reconnected_at = now
+
+            # Replay every active symbol in one batch
+            if self.symbols:
+                await self._send_all("subscribe", sorted(self.symbols))
+                print(f"🔁 Replayed {len(self.symbols)} subscription(s)")
+
             # Start listening for messages
             asyncio.create_task(self._listen())
 
@@ -62,7 +97,12 @@ class FinnhubWebSocketManager:
 
     async def disconnect(self):
         """Disconnect from Finnhub WebSocket"""
+        self._closing = True
         self.connected = False
+        if self.reconnect_task and not self.reconnect_task.done():
+            self.reconnect_task.cancel()
+        if feed_recorder:
+            feed_recorder.flush()
         if self.websocket:
             await self.websocket.close()
             self.websocket = None
@@ -76,18 +116,20 @@ class FinnhubWebSocketManager:
         """
         Subscribe to stock symbols
 
+        While disconnected the symbols are only recorded; they are sent
+        with the replay after the next reconnect.
+
         Args:
             symbols: List of stock symbols (e.g., ["AAPL", "NVDA"])
         """
+        self.symbols.update(s.upper() for s in symbols)
         if not self.is_connected():
-            raise ConnectionError("Not connected to Finnhub WebSocket")
+            return
 
         assert self.websocket is not None  # Type narrowing: is_connected() ensures this
-        for symbol in symbols:
-            # Finnhub subscription format: {"type":"subscribe","symbol":"AAPL"}
-            message = {"type": "subscribe", "symbol": symbol.upper()}
-            await self.websocket.send(json.dumps(message))
-            print(f"📊 Subscribed to {symbol.upper()}")
+        # Finnhub takes one symbol per frame: {"type":"subscribe","symbol":"AAPL"}
+        await self._send_all("subscribe", symbols)
+        print(f"📊 Subscribed to {len(symbols)} symbol(s): {', '.join(symbols)}")
 
     async def unsubscribe(self, symbols: list[str]):
         """
@@ -96,15 +138,21 @@ class FinnhubWebSocketManager:
         Args:
             symbols: List of stock symbols to unsubscribe from
         """
+        self.symbols.difference_update(s.upper() for s in symbols)
         if not self.is_connected():
             return
 
         assert self.websocket is not None  # Type narrowing: is_connected() ensures this
+        # Finnhub unsubscription format: {"type":"unsubscribe","symbol":"AAPL"}
+        await self._send_all("unsubscribe", symbols)
+        print(f"📊 Unsubscribed from {len(symbols)} symbol(s): {', '.join(symbols)}")
+
+    async def _send_all(self, action: str, symbols: list[str]):
+        """Send one frame per symbol back to back"""
+        assert self.websocket is not None
         for symbol in symbols:
-            # Finnhub unsubscription format: {"type":"unsubscribe","symbol":"AAPL"}
-            message = {"type": "unsubscribe", "symbol": symbol.upper()}
-            await self.websocket.send(json.dumps(message))
-            print(f"📊 Unsubscribed from {symbol.upper()}")
+            message = {"type": action, "symbol": symbol.upper()}
+            await self.websocket.send(codec.dumps(message))
 
     async def _listen(self):
         """Listen for messages from Finnhub WebSocket"""
@@ -113,15 +161,22 @@ class FinnhubWebSocketManager:
 
         try:
             async for message in self.websocket:
+                if feed_recorder:
+                    feed_recorder.record(message)
                 try:
-                    data = json.loads(message)
+                    data = codec.loads(message)
 
                     # Handle different message types from Finnhub
                     if data.get("type") == "ping":
                         # Respond to ping to keep connection alive
-                        await self.websocket.send(json.dumps({"type": "pong"}))
+                        await self.websocket.send(codec.dumps({"type": "pong"}))
 
                     elif data.get("type") == "trade":
+                        if self._reconnected_at is not None:
+                            metrics.upstream_first_tick_latency.record(
+                                (time.perf_counter() - self._reconnected_at) * 1000
+                            )
+                            self._reconnected_at = None
                         # Trade/price update message
                         # Format: {"type":"trade","data":[{"s":"AAPL","p":150.25,"t":1234567890,"v":100}]}
                         if self.message_handler:
@@ -131,19 +186,25 @@ class FinnhubWebSocketManager:
                         # Error message from Finnhub
                         print(f"❌ Finnhub error: {data}")
 
-                except json.JSONDecodeError as e:
+                except codec.JSONDecodeError as e:
                     print(f"❌ Failed to parse message: {e}")
                 except Exception as e:
                     print(f"❌ Error processing message: {e}")
 
         except websockets.exceptions.ConnectionClosed:
-            print("❌ Finnhub WebSocket connection closed")
-            self.connected = False
-            # Attempt to reconnect
-            await self._reconnect()
+            pass
         except Exception as e:
             print(f"❌ Error in _listen: {e}")
-            self.connected = False
+
+        # The iterator also ends without raising on a clean close
+        self.connected = False
+        if self._closing:
+            return
+        print("❌ Finnhub WebSocket connection closed")
+        self._disconnected_at = time.perf_counter()
+        self._reconnected_at = None
+        # Attempt to reconnect
+        await self._reconnect()
 
     async def _reconnect(self):
         """Attempt to reconnect to Finnhub WebSocket"""
@@ -153,16 +214,19 @@ class FinnhubWebSocketManager:
         self.reconnect_task = asyncio.create_task(self._reconnect_loop())
 
     async def _reconnect_loop(self):
-        """Reconnection loop with exponential backoff"""
-        max_delay = 60  # Maximum delay of 60 seconds
-        delay = self.reconnect_delay
-
-        while not self.connected:
-            try:
-                print(f"🔄 Attempting to reconnect in {delay} seconds...")
+        """
+        Reconnect immediately, then back off exponentially with full jitter
+        so many instances don't retry in lockstep
+        """
+        attempt = 0
+        while not self.connected and not self._closing:
+            if attempt:
+                cap = min(self.max_reconnect_delay, self.reconnect_delay * 2**attempt)
+                delay = random.uniform(0, cap)
+                print(f"🔄 Attempting to reconnect in {delay:.1f} seconds...")
                 await asyncio.sleep(delay)
+            attempt += 1
+            try:
                 await self.connect()
-                delay = self.reconnect_delay  # Reset delay on success
             except Exception as e:
                 print(f"❌ Reconnection failed: {e}")
-                delay = min(delay * 2, max_delay)  # Exponential backoff
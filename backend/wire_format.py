@@ -0,0 +1,76 @@
+"""Compact binary encoding for /ws price streams.
+
+Clients that negotiate ``encoding=binary`` receive price data as binary
+WebSocket frames instead of JSON text. Control messages (connection,
+subscription acks, errors) stay JSON. Symbols are sent as small integer
+ids, announced in the subscription ack under ``symbol_ids``.
+
+All values are little-endian:
+
+* ``price_update``: ``u8 kind=1 | u16 symbol_id | f64 price | f64 volume | i64 timestamp``
+* ``price_batch``:  ``u8 kind=2 | u16 count`` then ``count`` records of
+  ``u16 symbol_id | f64 price | f64 volume | i64 timestamp``
+"""
+
+from __future__ import annotations
+
+import struct
+
+ENCODINGS = ("json", "binary")
+
+KIND_PRICE_UPDATE = 1
+KIND_PRICE_BATCH = 2
+
+_UPDATE = struct.Struct("<BHddq")
+_BATCH_HEADER = struct.Struct("<BH")
+_RECORD = struct.Struct("<Hddq")
+
+MAX_SYMBOL_ID = 0xFFFF
+
+
+class SymbolTable:
+    """Interns symbols to stable small ids for the lifetime of the process."""
+
+    def __init__(self) -> None:
+        self._ids: dict[str, int] = {}
+
+    def id_for(self, symbol: str) -> int:
+        symbol_id = self._ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = len(self._ids) + 1
+            if symbol_id > MAX_SYMBOL_ID:
+                raise OverflowError("symbol id space exhausted")
+            self._ids[symbol] = symbol_id
+        return symbol_id
+
+    def ids_for(self, symbols: list[str]) -> dict[str, int]:
+        return {symbol: self.id_for(symbol) for symbol in symbols}
+
+
+symbol_table = SymbolTable()
+
+
+def pack_update(symbol: str, data: dict) -> bytes:
+    return _UPDATE.pack(
+        KIND_PRICE_UPDATE,
+        symbol_table.id_for(symbol),
+        float(data["price"]),
+        float(data.get("volume") or 0),
+        int(data.get("timestamp") or 0),
+    )
+
+
+def pack_batch(updates: list[dict]) -> bytes:
+    """Pack ``[{"symbol": ..., "data": {...}}, ...]`` into one batch frame."""
+    parts = [_BATCH_HEADER.pack(KIND_PRICE_BATCH, len(updates))]
+    for update in updates:
+        data = update["data"]
+        parts.append(
+            _RECORD.pack(
+                symbol_table.id_for(update["symbol"]),
+                float(data["price"]),
+                float(data.get("volume") or 0),
+                int(data.get("timestamp") or 0),
+            )
+        )
+    return b"".join(parts)